@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+
+
+"""
+Журнал открытия шлагбаумов: кто, когда и какой шлагбаум пытался открыть, с каким результатом и за какое время.
+
+Журнал - база данных SQLite, записи в которую только добавляются. Запись хранит только числа (время - unix time,
+результат - код, длительность - в миллисекундах), а индексы по времени, по пользователю и времени и по шлагбауму и
+времени позволяют выбирать последние события (в том числе отдельного пользователя или шлагбаума) без просмотра всего
+журнала, независимо от его размера.
+"""
+
+
+import dataclasses
+import threading
+import sqlite3
+import time
+
+
+import logger
+
+
+@dataclasses.dataclass(frozen=True)
+class Event:
+    time: int
+    user_id: int
+    gate: int
+    outcome: int
+    latency: int
+
+
+class AuditLog:
+    _SCHEMA = (
+        'CREATE TABLE IF NOT EXISTS events (id INTEGER PRIMARY KEY, time INTEGER NOT NULL, user_id INTEGER NOT NULL, '
+        'gate INTEGER NOT NULL, outcome INTEGER NOT NULL, latency INTEGER NOT NULL)',
+        'CREATE INDEX IF NOT EXISTS events_time ON events (time)',
+        'CREATE INDEX IF NOT EXISTS events_user ON events (user_id, time)',
+        'CREATE INDEX IF NOT EXISTS events_gate ON events (gate, time)'
+    )
+
+    def __init__(self, path: str):
+        """
+        :param path: Путь до файла журнала
+        """
+        self._path = path
+        self._lock = threading.Lock()
+        self._connection: sqlite3.Connection | None = None
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Получение подключения к базе данных (вызывается под блокировкой)
+        :exception sqlite3.Error: Ошибка открытия базы данных
+        """
+        if self._connection is None:
+            connection = sqlite3.connect(self._path, check_same_thread=False, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            for statement in self._SCHEMA:
+                connection.execute(statement)
+            self._connection = connection
+        return self._connection
+
+    def record(self, user_id: int, gate: int, outcome: int, latency: float, timestamp: float | None = None) -> bool:
+        """
+        Добавление события в журнал
+        :param user_id: id пользователя telegram
+        :param gate: Номер шлагбаума
+        :param outcome: Код результата
+        :param latency: Длительность операции (в секундах)
+        :param timestamp: (необязательно) Время события (unix time, по умолчанию - текущее время)
+        :return: Добавлено ли событие (ошибки записи логируются)
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        try:
+            with self._lock:
+                self._connect().execute('INSERT INTO events (time, user_id, gate, outcome, latency) VALUES '
+                                        '(?, ?, ?, ?, ?)', (int(timestamp), user_id, gate, outcome,
+                                                            round(latency * 1000)))
+        except sqlite3.Error as e:
+            logger.Logger().error(f'[Audit] Saving gate open event failed! Exception text: {e}')
+            return False
+        return True
+
+    def query(self, user_id: int | None = None, gate: int | None = None, since: float | None = None,
+              limit: int = 20) -> list[Event]:
+        """
+        Получение последних событий (от новых к старым)
+        :param user_id: (необязательно) Только события пользователя с указанным id
+        :param gate: (необязательно) Только события шлагбаума с указанным номером
+        :param since: (необязательно) Только события не старше указанного времени (unix time)
+        :param limit: Максимальное количество событий
+        :return: События
+        :exception IOError: Ошибка чтения журнала
+        """
+        conditions, parameters = list(), list()
+        if user_id is not None:
+            conditions.append('user_id = ?')
+            parameters.append(user_id)
+        if gate is not None:
+            conditions.append('gate = ?')
+            parameters.append(gate)
+        if since is not None:
+            conditions.append('time >= ?')
+            parameters.append(int(since))
+        statement = 'SELECT time, user_id, gate, outcome, latency FROM events'
+        if len(conditions) > 0:
+            statement += ' WHERE ' + ' AND '.join(conditions)
+        statement += ' ORDER BY time DESC, id DESC LIMIT ?'
+        parameters.append(limit)
+        try:
+            with self._lock:
+                rows = self._connect().execute(statement, parameters).fetchall()
+        except sqlite3.Error as e:
+            raise IOError(str(e))
+        return [Event(*row) for row in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
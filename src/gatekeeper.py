@@ -55,6 +55,23 @@ except ModuleNotFoundError:
     exit(1)
 
 
+import metrics
+
+
+# Максимальное время (в секундах) ожидания ответа сервера
+TIMEOUT: float = 30
+
+
+# Количество соединений с сервером, сохраняемых для повторного использования (по числу одновременных запросов)
+POOL_SIZE: int = 16
+
+
+# Общая для всех потоков сессия http: повторные запросы (из любого потока, в том числе из потоков периодических задач)
+# используют уже установленные соединения с сервером без повторного tls рукопожатия
+_session = requests.Session()
+_session.mount('https://', requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE))
+
+
 class WrongServerAnswerError(ConnectionError):
     pass
 
@@ -86,12 +103,13 @@ class GatekeeperAPI:
     __URL = 'https://api.privratnik.net:44590/app/api.php'
     __HEADERS = {'Accept': 'application/json',
                  'Accept-Encoding': 'gzip, deflate, br',
-                 'User-Agent': 'okhttp/4.9.2',
-                 'Connection': 'close'}
+                 'User-Agent': 'okhttp/4.9.2'}
 
     _phone: int | None = None
     _api_key: str | None = None
     _gates: list | None = None
+    _cache = None
+    _cache_ttl: float = 0
 
     @property
     def phone(self) -> int | None:
@@ -122,12 +140,23 @@ class GatekeeperAPI:
             raise ValueError('Wrong api key length!')
         self._api_key = value
 
-    def __init__(self, phone: int | None = None, key: str | None = None):
+    def __init__(self, phone: int | None = None, key: str | None = None, cache=None, cache_ttl: float = 0):
+        """
+        :param phone: (необязательно) Номер телефона
+        :param key: (необязательно) API ключ
+        :param cache: (необязательно) Кэш списка объектов - объект с методами get(key) и set(key, value, ttl) (например,
+        state.SharedState), общий для объектов api (и экземпляров бота)
+        :param cache_ttl: Время (в секундах), в течение которого используется список объектов из кэша (0 - не
+        использовать кэш)
+        """
         if phone is not None:
             self.phone = phone
         if key is not None:
             self.key = key
+        self._cache = cache
+        self._cache_ttl = cache_ttl
 
+    @metrics.track_upstream('request_sms_code')
     def request_sms_code(self) -> bool:
         """
         Запрос смс с кодом для авторизации
@@ -139,7 +168,8 @@ class GatekeeperAPI:
         if self._phone is None:
             raise TypeError('Please set phone number')
         try:
-            req = requests.post(self.__URL, headers=self.__HEADERS, files={'number': (None, self._phone)})
+            req = _session.post(self.__URL, headers=self.__HEADERS, timeout=TIMEOUT,
+                                files={'number': (None, self._phone)})
         except Exception as e:
             raise ConnectionError(str(e))
         if req.status_code != 200:
@@ -154,6 +184,7 @@ class GatekeeperAPI:
             return True
         return False
 
+    @metrics.track_upstream('request_api_key')
     def request_api_key(self, sms_code: str) -> bool:
         """
         Запрос API ключа
@@ -175,8 +206,9 @@ class GatekeeperAPI:
         if len(sms_code) != 5:
             raise ValueError('Wrong sms code length')
         try:
-            req = requests.post(self.__URL, headers=self.__HEADERS, files={'number': (None, self._phone),
-                                                                           'smsCode': (None, sms_code)})
+            req = _session.post(self.__URL, headers=self.__HEADERS, timeout=TIMEOUT,
+                                files={'number': (None, self._phone),
+                                       'smsCode': (None, sms_code)})
         except Exception as e:
             raise ConnectionError(str(e))
         if req.status_code != 200:
@@ -192,23 +224,51 @@ class GatekeeperAPI:
         self._api_key = key
         return True
 
-    def get_info(self) -> list:
+    def get_info(self, refresh: bool = False) -> list:
         """
-        Получение информации о доступных объектах
+        Получение информации о доступных объектах (из кэша, если он задан и список объектов в нем не устарел)
+        :param refresh: Запросить список объектов у сервера, даже если он есть в кэше (и обновить кэш)
         :exception TypeError: Неверное значение номера телефона/API ключа
         :exception ConnectionError: Ошибка отправки запроса серверу
         :exception WrongServerAnswerError: Неверный код ответа/неверное значение ответа от сервера
         :exception LogoutError: API ключ аннулирован
         :return: Список объектов Gate с информацией о доступных объектах
         """
+        if self._cache is None or self._cache_ttl <= 0:
+            return self._request_info()
+        cache_key = f'gates/{self._phone}'
+        if not refresh:
+            try:
+                result = [Gate(id=item['id'], coordinates=Coordinates(**item['coordinates']),
+                               address=item['address'], numbers=tuple(item['numbers']), name=item['name'])
+                          for item in self._cache.get(cache_key)]
+            except (ConnectionError, KeyError, TypeError):
+                result = None
+            if result is not None:
+                self._gates = [gate.id for gate in result]
+                return result
+        result = self._request_info()
+        if len(result) > 0:
+            try:
+                self._cache.set(cache_key, [dataclasses.asdict(gate) for gate in result], self._cache_ttl)
+            except ConnectionError:
+                pass
+        return result
+
+    @metrics.track_upstream('get_info', LogoutError)
+    def _request_info(self) -> list:
+        """
+        Запрос информации о доступных объектах у сервера
+        """
         if not isinstance(self._phone, int):
             raise TypeError('Wrong phone number')
         if not isinstance(self._api_key, str):
             raise TypeError('Wrong api key')
         try:
-            req = requests.post(self.__URL, headers=self.__HEADERS, files={'barrier': (None, ''),
-                                                                           'login': (None, self._phone),
-                                                                           'key': (None, self._api_key)})
+            req = _session.post(self.__URL, headers=self.__HEADERS, timeout=TIMEOUT,
+                                files={'barrier': (None, ''),
+                                       'login': (None, self._phone),
+                                       'key': (None, self._api_key)})
         except Exception as e:
             raise ConnectionError(str(e))
         if req.status_code != 200:
@@ -242,6 +302,7 @@ class GatekeeperAPI:
             result.append(gate)
         return result
 
+    @metrics.track_upstream('open_gate', LogoutError)
     def open_gate(self, gate_id: int) -> bool:
         """
         Открытие шлагбаума
@@ -257,14 +318,15 @@ class GatekeeperAPI:
         if not isinstance(self._api_key, str):
             raise TypeError('Wrong api key')
         if self._gates is None:
-            self.get_info()
+            self._request_info()
         if gate_id not in self._gates or gate_id < 1:
             return False
         try:
-            req = requests.post(self.__URL, headers=self.__HEADERS, files={'barrier_id': (None, gate_id),
-                                                                           'command': (None, 'open'),
-                                                                           'login': (None, self._phone),
-                                                                           'key': (None, self._api_key)})
+            req = _session.post(self.__URL, headers=self.__HEADERS, timeout=TIMEOUT,
+                                files={'barrier_id': (None, gate_id),
+                                       'command': (None, 'open'),
+                                       'login': (None, self._phone),
+                                       'key': (None, self._api_key)})
         except Exception as e:
             raise ConnectionError(str(e))
         if req.status_code != 200:
@@ -280,6 +342,7 @@ class GatekeeperAPI:
         else:
             return False
 
+    @metrics.track_upstream('get_stream_link', LogoutError)
     def get_stream_link(self, gate_id: int) -> str:
         """
         Ссылка на видеопоток с камеры на шлагбауме
@@ -295,14 +358,15 @@ class GatekeeperAPI:
         if not isinstance(self._api_key, str):
             raise TypeError('Wrong api key')
         if self._gates is None:
-            self.get_info()
+            self._request_info()
         if gate_id not in self._gates or gate_id < 1:
             return ''
         try:
-            req = requests.post(self.__URL, headers=self.__HEADERS, files={'barrier_id': (None, gate_id),
-                                                                           'cam': (None, ''),
-                                                                           'login': (None, self._phone),
-                                                                           'key': (None, self._api_key)})
+            req = _session.post(self.__URL, headers=self.__HEADERS, timeout=TIMEOUT,
+                                files={'barrier_id': (None, gate_id),
+                                       'cam': (None, ''),
+                                       'login': (None, self._phone),
+                                       'key': (None, self._api_key)})
         except Exception as e:
             raise ConnectionError(str(e))
         if req.status_code != 200:
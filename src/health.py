@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+
+
+"""
+Встроенный http-сервер для проверки состояния бота (например, супервизором или системой мониторинга).
+
+Доступные адреса:
+* /live - бот жив (цикл получения обновлений telegram не завис)
+* /ready - бот готов к работе (api ключ действителен, список шлагбаумов получен, сервер telegram доступен)
+* /metrics - текущие показатели работы бота
+
+Ответы формируются только из данных в памяти процесса (без запросов к внешним серверам), поэтому адреса можно
+опрашивать хоть каждую секунду. Код ответа: 200 - проверка пройдена, 503 - не пройдена. Тело ответа - json.
+"""
+
+
+import http.server
+import threading
+import json
+
+
+import settings
+import metrics
+import logger
+
+
+# Максимальное время (в секундах) с момента последнего запроса обновлений telegram. Запрос обновлений длится не более
+# 20 секунд (long polling), а после ошибки повторяется через несколько секунд
+POLL_TIMEOUT: int = 90
+
+
+class HealthServer:
+    def __init__(self, host: str, port: int, dispatcher=None):
+        """
+        :param host: Адрес, на котором будет принимать подключения сервер
+        :param port: Порт сервера
+        :param dispatcher: (необязательно) Объект telegram.lanes.Lanes, для получения размера очередей обработчиков
+        """
+        self._dispatcher = dispatcher
+        self._server = http.server.ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: threading.Thread | None = None
+
+    def live(self) -> tuple[bool, dict]:
+        seconds = metrics.Metrics().seconds_since_poll()
+        return seconds is not None and seconds < POLL_TIMEOUT, {'seconds_since_poll': seconds}
+
+    def ready(self) -> tuple[bool, dict]:
+        config = settings.Settings()
+        seconds = metrics.Metrics().seconds_since_poll(success=True)
+        checks = {
+            'configuration_loaded': config.data is not None,
+            'key_valid': config.data is not None and config.data.gatekeeper.key != '' and
+            metrics.Metrics().key_valid is not False,
+            'gates_loaded': bool(metrics.Metrics().gates_count),
+            'telegram_reachable': seconds is not None and seconds < POLL_TIMEOUT
+        }
+        return all(checks.values()), checks
+
+    def metrics(self) -> tuple[bool, dict]:
+        result = metrics.Metrics().snapshot()
+        if self._dispatcher is not None:
+            result['queue_depth'] = self._dispatcher.lanes_in_flight()
+        return True, result
+
+    def _handler(self):
+        routes = {'/live': self.live, '/ready': self.ready, '/metrics': self.metrics}
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                route = routes.get(self.path.split('?', 1)[0].rstrip('/'))
+                if route is None:
+                    self.send_error(404)
+                    return None
+                status, body = route()
+                body = json.dumps(body).encode()
+                self.send_response(200 if status else 503)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args) -> None:
+                pass
+
+        return Handler
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._server.serve_forever, name='health-server', daemon=True)
+        self._thread.start()
+        logger.Logger().info(f'[Health] Health server started on {self._server.server_address[0]}:'
+                             f'{self._server.server_address[1]}')
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,549 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+"""
+Сервер ключ-значение для общего состояния нескольких экземпляров бота и клиент к нему.
+
+Сервер - простая замена внешнего хранилища (подходит для работы нескольких экземпляров бота на одном или нескольких
+узлах и для проверки такой работы): данные хранятся в памяти процесса и (необязательно) сохраняются в файл-журнал
+(json lines): каждый пакет изменений постоянных значений дописывается в конец файла, поэтому стоимость сохранения не
+зависит от количества значений. Когда журнал становится вдвое больше снимка всех значений, он заменяется снимком.
+Запуск: GATEKEEPER_KV_TOKEN=секрет python kv.py --host адрес --port 8765 --file kv.json
+
+Сервер хранит токен бота и api ключ привратника, поэтому каждый запрос должен содержать общий секрет (заголовок
+Authorization: Bearer секрет). Без секрета сервер принимает подключения только на локальном (loopback) адресе. Секрет не
+защищает данные при передаче (http без шифрования): для работы между узлами используйте доверенную сеть или туннель.
+
+Данные сервера:
+* постоянные значения и счетчики версий пространств имен (часть ключа до первого символа /). Счетчик увеличивается при
+каждом изменении значений своего пространства имен, поэтому изменения одного бота не считаются изменениями другого.
+Значения изменяются пакетами операций (put, delete, delete_prefix), каждый пакет применяется атомарно
+* временные значения с ограниченным временем жизни (ttl). Операция claim записывает значение, только если ключа нет
+
+Адреса (тело запроса и ответа - json):
+* GET /items?prefix=... - постоянные значения, ключи которых начинаются с префикса, и текущая версия пространства имен
+префикса
+* GET /version?namespace=... - текущая версия пространства имен
+* POST /batch - применение пакета операций: {"namespace": "...", "ops": [{"op": "put", "key": "...", "value": ...},
+{"op": "delete", "key": "..."}, {"op": "delete_prefix", "prefix": "..."}]}. Ответ - версия пространства имен namespace
+* GET /ephemeral?key=... - временное значение (null - значения нет или истекло время его жизни)
+* POST /ephemeral - изменение временного значения: {"op": "set" | "claim" | "delete", "key": "...", "value": ...,
+"ttl": секунды}
+
+Адрес сервера для клиента (KVClient) и хранилища настроек (storage.KVStorage): kv://секрет@хост:порт/пространство_имен
+(секрет необязателен для сервера без секрета, пространство имен - буквы, цифры, символы _ . -). Ключи клиента
+дополняются префиксом пространства имен, поэтому один сервер могут использовать несколько независимых ботов.
+
+Модуль импортируется модулем storage при каждом запуске бота, поэтому http.server (сервер) и requests (клиент)
+импортируются только при создании сервера и первом запросе клиента.
+"""
+
+
+import urllib.parse
+import ipaddress
+import threading
+import argparse
+import hmac
+import json
+import time
+import os
+import re
+from typing import Any
+
+
+import startup
+import logger
+
+
+URL_SCHEME: str = 'kv'
+# Время ожидания ответа сервера (в секундах)
+TIMEOUT: float = 5
+# Размер журнала сервера (в байтах), до которого журнал не заменяется снимком
+LOG_COMPACT_MIN_SIZE: int = 1024 * 1024
+# Переменная окружения с общим секретом сервера (чтобы секрет не был виден в списке процессов)
+TOKEN_ENVIRONMENT_VARIABLE: str = 'GATEKEEPER_KV_TOKEN'
+
+
+def _is_loopback(host: str) -> bool:
+    """
+    :param host: Адрес, на котором сервер принимает подключения
+    :return: Является ли адрес локальным (loopback)
+    """
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def _namespace(key: str) -> str:
+    """
+    :return: Пространство имен ключа (часть до первого символа /)
+    """
+    return key.partition('/')[0]
+
+
+class KVServer:
+    def __init__(self, host: str, port: int, file_path: str | None = None, token: str | None = None):
+        """
+        :param host: Адрес, на котором будет принимать подключения сервер
+        :param port: Порт сервера
+        :param file_path: (необязательно) Путь до файла-журнала для сохранения постоянных значений
+        :param token: (необязательно для локального адреса) Общий секрет, который должен содержать каждый запрос
+        :exception ValueError: Не указан секрет для не локального адреса
+        :exception IOError: Ошибка чтения файла
+        """
+        if not token and not _is_loopback(host):
+            raise ValueError(f'Shared secret is required to listen on non-loopback address "{host}"')
+        self._authorization = f'Bearer {token}'.encode() if token else None
+        self._lock = threading.Lock()
+        self._file_path = file_path
+        self._items: dict[str, Any] = dict()
+        self._versions: dict[str, int] = dict()
+        self._ephemeral: dict[str, tuple[Any, float]] = dict()
+        self._sweep_at = 0.0
+        # Журнал: файл, его размер и размер последнего снимка (в байтах)
+        self._log = None
+        self._log_size = 0
+        self._snapshot_size = 0
+        if file_path is not None:
+            try:
+                self._load()
+                self._log = open(file_path, 'ab')
+            except Exception as e:
+                raise IOError(str(e))
+        import http.server
+        self._server = http.server.ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: threading.Thread | None = None
+
+    @property
+    def address(self) -> tuple[str, int]:
+        return self._server.server_address[0], self._server.server_address[1]
+
+    def _load(self) -> None:
+        """
+        Чтение журнала: снимок значений и пакеты изменений после него. Незавершенная последняя запись (сбой во время
+        записи) отбрасывается
+        :exception Exception: Ошибка чтения/неверный формат журнала
+        """
+        if not os.path.isfile(self._file_path):
+            return None
+        with open(self._file_path, 'rb') as f:
+            content = f.read()
+        offset = 0
+        for line in content.splitlines(keepends=True):
+            try:
+                record = json.loads(line)
+                if not isinstance(record, dict):
+                    raise ValueError('Wrong journal record')
+                if 'items' in record:
+                    self._items = dict(record['items'])
+                    # Файл прежнего формата (снимок с общим счетчиком версий)
+                    self._versions = dict(record['versions']) if 'versions' in record else \
+                        {_namespace(key): int(record['version']) for key in self._items}
+                    self._snapshot_size = len(line)
+                else:
+                    self._apply(record['ops'])
+                    self._versions.update(record['versions'])
+            except (ValueError, KeyError, TypeError):
+                if offset + len(line) < len(content) or line.endswith(b'\n'):
+                    raise
+                logger.Logger().warning(f'[KV] Incomplete last record of journal discarded ({len(line)} bytes)')
+                os.truncate(self._file_path, offset)
+                break
+            offset += len(line)
+        self._log_size = offset
+        # Последняя запись без перевода строки (файл прежнего формата)
+        if 0 < offset == len(content) and not content.endswith(b'\n'):
+            with open(self._file_path, 'ab') as f:
+                f.write(b'\n')
+            self._log_size += 1
+
+    def items(self, prefix: str) -> dict:
+        with self._lock:
+            return {'version': self._versions.get(_namespace(prefix), 0),
+                    'items': {key: value for key, value in self._items.items() if key.startswith(prefix)}}
+
+    def version(self, namespace: str) -> dict:
+        with self._lock:
+            return {'version': self._versions.get(namespace, 0)}
+
+    def batch(self, ops: list, namespace: str = '') -> dict:
+        """
+        Атомарное применение пакета операций с постоянными значениями
+        :param ops: Операции
+        :param namespace: Пространство имен, версия которого возвращается
+        :exception ValueError: Неверная операция (пакет не применяется)
+        :exception IOError: Ошибка записи журнала (пакет не применяется)
+        """
+        for op in ops:
+            if not isinstance(op, dict) or op.get('op') not in ('put', 'delete', 'delete_prefix') or \
+               not isinstance(op.get('prefix' if op.get('op') == 'delete_prefix' else 'key'), str):
+                raise ValueError(f'Wrong operation: {op}')
+        with self._lock:
+            # Изменяемые пространства имен (операция delete_prefix может затрагивать несколько)
+            touched = set()
+            for op in ops:
+                if op['op'] != 'delete_prefix':
+                    touched.add(_namespace(op['key']))
+                elif '/' in op['prefix']:
+                    touched.add(_namespace(op['prefix']))
+                else:
+                    touched.update(_namespace(key) for key in self._items if key.startswith(op['prefix']))
+            versions = {name: self._versions.get(name, 0) + 1 for name in touched}
+            if self._log is not None:
+                self._append({'ops': ops, 'versions': versions})
+            self._apply(ops)
+            self._versions.update(versions)
+            if self._log is not None and self._log_size > max(LOG_COMPACT_MIN_SIZE, 2 * self._snapshot_size):
+                self._compact()
+            return {'version': self._versions.get(namespace, 0)}
+
+    def _apply(self, ops: list) -> None:
+        """
+        Применение пакета операций (вызывается под блокировкой)
+        """
+        for op in ops:
+            match op['op']:
+                case 'put':
+                    self._items[op['key']] = op.get('value')
+                case 'delete':
+                    self._items.pop(op['key'], None)
+                case 'delete_prefix':
+                    for key in [key for key in self._items if key.startswith(op['prefix'])]:
+                        del self._items[key]
+
+    def _append(self, record: dict) -> None:
+        """
+        Запись пакета изменений в конец журнала (вызывается под блокировкой)
+        :exception IOError: Ошибка записи (журнал возвращается к прежнему размеру)
+        """
+        line = (json.dumps(record) + '\n').encode()
+        try:
+            self._log.write(line)
+            self._log.flush()
+            os.fsync(self._log.fileno())
+        except Exception as e:
+            try:
+                self._log.truncate(self._log_size)
+            except Exception:
+                pass
+            raise IOError(str(e))
+        self._log_size += len(line)
+
+    def _compact(self) -> None:
+        """
+        Замена журнала снимком всех значений (вызывается под блокировкой). Ошибка записи снимка не прерывает работу:
+        журнал остается прежним
+        """
+        line = (json.dumps({'items': self._items, 'versions': self._versions}) + '\n').encode()
+        try:
+            with open(self._file_path + '.tmp', 'wb') as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(self._file_path + '.tmp', self._file_path)
+        except Exception as e:
+            logger.Logger().error(f'[KV] Journal compaction failed! Exception text: {e}')
+            return None
+        self._log.close()
+        self._log = open(self._file_path, 'ab')
+        self._log_size = self._snapshot_size = len(line)
+
+    def _alive(self, key: str, now: float) -> tuple[Any, float] | None:
+        """
+        Получение не истекшего временного значения (вызывается под блокировкой)
+        """
+        entry = self._ephemeral.get(key)
+        if entry is not None and entry[1] <= now:
+            del self._ephemeral[key]
+            return None
+        return entry
+
+    def ephemeral(self, key: str) -> dict:
+        with self._lock:
+            entry = self._alive(key, time.monotonic())
+            return {'value': None if entry is None else entry[0]}
+
+    def change_ephemeral(self, request: dict) -> dict:
+        """
+        Изменение временного значения
+        :exception ValueError: Неверная операция
+        """
+        key, ttl = request.get('key'), request.get('ttl', 0)
+        if not isinstance(key, str) or not isinstance(ttl, int | float) or isinstance(ttl, bool):
+            raise ValueError('Wrong key or ttl')
+        now = time.monotonic()
+        with self._lock:
+            # Удаление истекших значений, к которым больше не обращаются
+            if now >= self._sweep_at:
+                for expired in [expired for expired, entry in self._ephemeral.items() if entry[1] <= now]:
+                    del self._ephemeral[expired]
+                self._sweep_at = now + 60
+            match request.get('op'):
+                case 'set':
+                    self._ephemeral[key] = (request.get('value'), now + ttl)
+                    return {'value': request.get('value')}
+                case 'claim':
+                    entry = self._alive(key, now)
+                    if entry is not None:
+                        return {'claimed': False, 'value': entry[0]}
+                    self._ephemeral[key] = (request.get('value'), now + ttl)
+                    return {'claimed': True, 'value': request.get('value')}
+                case 'delete':
+                    entry = self._ephemeral.pop(key, None)
+                    return {'value': None if entry is None else entry[0]}
+                case _:
+                    raise ValueError('Wrong operation')
+
+    def _handler(self):
+        import http.server
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Заголовки и тело ответа отправляются отдельными записями: без отключения алгоритма Нейгла каждый ответ
+            # через постоянное соединение задерживается на время отложенного подтверждения (~40 мс)
+            disable_nagle_algorithm = True
+
+            def _authorized(self) -> bool:
+                """
+                Проверка общего секрета запроса (сравнение за время, не зависящее от совпадающей части)
+                """
+                if server._authorization is None:
+                    return True
+                if hmac.compare_digest(self.headers.get('Authorization', '').encode(), server._authorization):
+                    return True
+                # Тело запроса не читается: соединение закрывается после ответа
+                self.close_connection = True
+                self._reply(401, {'error': 'Unauthorized'})
+                return False
+
+            def _reply(self, status: int, body: dict) -> None:
+                body = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if not self._authorized():
+                    return None
+                url = urllib.parse.urlsplit(self.path)
+                query = urllib.parse.parse_qs(url.query)
+                match url.path.rstrip('/'):
+                    case '/items':
+                        return self._reply(200, server.items(query.get('prefix', [''])[0]))
+                    case '/version':
+                        return self._reply(200, server.version(query.get('namespace', [''])[0]))
+                    case '/ephemeral':
+                        return self._reply(200, server.ephemeral(query.get('key', [''])[0]))
+                self._reply(404, {'error': 'Not found'})
+
+            def do_POST(self):
+                if not self._authorized():
+                    return None
+                try:
+                    request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+                    match urllib.parse.urlsplit(self.path).path.rstrip('/'):
+                        case '/batch':
+                            ops = request.get('ops') if isinstance(request, dict) else None
+                            namespace = request.get('namespace', '') if isinstance(request, dict) else None
+                            if not isinstance(ops, list) or not isinstance(namespace, str):
+                                raise ValueError('Wrong operations list or namespace')
+                            return self._reply(200, server.batch(ops, namespace))
+                        case '/ephemeral':
+                            if not isinstance(request, dict):
+                                raise ValueError('Wrong request')
+                            return self._reply(200, server.change_ephemeral(request))
+                except ValueError as e:
+                    return self._reply(400, {'error': str(e)})
+                except IOError as e:
+                    logger.Logger().error(f'[KV] Saving changes failed! Exception text: {e}')
+                    return self._reply(500, {'error': 'Saving changes failed'})
+                self._reply(404, {'error': 'Not found'})
+
+            def log_message(self, *args) -> None:
+                pass
+
+        return Handler
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._server.serve_forever, name='kv-server', daemon=True)
+        self._thread.start()
+        logger.Logger().info(f'[KV] Key-value server started on {self.address[0]}:{self.address[1]}')
+
+    def serve_forever(self) -> None:
+        logger.Logger().info(f'[KV] Key-value server started on {self.address[0]}:{self.address[1]}')
+        try:
+            self._server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._server.server_close()
+            self._close_log()
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        self._close_log()
+
+    def _close_log(self) -> None:
+        with self._lock:
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+
+
+def is_url(path: str) -> bool:
+    """
+    :param path: Путь до файла настроек
+    :return: Является ли путь адресом сервера ключ-значение
+    """
+    return path.startswith(URL_SCHEME + '://')
+
+
+def redact(url: str) -> str:
+    """
+    Адрес сервера без общего секрета (для журнала и имен служебных файлов)
+    :param url: Адрес сервера (kv://секрет@хост:порт/пространство_имен)
+    """
+    if not is_url(url):
+        return url
+    address = url[len(URL_SCHEME) + 3:]
+    netloc, separator, path = address.partition('/')
+    return f'{URL_SCHEME}://{netloc.rpartition("@")[2]}{separator}{path}'
+
+
+class KVClient:
+    """
+    Клиент сервера ключ-значение. Ключи дополняются префиксом пространства имен. Потоки используют отдельные
+    http-сессии (с повторным использованием соединений)
+    """
+
+    def __init__(self, url: str):
+        """
+        :param url: Адрес сервера (kv://секрет@хост:порт/пространство_имен)
+        :exception ValueError: Неверный адрес
+        """
+        parts = urllib.parse.urlsplit(url)
+        try:
+            port = parts.port
+        except ValueError:
+            port = None
+        if parts.scheme != URL_SCHEME or parts.hostname is None or port is None:
+            raise ValueError(f'Wrong key-value server url: {redact(url)}')
+        self._base_url = f'http://{parts.hostname}:{port}'
+        self._namespace = parts.path.strip('/')
+        if re.fullmatch(r'[\w.-]+', self._namespace) is None:
+            raise ValueError(f'Wrong namespace in key-value server url: {redact(url)}')
+        self._prefix = self._namespace + '/'
+        self._headers = dict()
+        if parts.username:
+            self._headers['Authorization'] = f'Bearer {urllib.parse.unquote(parts.username)}'
+        self._local = threading.local()
+
+    @property
+    def namespace(self) -> str:
+        return self._namespace
+
+    def _request(self, method: str, path: str, params: dict | None = None, body: dict | None = None) -> dict:
+        """
+        :exception ConnectionError: Ошибка подключения к серверу/неверный ответ сервера
+        """
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = startup.require('requests').Session()
+        try:
+            response = session.request(method, self._base_url + path, params=params, json=body, headers=self._headers,
+                                       timeout=TIMEOUT)
+            result = response.json()
+        except Exception as e:
+            raise ConnectionError(str(e))
+        if response.status_code != 200 or not isinstance(result, dict):
+            raise ConnectionError(f'Wrong key-value server answer (status code: {response.status_code}, body: '
+                                  f'{result})')
+        return result
+
+    def items(self, prefix: str = '') -> tuple[int, dict]:
+        """
+        :param prefix: Префикс ключей (без пространства имен)
+        :return: Версия данных и постоянные значения (ключи без пространства имен)
+        :exception ConnectionError: Ошибка подключения к серверу
+        """
+        result = self._request('GET', '/items', params={'prefix': self._prefix + prefix})
+        return result['version'], {key[len(self._prefix):]: value for key, value in result['items'].items()}
+
+    def version(self) -> int:
+        """
+        :return: Версия данных пространства имен
+        :exception ConnectionError: Ошибка подключения к серверу
+        """
+        return self._request('GET', '/version', params={'namespace': self._namespace})['version']
+
+    def batch(self, ops: list[dict]) -> int:
+        """
+        Атомарное применение пакета операций с постоянными значениями
+        :param ops: Операции (ключи и префиксы без пространства имен)
+        :return: Версия данных пространства имен после применения пакета
+        :exception ConnectionError: Ошибка подключения к серверу
+        """
+        ops = [dict(op, **{field: self._prefix + op[field] for field in ('key', 'prefix') if field in op})
+               for op in ops]
+        return self._request('POST', '/batch', body={'namespace': self._namespace, 'ops': ops})['version']
+
+    def get(self, key: str) -> Any:
+        """
+        :return: Временное значение (None - значения нет)
+        :exception ConnectionError: Ошибка подключения к серверу
+        """
+        return self._request('GET', '/ephemeral', params={'key': self._prefix + key})['value']
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        """
+        :exception ConnectionError: Ошибка подключения к серверу
+        """
+        self._request('POST', '/ephemeral', body={'op': 'set', 'key': self._prefix + key, 'value': value, 'ttl': ttl})
+
+    def claim(self, key: str, value: Any, ttl: float) -> tuple[bool, Any]:
+        """
+        Запись временного значения, только если ключа нет
+        :return: Записано ли значение и текущее значение ключа
+        :exception ConnectionError: Ошибка подключения к серверу
+        """
+        result = self._request('POST', '/ephemeral', body={'op': 'claim', 'key': self._prefix + key, 'value': value,
+                                                           'ttl': ttl})
+        return result['claimed'], result['value']
+
+    def delete(self, key: str) -> None:
+        """
+        :exception ConnectionError: Ошибка подключения к серверу
+        """
+        self._request('POST', '/ephemeral', body={'op': 'delete', 'key': self._prefix + key})
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Gatekeeper key-value server')
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='listening address')
+    parser.add_argument('--port', type=int, default=8765, help='listening port')
+    parser.add_argument('--file', type=str, default=None, help='path to the journal file for persistent values')
+    parser.add_argument('--token', type=str, default=os.environ.get(TOKEN_ENVIRONMENT_VARIABLE),
+                        help=f'shared secret required in every request (default: environment variable '
+                             f'{TOKEN_ENVIRONMENT_VARIABLE}, required for non-loopback address)')
+    parser.add_argument(startup.PROFILE_FLAG, action='store_true',
+                        help='print import and initialization time of modules to stderr')
+    args = parser.parse_args()
+    logger.Logger().print_log = True
+    startup.enable_profiling()
+    with startup.phase('server'):
+        try:
+            kv_server = KVServer(args.host, args.port, args.file, args.token)
+        except (ValueError, IOError) as e:
+            print(f'Key-value server not started! Exception text: {e}')
+            exit(1)
+    startup.report()
+    kv_server.serve_forever()
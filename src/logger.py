@@ -4,12 +4,48 @@
 """
 Да, я знаю о существовании модуля logging. Если он вам нравится - используйте его. Мне он не заходит, так что мне легче
 скопировать свою реализацию логирования из другого проекта.
+
+Записи лога не пишутся в потоке, вызвавшем метод логирования: они ставятся в очередь, а запись в файл (открытый на всё
+время работы), консоль и syslog выполняет фоновый поток. Файл сбрасывается на диск не реже раза в FLUSH_INTERVAL
+секунд, при накоплении FLUSH_SIZE байт, при записи критической ошибки и при вызове flush/close (в том числе
+автоматически при завершении интерпретатора). Если очередь переполнена (например, диск не успевает), новые записи
+отбрасываются, а их количество записывается в лог, как только очередь освободится.
+
+Текст записи можно передавать в отложенном виде - шаблоном с аргументами (logger.Logger().info('Gate {} opened',
+gate_number)) или функцией, возвращающей текст (logger.Logger().debug(lambda: f'...')). Текст формируется, только если
+уровень записи не ниже текущего уровня логирования. Для дорогих проверок перед логированием - метод is_enabled.
+
+Файл лога может ротироваться по размеру (rotate_size) и/или по интервалу времени (rotate_interval): текущий файл
+атомарно переименовывается в сегмент <файл>.ГГГГММДД-ЧЧММСС, и запись продолжается в новый файл. Ротацию выполняет
+фоновый поток записи, поэтому потоки, вызывающие методы логирования, не ждут её. Сегменты сжимаются gzip в отдельном
+фоновом потоке, хранятся последние rotate_keep сегментов.
+
+В структурированном режиме (structured) каждая запись пишется одной строкой json с полями timestamp (unix time),
+level, component (текст в квадратных скобках в начале записи), message (остальной текст) и полями STRUCTURED_FIELDS,
+которые передаются именованными аргументами методов логирования (logger.Logger().info('[Bot] Gate №{gate} opened',
+event='open_gate', gate=1, user_id=123)) и доступны в шаблоне текста. Отсутствующие поля записываются как null.
+В syslog в этом режиме передается та же строка json с префиксом @cee: (разбирается, например, модулем mmjsonparse
+rsyslog).
+
+Записи, которые может вызвать посторонний пользователь (например, сообщения от неавторизованных пользователей),
+логируются с ключом ограничения (logger.Logger().warning('...', limit_key='authorize')): для каждого ключа пишется не
+более rate_limit записей в секунду (с запасом rate_burst), из остальных - каждая sample_rate-я. Количество подавленных
+записей добавляется к следующей записанной записи с тем же ключом, а если таких записей нет - пишется отдельной записью
+примерно через SUPPRESSION_REPORT_INTERVAL секунд. Ограничение проверяется до формирования текста записи.
 """
 
 
-import datetime
+import collections
+import threading
+import atexit
+import shutil
+import json
+import gzip
 import enum
+import time
 import os
+import re
+from typing import Callable
 
 
 try:
@@ -19,6 +55,28 @@ except ModuleNotFoundError:
     _SYSLOG_AVAILABLE = False
 
 
+# Максимальное количество записей в очереди
+QUEUE_MAX_SIZE: int = 10000
+# Максимальное время (в секундах) нахождения записи в буфере файла
+FLUSH_INTERVAL: float = 1
+# Размер буфера файла (в байтах)
+FLUSH_SIZE: int = 64 * 1024
+# Степень сжатия сегментов лога
+COMPRESS_LEVEL: int = 6
+# Поля записи в структурированном режиме, передаваемые именованными аргументами методов логирования: имя события,
+# id пользователя telegram, номер шлагбаума, длительность операции (в секундах), результат операции
+STRUCTURED_FIELDS: tuple[str, ...] = ('event', 'user_id', 'gate', 'latency', 'outcome')
+# Максимальное количество ключей ограничения частоты записей (записи с новыми ключами сверх этого количества
+# ограничиваются общим ключом)
+RATE_LIMIT_KEYS: int = 10000
+# Период (в секундах) записи количества подавленных записей, после которых не было записей с тем же ключом
+SUPPRESSION_REPORT_INTERVAL: float = 60
+
+
+# Кодировщик json (реализация на C, без проверки циклических ссылок; неподдерживаемые значения приводятся к строке)
+_JSON_ENCODER = json.JSONEncoder(ensure_ascii=False, check_circular=False, separators=(',', ':'), default=str)
+
+
 class LogLevel(enum.Enum):
     DEBUG = 0
     INFO = 1
@@ -35,9 +93,19 @@ class Logger:
     _DEFAULT_FILE_PATH: str = 'gatekeeper.log'
 
     _current_log_level: LogLevel = LogLevel.INFO
+    # Числовое значение текущего уровня (для быстрой проверки уровня записи)
+    _current_log_level_value: int = LogLevel.INFO.value
     _printer: bool = False
     _force_use_file_log: bool = False
     _file_path: str | None = None
+    _atexit_registered: bool = False
+    _rotate_size: int = 0
+    _rotate_interval: float = 0
+    _rotate_keep: int = 5
+    _structured: bool = False
+    _rate_limit: float = 1
+    _rate_burst: int = 20
+    _sample_rate: int = 100
 
     @property
     def log_level(self) -> LogLevel:
@@ -47,6 +115,7 @@ class Logger:
     def log_level(self, value: LogLevel) -> None:
         if isinstance(value, LogLevel):
             self._current_log_level = value
+            self._current_log_level_value = value.value
 
     @property
     def print_log(self) -> bool:
@@ -96,6 +165,91 @@ class Logger:
             self._init_file_path()
         self._force_use_file_log = value
 
+    @property
+    def rotate_size(self) -> int:
+        """
+        Размер файла лога (в байтах), при достижении которого файл ротируется (0 - ротация по размеру отключена)
+        """
+        return self._rotate_size
+
+    @rotate_size.setter
+    def rotate_size(self, value: int) -> None:
+        if isinstance(value, int) and not isinstance(value, bool) and value >= 0:
+            self._rotate_size = value
+
+    @property
+    def rotate_interval(self) -> float:
+        """
+        Интервал (в секундах) ротации файла лога, отсчитываемый от начала эпохи unix: при 86400 файл ротируется раз в
+        сутки (полночь по UTC) (0 - ротация по времени отключена)
+        """
+        return self._rotate_interval
+
+    @rotate_interval.setter
+    def rotate_interval(self, value: float) -> None:
+        if isinstance(value, (int, float)) and not isinstance(value, bool) and value >= 0:
+            self._rotate_interval = value
+
+    @property
+    def rotate_keep(self) -> int:
+        """
+        Количество хранимых сегментов лога (0 - хранить все)
+        """
+        return self._rotate_keep
+
+    @rotate_keep.setter
+    def rotate_keep(self, value: int) -> None:
+        if isinstance(value, int) and not isinstance(value, bool) and value >= 0:
+            self._rotate_keep = value
+
+    @property
+    def structured(self) -> bool:
+        """
+        Запись лога строками json
+        """
+        return self._structured
+
+    @structured.setter
+    def structured(self, value: bool) -> None:
+        if isinstance(value, bool):
+            self._structured = value
+
+    @property
+    def rate_limit(self) -> float:
+        """
+        Количество записей в секунду для одного ключа ограничения (0 - ограничение отключено)
+        """
+        return self._rate_limit
+
+    @rate_limit.setter
+    def rate_limit(self, value: float) -> None:
+        if isinstance(value, (int, float)) and not isinstance(value, bool) and value >= 0:
+            self._rate_limit = value
+
+    @property
+    def rate_burst(self) -> int:
+        """
+        Количество записей с одним ключом ограничения, которые могут быть записаны подряд без ограничения частоты
+        """
+        return self._rate_burst
+
+    @rate_burst.setter
+    def rate_burst(self, value: int) -> None:
+        if isinstance(value, int) and not isinstance(value, bool) and value >= 1:
+            self._rate_burst = value
+
+    @property
+    def sample_rate(self) -> int:
+        """
+        Записывается каждая sample_rate-я запись из превысивших ограничение частоты (0 - не записывается ни одна)
+        """
+        return self._sample_rate
+
+    @sample_rate.setter
+    def sample_rate(self, value: int) -> None:
+        if isinstance(value, int) and not isinstance(value, bool) and value >= 0:
+            self._sample_rate = value
+
     def __new__(cls, *args, **kwargs):
         if cls.__instance is None:
             cls.__initialized = False
@@ -107,6 +261,30 @@ class Logger:
         if self.__initialized:
             return
         self.__initialized = True
+        self._queue: collections.deque = collections.deque()
+        self._condition = threading.Condition()
+        self._thread: threading.Thread | None = None
+        self._closing = False
+        self._flush_requested = False
+        # Количество записей: поставленных в очередь, записанных (и сброшенных на диск), отброшенных
+        self._enqueued = 0
+        self._written = 0
+        self._dropped = 0
+        self._file = None
+        # Размер текущего файла лога (в байтах) и время начала записи в него
+        self._file_size = 0
+        self._file_started = 0.0
+        # Файлы лога, сегменты которых нужно сжать, и поток сжатия
+        self._compress_pending: set[str] = set()
+        self._compressor: threading.Thread | None = None
+        # Имя и номер последнего созданного сегмента (номера сегментов, созданных в одну секунду, только растут)
+        self._last_segment: tuple[str, int] = ('', 0)
+        # Состояние ключей ограничения частоты записей: [доступные записи, время обновления, количество подавленных
+        # записей, уровень последней подавленной записи, время последней подавленной записи]
+        self._limits: dict[str, list] = dict()
+        self._limits_lock = threading.Lock()
+        self._suppressing = False
+        self._timestamp: tuple[int, str] = (0, '')
         if not isinstance(log_level, LogLevel) or not isinstance(print_log, bool) or \
                 not isinstance(force_use_file_log, bool) or not (isinstance(file_path, str) or file_path is None):
             self.log_level = LogLevel.DISABLE_LOG
@@ -115,7 +293,7 @@ class Logger:
             if not _SYSLOG_AVAILABLE:
                 self._init_file_path()
             return
-        self._current_log_level = log_level
+        self.log_level = log_level
         self._printer = print_log
         if file_path is not None:
             self.file_path = file_path
@@ -140,76 +318,432 @@ class Logger:
             except IOError:
                 self._file_path = None
 
-    def _add_log_record(self, log_level: LogLevel, text: str) -> bool:
-
-        def to_syslog() -> None:
-            syslog_priority = None
-            match log_level:
-                case LogLevel.DEBUG:
-                    syslog_priority = syslog.LOG_DEBUG
-                case LogLevel.INFO:
-                    syslog_priority = syslog.LOG_INFO
-                case LogLevel.WARNING:
-                    syslog_priority = syslog.LOG_WARNING
-                case LogLevel.ERROR:
-                    syslog_priority = syslog.LOG_ERR
-                case LogLevel.CRITICAL:
-                    syslog_priority = syslog.LOG_CRIT
-            if syslog_priority is None:
+    @staticmethod
+    def _to_syslog(log_level: LogLevel, text: str) -> None:
+        syslog_priority = None
+        match log_level:
+            case LogLevel.DEBUG:
+                syslog_priority = syslog.LOG_DEBUG
+            case LogLevel.INFO:
+                syslog_priority = syslog.LOG_INFO
+            case LogLevel.WARNING:
+                syslog_priority = syslog.LOG_WARNING
+            case LogLevel.ERROR:
+                syslog_priority = syslog.LOG_ERR
+            case LogLevel.CRITICAL:
+                syslog_priority = syslog.LOG_CRIT
+        if syslog_priority is None:
+            return None
+        syslog.syslog(syslog_priority, text)
+
+    @staticmethod
+    def _text_prefix(log_level: LogLevel) -> str:
+        match log_level:
+            case LogLevel.DEBUG:
+                return 'DEBUG'
+            case LogLevel.INFO:
+                return 'INFO'
+            case LogLevel.WARNING:
+                return 'WARNING'
+            case LogLevel.ERROR:
+                return 'ERROR'
+            case LogLevel.CRITICAL:
+                return 'CRITICAL'
+        return 'UNKNOWN'
+
+    def _format_time(self, timestamp: float) -> str:
+        """
+        Форматирование времени записи (результат кэшируется на секунду, вызывается только фоновым потоком)
+        """
+        second = int(timestamp)
+        if self._timestamp[0] != second:
+            self._timestamp = (second, time.strftime('%d-%m-%Y %H:%M:%S', time.localtime(second)))
+        return self._timestamp[1]
+
+    def is_enabled(self, log_level: LogLevel) -> bool:
+        """
+        :param log_level: Уровень записи
+        :return: Будут ли записываться записи с указанным уровнем
+        """
+        # _value_ - обычный атрибут элемента перечисления (в отличие от свойства value), его чтение в разы быстрее
+        return log_level._value_ >= self._current_log_level_value
+
+    def _add_log_record(self, log_level: LogLevel, text: str | Callable[[], str], args: tuple = (),
+                        kwargs: dict | None = None) -> bool:
+        """
+        Постановка записи в очередь
+        :param text: Текст, шаблон текста (str.format) или функция, возвращающая текст
+        :param args: Аргументы шаблона
+        :param kwargs: Именованные аргументы шаблона (аргументы с именами из STRUCTURED_FIELDS также записываются как
+        поля записи в структурированном режиме, аргумент limit_key - ключ ограничения частоты записей)
+        :return: True - запись будет записана, False - запись отброшена (уровень логирования, ограничение частоты,
+        пустой текст или переполнение очереди)
+        """
+        if log_level._value_ < self._current_log_level_value:
+            return False
+        suppressed = 0
+        if kwargs and 'limit_key' in kwargs:
+            suppressed = self._limit(kwargs.pop('limit_key'), log_level)
+            if suppressed is None:
+                return False
+        try:
+            if callable(text):
+                text = text()
+            elif len(args) > 0 or kwargs:
+                text = text.format(*args, **kwargs)
+        except Exception as e:
+            text = f'{text!r} (log record formatting failed: {e})'
+        if not isinstance(text, str) or len(text) < 1:
+            return False
+        if suppressed > 0:
+            text += f' (suppressed {suppressed} similar records)'
+        fields = None
+        if kwargs:
+            fields = {name: kwargs[name] for name in STRUCTURED_FIELDS if name in kwargs}
+        with self._condition:
+            if len(self._queue) >= QUEUE_MAX_SIZE:
+                self._dropped += 1
+                return False
+            self._queue.append((time.time(), log_level, text, fields))
+            self._enqueued += 1
+            if log_level == LogLevel.CRITICAL:
+                self._flush_requested = True
+            if self._thread is None:
+                self._start()
+            self._condition.notify()
+        return True
+
+    def _limit(self, key: str, log_level: LogLevel) -> int | None:
+        """
+        Проверка ограничения частоты записей
+        :param key: Ключ ограничения
+        :param log_level: Уровень записи
+        :return: None - запись подавлена, иначе - количество подавленных до неё записей с тем же ключом
+        """
+        if self._rate_limit <= 0:
+            return 0
+        now = time.monotonic()
+        with self._limits_lock:
+            state = self._limits.get(key)
+            if state is None:
+                if len(self._limits) >= RATE_LIMIT_KEYS:
+                    key = '*'
+                    state = self._limits.get(key)
+                if state is None:
+                    state = self._limits[key] = [float(self._rate_burst), now, 0, log_level, now]
+            state[0] = min(float(self._rate_burst), state[0] + (now - state[1]) * self._rate_limit)
+            state[1] = now
+            if state[0] >= 1:
+                state[0] -= 1
+            elif self._sample_rate == 0 or (state[2] + 1) % self._sample_rate != 0:
+                state[2] += 1
+                state[3] = log_level
+                state[4] = now
+                self._suppressing = True
                 return None
-            syslog.syslog(syslog_priority, text)
-
-        def get_text_prefix() -> str:
-            match log_level:
-                case LogLevel.DEBUG:
-                    return 'DEBUG'
-                case LogLevel.INFO:
-                    return 'INFO'
-                case LogLevel.WARNING:
-                    return 'WARNING'
-                case LogLevel.ERROR:
-                    return 'ERROR'
-                case LogLevel.CRITICAL:
-                    return 'CRITICAL'
-            return 'UNKNOWN'
-
-        def to_file() -> bool:
-            timestamp = datetime.datetime.now().strftime('%d-%m-%Y %H:%M:%S')
+            suppressed, state[2] = state[2], 0
+            return suppressed
+
+    def _suppression_reports(self, force: bool = False) -> list[tuple]:
+        """
+        Формирование записей о количестве подавленных записей, после которых не было записей с тем же ключом, и
+        удаление неиспользуемых ключей ограничения (вызывается только фоновым потоком)
+        :param force: Сформировать записи для всех ключей с подавленными записями (при остановке фонового потока)
+        """
+        reports = list()
+        now = time.monotonic()
+        with self._limits_lock:
+            suppressing = False
+            for key, state in list(self._limits.items()):
+                if state[2] > 0 and (force or now - state[4] >= SUPPRESSION_REPORT_INTERVAL):
+                    reports.append((time.time(), state[3], f'[Logger] Suppressed {state[2]} similar records (limit '
+                                                           f'key: {key})', None))
+                    state[2] = 0
+                elif state[2] > 0:
+                    suppressing = True
+                elif self._rate_limit <= 0 or state[0] + (now - state[1]) * self._rate_limit >= self._rate_burst:
+                    # Ключ не использовался дольше, чем нужно для восстановления запаса записей
+                    del self._limits[key]
+            self._suppressing = suppressing
+        return reports
+
+    def _start(self) -> None:
+        """
+        Запуск фонового потока записи (вызывается под блокировкой)
+        """
+        if self.__class__._atexit_registered is False:
+            atexit.register(self.close)
+            self.__class__._atexit_registered = True
+        self._closing = False
+        self._thread = threading.Thread(target=self._writer, name='logger-writer', daemon=True)
+        self._thread.start()
+
+    def _open_file(self):
+        """
+        Получение открытого файла лога (файл открывается заново при изменении пути до файла)
+        :return: Объект файла, None - запись в файл не используется или файл не удалось открыть
+        """
+        if not _SYSLOG_AVAILABLE or self._force_use_file_log:
+            path = self._file_path
+        else:
+            path = None
+        if self._file is not None and self._file.name != path:
+            self._close_file()
+        if self._file is None and path is not None:
             try:
-                with open(self._file_path, 'a', encoding='UTF-8') as f:
-                    f.write(timestamp + ' :: ' + get_text_prefix() + ' :: ' + text + '\n')
-                return True
+                self._file = open(path, 'ab', buffering=FLUSH_SIZE)
+                stat = os.fstat(self._file.fileno())
             except IOError:
-                return False
-
-        def to_console() -> None:
-            timestamp = datetime.datetime.now().strftime('%d-%m-%Y %H:%M:%S')
-            print(timestamp + ' :: ' + get_text_prefix() + ' :: ' + text + '\n')
-
-        if not isinstance(text, str) or len(text) < 1:
+                self._close_file()
+                return None
+            self._file_size = stat.st_size
+            # Для непустого файла точное время начала записи неизвестно - используется время последней записи
+            self._file_started = stat.st_mtime if stat.st_size > 0 else time.time()
+            if self._rotate_size > 0 or self._rotate_interval > 0:
+                # Сжатие сегментов, оставшихся несжатыми (например, после аварийного завершения)
+                self._schedule_compression(path)
+        return self._file
+
+    def _close_file(self) -> None:
+        if self._file is None:
+            return None
+        try:
+            self._file.close()
+        except IOError:
+            pass
+        self._file = None
+
+    def _write(self, records: collections.deque) -> bool:
+        """
+        Запись пачки записей (вызывается только фоновым потоком)
+        :return: Были ли данные записаны в файл
+        """
+        lines = list()
+        structured = self._structured
+        for timestamp, log_level, text, fields in records:
+            if structured:
+                text = self._to_json(timestamp, log_level, text, fields)
+            if self._printer or self._file is not None:
+                if structured:
+                    line = text + '\n'
+                else:
+                    line = self._format_time(timestamp) + ' :: ' + self._text_prefix(log_level) + ' :: ' + text + '\n'
+                if self._printer:
+                    try:
+                        print(line)
+                    except (IOError, ValueError):
+                        # Консоль недоступна (например, закрыт канал вывода): запись в файл/syslog продолжается
+                        pass
+                lines.append(line)
+            if _SYSLOG_AVAILABLE and not self._force_use_file_log:
+                try:
+                    self._to_syslog(log_level, '@cee:' + text if structured else text)
+                except (IOError, ValueError):
+                    pass
+        if self._file is None or len(lines) == 0:
             return False
-        if log_level.value < self._current_log_level.value:
+        data = ''.join(lines).encode('UTF-8', 'backslashreplace')
+        try:
+            self._file.write(data)
+        except IOError:
+            self._close_file()
             return False
-        if self._printer:
-            to_console()
-        if _SYSLOG_AVAILABLE and not self._force_use_file_log:
-            to_syslog()
-            return True
-        if self._file_path is None:
+        self._file_size += len(data)
+        return True
+
+    def _to_json(self, timestamp: float, log_level: LogLevel, text: str, fields: dict | None) -> str:
+        """
+        Формирование строки json записи (вызывается только фоновым потоком)
+        """
+        component = None
+        if text.startswith('['):
+            end = text.find('] ')
+            if end > 0:
+                component, text = text[1:end], text[end + 2:]
+        record = {'timestamp': round(timestamp, 3), 'level': self._text_prefix(log_level), 'component': component,
+                  'message': text}
+        for name in STRUCTURED_FIELDS:
+            record[name] = None if fields is None else fields.get(name)
+        return _JSON_ENCODER.encode(record)
+
+    def _rotation_due(self, now: float) -> bool:
+        """
+        Проверка необходимости ротации текущего файла лога (вызывается только фоновым потоком)
+        """
+        if self._file is None or self._file_size == 0:
             return False
-        return to_file()
+        if 0 < self._rotate_size <= self._file_size:
+            return True
+        interval = self._rotate_interval
+        return interval > 0 and now // interval > self._file_started // interval
+
+    def _rotate(self) -> None:
+        """
+        Ротация файла лога: файл закрывается (с записью буфера) и атомарно переименовывается в сегмент, новый файл
+        открывается при следующей записи (вызывается только фоновым потоком)
+        """
+        path = self._file.name
+        self._close_file()
+        name = f'{path}.{time.strftime("%Y%m%d-%H%M%S")}'
+        # Номер не берется у удаленного старого сегмента той же секунды: иначе новый сегмент окажется "старше"
+        # оставшихся и будет удален при очистке старых сегментов
+        index = self._last_segment[1] + 1 if self._last_segment[0] == name else 0
+        segment = name if index == 0 else f'{name}-{index}'
+        while os.path.exists(segment) or os.path.exists(segment + '.gz'):
+            index += 1
+            segment = f'{name}-{index}'
+        try:
+            os.replace(path, segment)
+        except OSError as e:
+            self.error('[Logger] Log file rotation failed! Exception text: {}', e)
+            return None
+        self._last_segment = (name, index)
+        self._schedule_compression(path)
+
+    def _schedule_compression(self, path: str) -> None:
+        """
+        Постановка в очередь сжатия сегментов файла лога и удаления старых сегментов (запускает поток сжатия)
+        :param path: Путь до файла лога
+        """
+        with self._condition:
+            self._compress_pending.add(path)
+            if self._compressor is None:
+                self._compressor = threading.Thread(target=self._compress, name='logger-compressor', daemon=True)
+                self._compressor.start()
+
+    @staticmethod
+    def _segments(path: str) -> list[tuple[str, bool]]:
+        """
+        Получение сегментов файла лога (от старых к новым)
+        :param path: Путь до файла лога
+        :return: Пути до сегментов и признак сжатия сегмента
+        """
+        directory = os.path.dirname(path) or '.'
+        pattern = re.compile(re.escape(os.path.basename(path)) + r'\.(\d{8}-\d{6})(?:-(\d+))?(\.gz)?$')
+        segments = list()
+        for name in os.listdir(directory):
+            match = pattern.match(name)
+            if match is not None:
+                order = (match.group(1), int(match.group(2) or 0))
+                segments.append((order, os.path.join(directory, name), match.group(3) is not None))
+        segments.sort()
+        return [(segment, compressed) for _, segment, compressed in segments]
+
+    def _compress(self) -> None:
+        """
+        Фоновое сжатие сегментов файлов лога и удаление сегментов сверх rotate_keep
+        """
+        while True:
+            with self._condition:
+                if len(self._compress_pending) == 0:
+                    self._compressor = None
+                    return None
+                path = self._compress_pending.pop()
+            try:
+                segments = self._segments(path)
+                for i, (segment, compressed) in enumerate(segments):
+                    if compressed:
+                        continue
+                    # Сжатие во временный файл, чтобы прерванное сжатие не оставило поврежденный сегмент
+                    with open(segment, 'rb') as src, gzip.open(segment + '.gz.tmp', 'wb', COMPRESS_LEVEL) as dst:
+                        shutil.copyfileobj(src, dst, FLUSH_SIZE)
+                    os.replace(segment + '.gz.tmp', segment + '.gz')
+                    os.remove(segment)
+                    segments[i] = (segment + '.gz', True)
+                if self._rotate_keep > 0:
+                    for segment, _ in segments[:-self._rotate_keep]:
+                        os.remove(segment)
+            except OSError as e:
+                self.error('[Logger] Log segments compression failed! Exception text: {}', e)
+
+    def _writer(self) -> None:
+        """
+        Фоновая запись накопленных записей
+        """
+        dirty = False
+        flushed_at = time.monotonic()
+        reported_at = time.monotonic()
+        while True:
+            if dirty:
+                timeout = FLUSH_INTERVAL
+            else:
+                timeout = SUPPRESSION_REPORT_INTERVAL if self._suppressing else None
+            with self._condition:
+                self._condition.wait_for(lambda: len(self._queue) > 0 or self._flush_requested or self._closing,
+                                         timeout)
+                records, self._queue = self._queue, collections.deque()
+                dropped, self._dropped = self._dropped, 0
+                flush, self._flush_requested = self._flush_requested or self._closing, False
+                closing = self._closing
+                enqueued = self._enqueued
+            if dropped > 0:
+                records.append((time.time(), LogLevel.WARNING, f'[Logger] {dropped} log records dropped: queue is '
+                                                               f'full', None))
+            if closing or time.monotonic() - reported_at >= SUPPRESSION_REPORT_INTERVAL:
+                records.extend(self._suppression_reports(force=closing))
+                reported_at = time.monotonic()
+            self._open_file()
+            if self._rotation_due(time.time()):
+                self._rotate()
+                dirty = False
+                self._open_file()
+            dirty = self._write(records) or dirty
+            if dirty and (flush or time.monotonic() - flushed_at >= FLUSH_INTERVAL):
+                try:
+                    self._file.flush()
+                except (IOError, AttributeError):
+                    self._close_file()
+                dirty = False
+                flushed_at = time.monotonic()
+            with self._condition:
+                if not dirty:
+                    self._written = enqueued
+                    self._condition.notify_all()
+                if closing and len(self._queue) == 0:
+                    self._close_file()
+                    self._thread = None
+                    self._condition.notify_all()
+                    return None
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """
+        Ожидание записи всех поставленных в очередь записей
+        :param timeout: Максимальное время ожидания (в секундах)
+        :return: True - все записи записаны, False - истекло время ожидания
+        """
+        with self._condition:
+            if self._thread is None:
+                return True
+            enqueued = self._enqueued
+            self._flush_requested = True
+            self._condition.notify_all()
+            return self._condition.wait_for(lambda: self._written >= enqueued or self._thread is None, timeout)
+
+    def close(self, timeout: float | None = 5) -> bool:
+        """
+        Запись всех записей из очереди, закрытие файла лога и остановка фонового потока (поток будет запущен снова
+        при следующей записи)
+        :param timeout: Максимальное время ожидания (в секундах)
+        :return: True - все записи записаны, False - истекло время ожидания
+        """
+        with self._condition:
+            if self._thread is None:
+                return True
+            self._closing = True
+            self._condition.notify_all()
+            return self._condition.wait_for(lambda: self._thread is None, timeout)
 
-    def debug(self, text: str) -> bool:
-        return self._add_log_record(LogLevel.DEBUG, text)
+    def debug(self, text: str | Callable[[], str], *args, **kwargs) -> bool:
+        return self._add_log_record(LogLevel.DEBUG, text, args, kwargs)
 
-    def info(self, text: str) -> bool:
-        return self._add_log_record(LogLevel.INFO, text)
+    def info(self, text: str | Callable[[], str], *args, **kwargs) -> bool:
+        return self._add_log_record(LogLevel.INFO, text, args, kwargs)
 
-    def warning(self, text: str) -> bool:
-        return self._add_log_record(LogLevel.WARNING, text)
+    def warning(self, text: str | Callable[[], str], *args, **kwargs) -> bool:
+        return self._add_log_record(LogLevel.WARNING, text, args, kwargs)
 
-    def error(self, text: str) -> bool:
-        return self._add_log_record(LogLevel.ERROR, text)
+    def error(self, text: str | Callable[[], str], *args, **kwargs) -> bool:
+        return self._add_log_record(LogLevel.ERROR, text, args, kwargs)
 
-    def critical(self, text: str) -> bool:
-        return self._add_log_record(LogLevel.CRITICAL, text)
+    def critical(self, text: str | Callable[[], str], *args, **kwargs) -> bool:
+        return self._add_log_record(LogLevel.CRITICAL, text, args, kwargs)
@@ -2,7 +2,23 @@
 # -*- coding: utf-8 -*-
 
 
+"""
+Точка входа бота: настройка (-s), миграция настроек (-m) и запуск бота.
+
+Модули бота и сторонние модули (telebot, requests) импортируются в функциях, которым они нужны (см. модуль startup),
+поэтому справка, настройка и миграция запускаются без их загрузки. Флаг --profile-startup выводит время импорта модулей
+и этапов запуска.
+"""
+
+
+import startup
+startup.enable_profiling()
+
+
 import argparse
+import threading
+import signal
+import json
 import re
 import os
 
@@ -16,18 +32,8 @@ except ModuleNotFoundError:
     SYSLOG_AVAILABLE = False
 
 
-try:
-    import telebot
-except ModuleNotFoundError:
-    print('Module "PyTelegramBotAPI" not found! Please install required modules from file "requirements.txt"')
-    exit(1)
-
-
-import telegram.exceptions
-import telegram.helpers
-import telegram.bot
-import gatekeeper
 import settings
+import storage
 import logger
 
 
@@ -36,6 +42,10 @@ def setup(config_path: str | None = None) -> None:
     Интерактивный метод для создания файла конфигурации
     :param config_path: Путь до будущего файла конфигурации
     """
+    import telegram.exceptions
+    import telegram.helpers
+    import gatekeeper
+    startup.report()
     if config_path is None:
         config_path = settings.Settings().file_path
     if os.path.exists(config_path) and os.path.isfile(config_path):
@@ -149,9 +159,9 @@ def setup(config_path: str | None = None) -> None:
         print('Ошибка получения id пользователя телеграм. Попробуй произвести установку заново.')
         return None
     telegram_configuration = settings.TelegramData(bot_token=token,
-                                                   access_list=list(),
+                                                   access_list=settings.AccessList(),
                                                    phone_owner=phone_owner,
-                                                   invite_codes=list())
+                                                   invite_codes=settings.InviteCodes())
     config = settings.Settings(config_path)
     try:
         config.data = settings.SettingsData(gatekeeper=gatekeeper_configuration, telegram=telegram_configuration)
@@ -173,6 +183,105 @@ def setup(config_path: str | None = None) -> None:
         return None
 
 
+def migrate(destination_path: str, config_path: str | None = None) -> None:
+    """
+    Перенос настроек в другое хранилище (например из json файла в базу данных SQLite)
+    :param destination_path: Путь до нового файла конфигурации
+    :param config_path: Путь до текущего файла конфигурации
+    """
+    if config_path is None:
+        config_path = settings.Settings().file_path
+    try:
+        if storage.open_storage(destination_path).exists():
+            print('Файл для переноса конфигурации уже существует!')
+            return None
+    except (ValueError, IOError) as e:
+        print(f'Ошибка проверки хранилища для переноса конфигурации! (Текст ошибки: {e})')
+        return None
+    try:
+        storage.migrate(config_path, destination_path)
+    except IOError as e:
+        print(f'Ошибка переноса конфигурации! (Текст ошибки: {e})')
+        return None
+    print(f'Конфигурация перенесена в файл {destination_path}. Для использования укажи его при запуске бота (аргумент '
+          f'-c) или в переменной среды GATEKEEPER_CONF.')
+
+
+def load_offset(offset_path: str) -> int:
+    """
+    Загрузка id последнего обработанного обновления telegram
+    :param offset_path: Путь до файла с id обновления
+    :return: id обновления (0 - файл отсутствует или поврежден)
+    """
+    if not os.path.isfile(offset_path):
+        return 0
+    try:
+        with open(offset_path, 'r') as f:
+            offset = json.load(f).get('last_update_id', 0)
+    except Exception as e:
+        logger.Logger().warning(f'[Main] Reading telegram updates offset failed! Exception text: {e}')
+        return 0
+    if not isinstance(offset, int) or offset < 0:
+        return 0
+    return offset
+
+
+def save_offset(offset_path: str, offset: int) -> bool:
+    """
+    Сохранение id последнего обработанного обновления telegram
+    :param offset_path: Путь до файла с id обновления
+    :param offset: id обновления
+    :return: Статус сохранения
+    """
+    try:
+        with open(offset_path + '.tmp', 'w') as f:
+            json.dump({'last_update_id': offset}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(offset_path + '.tmp', offset_path)
+        return True
+    except Exception as e:
+        logger.Logger().error(f'[Main] Saving telegram updates offset failed! Exception text: {e}')
+        return False
+
+
+def reload_config(bot: 'telebot.TeleBot') -> None:
+    """
+    Повторная загрузка файла конфигурации (и настроек логирования) без остановки бота
+    :param bot: Объект запущенного бота
+    """
+    config = settings.Settings()
+    lane_workers = config.data.bot.lane_workers
+    try:
+        if not config.load():
+            logger.Logger().error('[Main] Configuration file not reloaded! Previous configuration is used')
+            return None
+    except IOError as e:
+        logger.Logger().error(f'[Main] Configuration file cannot be read! Previous configuration is used. Exception '
+                              f'text: {e}')
+        return None
+    if bot.token != config.data.telegram.bot_token:
+        bot.token = config.data.telegram.bot_token
+        logger.Logger().info('[Main] Telegram bot token changed')
+    if lane_workers != config.data.bot.lane_workers:
+        logger.Logger().warning('[Main] Lane workers count changed. Restart required to apply it')
+    logger.Logger().info('[Main] Configuration file reloaded')
+
+
+def check_gates() -> None:
+    """
+    Первичный запрос списка шлагбаумов для проверки готовности бота к работе
+    """
+    import gatekeeper
+    config = settings.Settings()
+    if config.data is None or config.data.gatekeeper.key == '':
+        return None
+    try:
+        gatekeeper.GatekeeperAPI(phone=config.data.gatekeeper.phone, key=config.data.gatekeeper.key).get_info()
+    except (ConnectionError, gatekeeper.LogoutError) as e:
+        logger.Logger().warning(f'[Main] Getting gates info failed! Exception text: {e}')
+
+
 def main(config_path: str | None = None) -> None:
     """
     :param config_path: Путь до файла конфигурации
@@ -181,34 +290,119 @@ def main(config_path: str | None = None) -> None:
         config_path = settings.Settings().file_path
     if not SYSLOG_AVAILABLE:
         logger.Logger(file_path=pathlib.Path(config_path).stem + '.log')
-    if not os.path.exists(config_path):
-        logger.Logger().critical('[Main] Configuration file not found!')
-        return None
+    if storage.is_local(config_path):
+        if not os.path.exists(config_path):
+            logger.Logger().critical('[Main] Configuration file not found!')
+            return None
+        try:
+            f = open(config_path, 'r+')
+            f.close()
+        except Exception as e:
+            logger.Logger().critical(f'[Main] Configuration file cannot be read! Exception text: {e}')
+            return None
+    config = settings.Settings(file_path=config_path)
     try:
-        f = open(config_path, 'r+')
-        f.close()
-    except Exception as e:
+        with startup.phase('configuration'):
+            if not config.load():
+                logger.Logger().critical('[Main] Configuration file not loaded!')
+                return None
+    except IOError as e:
         logger.Logger().critical(f'[Main] Configuration file cannot be read! Exception text: {e}')
         return None
-    config = settings.Settings(file_path=config_path)
+    with startup.phase('bot modules import'):
+        import telegram.broadcast
+        import telegram.lanes
+        import telegram.auth
+        import telegram.bot
+        import scheduled_tasks
+        import scheduler
+        import metrics
+        import telebot
+        import audit
+        import state
+    with startup.phase('bot and handlers'):
+        bot = telebot.TeleBot(config.data.telegram.bot_token, threaded=False, use_class_middlewares=True)
+        bot.setup_middleware(telegram.auth.AuthMiddleware())
+        metrics.track_polling(bot)
+        dispatcher = telegram.lanes.Lanes(config.data.bot.lane_workers)
+        # Служебные файлы экземпляра бота хранятся локально, даже если настройки общие (на сервере ключ-значение)
+        instance_path = storage.local_path(config.file_path)
+        broadcaster = telegram.broadcast.Broadcaster(bot, instance_path + '.broadcast',
+                                                     workers=config.data.bot.broadcast_workers,
+                                                     rate=config.data.bot.broadcast_rate)
+        audit_log = audit.AuditLog(instance_path + '.audit')
+        telegram.bot.handlers(bot, dispatcher, broadcaster, audit_log)
+    with startup.phase('broadcast resume'):
+        broadcaster.resume(telegram.bot.broadcast_reporter(bot, config.data.telegram.phone_owner))
+    health_server = None
+    if config.data.bot.health_port > 0:
+        with startup.phase('health server'):
+            import health
+            try:
+                health_server = health.HealthServer(config.data.bot.health_host, config.data.bot.health_port,
+                                                    dispatcher)
+                health_server.start()
+            except OSError as e:
+                logger.Logger().error(f'[Main] Health server not started! Exception text: {e}')
+        threading.Thread(target=check_gates, name='gates-check', daemon=True).start()
+    offset_path = instance_path + '.offset'
+    bot.last_update_id = load_offset(offset_path)
+    stopping = threading.Event()
+    tasks = None
+    if config.data.bot.scheduler:
+        with startup.phase('scheduler'):
+            tasks = scheduler.Scheduler(scheduled_tasks.jobs(scheduled_tasks.bot_notifier(),
+                                                             state.open_state(config.file_path)))
+            tasks.start()
+    startup.report()
+
+    def stop(signum, _) -> None:
+        logger.Logger().info(f'[Main] Received signal {signal.Signals(signum).name}. Stopping. . .')
+        stopping.set()
+        bot.stop_polling()
+
+    def reload(*_) -> None:
+        threading.Thread(target=reload_config, args=(bot,), name='config-reload').start()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    if hasattr(signal, 'SIGHUP'):
+        signal.signal(signal.SIGHUP, reload)
     try:
-        if not config.load():
-            logger.Logger().critical('[Main] Configuration file not loaded!')
-            return None
-    except IOError:
-        logger.Logger().critical(f'[Main] Configuration file cannot be read!')
-        return None
-    bot = telebot.TeleBot(config.data.telegram.bot_token)
-    telegram.bot.handlers(bot)
-    bot.infinity_polling(skip_pending=True)
+        if not stopping.is_set():
+            bot.infinity_polling()
+    finally:
+        if not dispatcher.drain(config.data.bot.drain_timeout):
+            logger.Logger().error(f'[Main] {dispatcher.in_flight} handlers not finished in '
+                                  f'{config.data.bot.drain_timeout} seconds!')
+        dispatcher.shutdown(wait=False)
+        broadcaster.stop(config.data.bot.drain_timeout)
+        if tasks is not None and not tasks.stop(config.data.bot.drain_timeout):
+            logger.Logger().error('[Main] Not all scheduled tasks finished!')
+        if health_server is not None:
+            health_server.stop()
+        if not config.flush(config.data.bot.drain_timeout):
+            logger.Logger().error('[Main] Not all configuration changes saved!')
+        save_offset(offset_path, bot.last_update_id)
+        audit_log.close()
+        logger.Logger().info('[Main] Bot stopped')
+        logger.Logger().close()
 
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Gatekeeper telegram bot')
     parser.add_argument('-s', '--setup', action='store_true', help='setup dialog')
     parser.add_argument('-c', '--config', type=str, default=None, help='path to the configuration file')
+    parser.add_argument('-m', '--migrate', type=str, default=None, metavar='DESTINATION',
+                        help='copy the configuration to another storage (.db/.sqlite/.sqlite3 - SQLite, '
+                             'kv://host:port/namespace - key-value server, other - json)')
+    parser.add_argument(startup.PROFILE_FLAG, action='store_true',
+                        help='print import and initialization time of modules to stderr')
     args = parser.parse_args()
     if args.setup:
         setup(args.config)
+    elif args.migrate is not None:
+        migrate(args.migrate, args.config)
     else:
         main(args.config)
+    startup.report()
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+
+
+"""
+Сбор показателей работы бота: время выполнения обработчиков, результаты запросов к серверу приложения "ПривратникЪ",
+состояние соединения с серверами telegram. Показатели хранятся только в памяти процесса и отдаются встроенным
+http-сервером (см. модуль health).
+"""
+
+
+import collections
+import threading
+import functools
+import time
+
+
+class Metrics:
+    __instance = None
+    __initialized: bool = False
+
+    _SAMPLES: int = 256
+
+    def __new__(cls, *args, **kwargs):
+        if cls.__instance is None:
+            cls.__instance = super().__new__(cls)
+        return cls.__instance
+
+    def __init__(self):
+        if self.__initialized:
+            return
+        self.__initialized = True
+        self._lock = threading.Lock()
+        self._started = time.time()
+        self._latencies: dict[str, collections.deque] = dict()
+        self._upstream: dict[str, collections.deque] = dict()
+        self._upstream_consecutive_errors = 0
+        self._key_valid: bool | None = None
+        self._gates_count: int | None = None
+        self._telegram_poll_attempt: float | None = None
+        self._telegram_poll_success: float | None = None
+
+    def handler_latency(self, lane: str, seconds: float) -> None:
+        """
+        Учет времени обработки команды (с учетом ожидания в очереди)
+        :param lane: Имя полосы (приоритета) обработчика
+        :param seconds: Время обработки
+        """
+        with self._lock:
+            if lane not in self._latencies:
+                self._latencies[lane] = collections.deque(maxlen=self._SAMPLES)
+            self._latencies[lane].append(seconds)
+
+    def upstream_result(self, method: str, ok: bool, seconds: float) -> None:
+        """
+        Учет результата запроса к серверу приложения "ПривратникЪ"
+        :param method: Имя метода api
+        :param ok: Успешность запроса
+        :param seconds: Время выполнения запроса
+        """
+        with self._lock:
+            if method not in self._upstream:
+                self._upstream[method] = collections.deque(maxlen=self._SAMPLES)
+            self._upstream[method].append((ok, seconds))
+            if ok:
+                self._upstream_consecutive_errors = 0
+            else:
+                self._upstream_consecutive_errors += 1
+
+    def key_status(self, valid: bool) -> None:
+        self._key_valid = valid
+
+    def gates_loaded(self, count: int) -> None:
+        self._gates_count = count
+
+    def telegram_polled(self, ok: bool) -> None:
+        now = time.time()
+        self._telegram_poll_attempt = now
+        if ok:
+            self._telegram_poll_success = now
+
+    def seconds_since_poll(self, success: bool = False) -> float | None:
+        """
+        :param success: Учитывать только успешные запросы обновлений
+        :return: Время с последнего запроса обновлений telegram (None - запросов не было)
+        """
+        timestamp = self._telegram_poll_success if success else self._telegram_poll_attempt
+        if timestamp is None:
+            return None
+        return time.time() - timestamp
+
+    @property
+    def key_valid(self) -> bool | None:
+        return self._key_valid
+
+    @property
+    def gates_count(self) -> int | None:
+        return self._gates_count
+
+    def snapshot(self) -> dict:
+        """
+        :return: Словарь с текущими показателями
+        """
+
+        def percentiles(samples: list) -> dict:
+            if len(samples) == 0:
+                return dict()
+            samples = sorted(samples)
+            return {f'p{p}': round(samples[min(len(samples) - 1, len(samples) * p // 100)], 4) for p in (50, 90, 99)}
+
+        with self._lock:
+            latencies = {lane: list(samples) for lane, samples in self._latencies.items()}
+            upstream = {method: list(samples) for method, samples in self._upstream.items()}
+            consecutive_errors = self._upstream_consecutive_errors
+        result = {
+            'uptime': round(time.time() - self._started, 1),
+            'handler_latency': {lane: percentiles(samples) for lane, samples in latencies.items()},
+            'upstream': {
+                'consecutive_errors': consecutive_errors,
+                'methods': {method: {'requests': len(samples),
+                                     'error_rate': round(sum(1 for ok, _ in samples if not ok) / len(samples), 4),
+                                     'latency': percentiles([seconds for _, seconds in samples])}
+                            for method, samples in upstream.items()}
+            },
+            'gatekeeper': {
+                'key_valid': self._key_valid,
+                'gates_count': self._gates_count
+            },
+            'telegram': {
+                'seconds_since_poll': self.seconds_since_poll(),
+                'seconds_since_successful_poll': self.seconds_since_poll(success=True)
+            }
+        }
+        return result
+
+
+def track_upstream(method: str, logout_error: type[Exception] | None = None):
+    """
+    Декоратор для методов api приложения "ПривратникЪ", учитывающий результат и время выполнения запроса
+    :param method: Имя метода api
+    :param logout_error: Тип исключения, сигнализирующего об аннулировании api ключа
+    """
+
+    def decorator(func):
+
+        @functools.wraps(func)
+        def updated_function(*args, **kwargs):
+            start = time.monotonic()
+            try:
+                result = func(*args, **kwargs)
+            except ConnectionError:
+                Metrics().upstream_result(method, False, time.monotonic() - start)
+                raise
+            except Exception as e:
+                if logout_error is not None and isinstance(e, logout_error):
+                    Metrics().upstream_result(method, True, time.monotonic() - start)
+                    Metrics().key_status(False)
+                raise
+            Metrics().upstream_result(method, True, time.monotonic() - start)
+            if method == 'get_info' and isinstance(result, list):
+                Metrics().key_status(True)
+                Metrics().gates_loaded(len(result))
+            return result
+
+        return updated_function
+
+    return decorator
+
+
+def track_polling(bot) -> None:
+    """
+    Учет запросов обновлений telegram ботом (используется для проверки доступности серверов telegram)
+    :param bot: Объект telebot.TeleBot
+    """
+    get_updates = bot.get_updates
+
+    @functools.wraps(get_updates)
+    def updated_function(*args, **kwargs):
+        try:
+            result = get_updates(*args, **kwargs)
+        except Exception:
+            Metrics().telegram_polled(False)
+            raise
+        Metrics().telegram_polled(True)
+        return result
+
+    bot.get_updates = updated_function
@@ -3,80 +3,208 @@
 
 
 """
-Метод предназначенный для периодического выполнения, не зависимо от основной части проекта. Это необходимо для
-отслеживания состояния api ключа приложения "ПривратникЪ".
-Рекомендуемая частота выполнения данного скрипта: не менее 1 раза в день в дневное время.
+Периодические задачи бота:
+* key_check - проверка состояния api ключа приложения "ПривратникЪ" и оповещение владельца телефона о необходимости
+повторного входа (не чаще раза в KEY_ALERT_INTERVAL секунд)
+* gates_refresh - обновление кэша списка шлагбаумов (bot -> gate_cache_ttl), чтобы запросы пользователей не ждали
+ответа сервера приложения
+* invites_sweep - удаление просроченных кодов приглашения
+* log_rotation - проверка необходимости ротации файла лога по времени, даже если в лог ничего не пишется
+
+Задачи выполняются планировщиком (модуль scheduler) в процессе бота (bot -> scheduler). Для запуска задач отдельно от
+бота: scheduled_tasks.py -d (постоянно работающий процесс) или scheduled_tasks.py (однократная проверка api ключа, для
+запуска из cron).
 """
 
 
+import startup
+startup.enable_profiling()
+
+
+import threading
 import argparse
+import hashlib
+import signal
+from typing import Callable
 
 
-import telegram.exceptions
 import telegram.helpers
 import telegram.texts
 import gatekeeper
+import scheduler
 import settings
+import logger
+import state
 
 
-class CheckKeyError(Exception):
-    pass
+# Минимальный интервал (в секундах) между повторными оповещениями о необходимости входа
+KEY_ALERT_INTERVAL: float = 24 * 60 * 60
+# Интервал (в секундах) проверки необходимости ротации файла лога
+LOG_ROTATION_CHECK_INTERVAL: float = 60
 
 
-def key_alert(config_path: str | None) -> None:
+def key_check(notify: Callable[[list[int], str], dict[int, str]],
+              shared_state: state.SharedState) -> Callable[[], None]:
     """
-    Проверка состояния api ключа приложения ПривратникЪ и оповещение пользователя (владельца телефона) о необходимости
-    его обновления
-    :param config_path: (необязательный) Путь до файла конфигурации
+    Создание задачи проверки состояния api ключа приложения ПривратникЪ
+    :param notify: Функция отправки сообщения (см. bot_notifier)
+    :param shared_state: Общее состояние экземпляров бота (оповещение отправляет только один из них)
     """
 
-    def check_key() -> bool:
-        """
-        Проверка статуса действия api ключа приложения ПривратникЪ
-        :exception CheckKeyError: Ошибка проверки состояния api ключа
-        :return: Текущее состояние api ключа
-        """
-        config = settings.Settings(config_path)
+    def check() -> None:
+        config = settings.Settings()
+        config.refresh()
+        data = config.data
+        # Пустой ключ (например, сброшенный командой /login) также требует повторного входа
+        if len(data.gatekeeper.key) > 0:
+            try:
+                gatekeeper.GatekeeperAPI(phone=data.gatekeeper.phone, key=data.gatekeeper.key).get_info(refresh=True)
+                return None
+            except gatekeeper.LogoutError:
+                pass
+            except ConnectionError as e:
+                logger.Logger().warning(f'[Scheduled tasks::key check] Api key check failed! Exception text: {e}')
+                return None
+            logger.Logger().warning('[Scheduled tasks::key check] Api key expired! Resign in required!')
+        else:
+            logger.Logger().warning('[Scheduled tasks::key check] Api key is not set! Resign in required!')
+        if data.telegram.phone_owner < 1:
+            logger.Logger().error('[Scheduled tasks::key check] Telegram user id of phone number owner is not '
+                                  'specified!')
+            return None
+        # Оповещение об истекшем ключе отправляется одно на ключ за KEY_ALERT_INTERVAL (на все экземпляры бота)
+        key_hash = hashlib.sha256(data.gatekeeper.key.encode()).hexdigest()[:16]
+        try:
+            claimed, _ = shared_state.claim(f'key_alert/{key_hash}', True, KEY_ALERT_INTERVAL)
+        except ConnectionError:
+            claimed = True
+        if not claimed:
+            return None
         try:
-            if not config.load():
-                raise CheckKeyError('Loading gatekeeper configuration file failed!')
-        except IOError:
-            raise CheckKeyError('Reading gatekeeper configuration file failed!')
-        if len(config.data.gatekeeper.key) == 0:
-            return True
-        api = gatekeeper.GatekeeperAPI(phone=config.data.gatekeeper.phone, key=config.data.gatekeeper.key)
+            result = notify([data.telegram.phone_owner], telegram.texts.SCHEDULED_MESSAGE)[data.telegram.phone_owner]
+        except Exception as e:
+            result = repr(e)
+        if result == 'sent':
+            return None
         try:
-            api.get_info()
-        except gatekeeper.LogoutError:
-            return True
-        except gatekeeper.WrongServerAnswerError:
-            raise CheckKeyError('Wrong gatekeeper server answer!')
-        return False
+            shared_state.delete(f'key_alert/{key_hash}')
+        except ConnectionError:
+            pass
+        logger.Logger().error(f'[Scheduled tasks::key check] Sending message about requesting a new login failed! '
+                              f'Result: {result}')
+
+    return check
+
+
+def gates_refresh(shared_state: state.SharedState) -> None:
+    """
+    Обновление кэша списка шлагбаумов
+    """
+    data = settings.Settings().data
+    if len(data.gatekeeper.key) == 0 or data.bot.gate_cache_ttl <= 0:
+        return None
+    try:
+        gatekeeper.GatekeeperAPI(phone=data.gatekeeper.phone, key=data.gatekeeper.key, cache=shared_state,
+                                 cache_ttl=data.bot.gate_cache_ttl).get_info(refresh=True)
+    except (ConnectionError, gatekeeper.LogoutError) as e:
+        logger.Logger().warning(f'[Scheduled tasks::gates refresh] Getting gates info failed! Exception text: {e!r}')
 
+
+def invites_sweep() -> None:
+    """
+    Удаление просроченных кодов приглашения
+    """
     try:
-        status = check_key()
-    except CheckKeyError:
-        status = False
-    if status:
-        try:
-            config = settings.Settings(config_path)
-            config.load()
-        except IOError:
-            print('[Scheduled tasks] Reading gatekeeper configuration file failed!')
-            return None
-        if config.data.telegram.phone_owner < 1:
-            print('[Scheduled tasks] Telegram user id of phone number owner is not specified! Resign in required!')
+        removed = settings.Settings().remove_expired_invites()
+    except IOError as e:
+        logger.Logger().error(f'[Scheduled tasks::invites sweep] Expired invite codes not removed! Exception '
+                              f'text: {e}')
+        return None
+    if len(removed) > 0:
+        logger.Logger().info(f'[Scheduled tasks::invites sweep] Expired invite codes removed: {len(removed)}')
+
+
+def log_rotation() -> None:
+    """
+    Проверка необходимости ротации файла лога (фоновый поток записи лога проверяет её при каждом пробуждении)
+    """
+    logger.Logger().flush()
+
+
+def jobs(notify: Callable[[list[int], str], dict[int, str]], shared_state: state.SharedState) -> list[scheduler.Job]:
+    """
+    Периодические задачи бота
+    :param notify: Функция отправки сообщения (см. bot_notifier)
+    :param shared_state: Общее состояние экземпляров бота
+    """
+    config = settings.Settings()
+    return [
+        scheduler.Job('key_check', key_check(notify, shared_state), lambda: config.data.bot.key_check_interval),
+        scheduler.Job('gates_refresh', lambda: gates_refresh(shared_state),
+                      lambda: config.data.bot.gate_refresh_interval, delay=0),
+        scheduler.Job('invites_sweep', invites_sweep, lambda: config.data.bot.invite_sweep_interval),
+        scheduler.Job('log_rotation', log_rotation,
+                      lambda: LOG_ROTATION_CHECK_INTERVAL if logger.Logger().rotate_interval > 0 else 0)
+    ]
+
+
+def bot_notifier() -> Callable[[list[int], str], dict[int, str]]:
+    """
+    Создание функции отправки сообщения (в формате markdown) нескольким получателям ботом с токеном из текущих настроек.
+    Функция принимает id чатов и текст сообщения и возвращает результат отправки для каждого чата (sent / blocked /
+    failed)
+    """
+
+    def notify(chat_ids: list[int], text: str) -> dict[int, str]:
+        return telegram.helpers.send_messages(settings.Settings().data.telegram.bot_token, chat_ids, text)
+
+    return notify
+
+
+def run(config_path: str | None, daemon: bool) -> None:
+    """
+    Выполнение задач отдельно от бота
+    :param config_path: (необязательно) Путь до файла конфигурации
+    :param daemon: True - постоянная работа планировщика, False - однократная проверка api ключа
+    """
+    config = settings.Settings(config_path)
+    try:
+        with startup.phase('configuration'):
+            loaded = config.load()
+        if not loaded:
+            print('[Scheduled tasks] Loading gatekeeper configuration file failed!')
             return None
-        print('[Scheduled tasks] Api key excepted! Resign in required!')
-        try:
-            telegram.helpers.send_message(token=config.data.telegram.bot_token,
-                                          chat_id=config.data.telegram.phone_owner,
-                                          message=telegram.texts.SCHEDULED_MESSAGE)
-        except ConnectionError or telegram.exceptions.WrongServerAnswerError:
-            print('[Scheduled tasks] Sending message about requesting a new login failed!')
+    except IOError as e:
+        print(f'[Scheduled tasks] Reading gatekeeper configuration file failed! Exception text: {e}')
+        return None
+    shared_state = state.open_state(config.file_path)
+    if not daemon:
+        logger.Logger().print_log = True
+        key_check(bot_notifier(), shared_state)()
+        logger.Logger().close()
+        return None
+    stopping = threading.Event()
+    tasks = scheduler.Scheduler(jobs(bot_notifier(), shared_state))
+    signal.signal(signal.SIGTERM, lambda *_: stopping.set())
+    signal.signal(signal.SIGINT, lambda *_: stopping.set())
+    with startup.phase('scheduler'):
+        tasks.start()
+    startup.report()
+    try:
+        stopping.wait()
+    finally:
+        tasks.stop(config.data.bot.drain_timeout)
+        config.flush(config.data.bot.drain_timeout)
+        logger.Logger().info('[Scheduled tasks] Scheduler stopped')
+        logger.Logger().close()
 
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Gatekeeper scheduled tasks')
     parser.add_argument('-c', '--config', type=str, default=None, help='custom configuration file')
-    key_alert(parser.parse_args().config)
+    parser.add_argument('-d', '--daemon', action='store_true', help='run all periodic tasks until stopped')
+    parser.add_argument(startup.PROFILE_FLAG, action='store_true',
+                        help='print import and initialization time of modules to stderr')
+    args = parser.parse_args()
+    run(args.config, args.daemon)
+    startup.report()
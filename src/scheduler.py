@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+
+
+"""
+Планировщик периодических задач, работающий в процессе бота (или отдельно - scheduled_tasks.py -d).
+
+Задачи описываются объектами Job: имя, функция и интервал запуска (число или функция, возвращающая текущее значение
+интервала, например, из настроек - изменения интервала применяются без перезапуска). Каждый запуск задачи выполняется в
+отдельном потоке, поэтому долгая задача не задерживает остальные. Если предыдущий запуск задачи ещё не завершен, новый
+запуск пропускается. Время каждого запуска сдвигается на случайную величину (не более jitter * интервал), чтобы
+задачи нескольких экземпляров бота не выполнялись одновременно.
+"""
+
+
+import dataclasses
+import threading
+import random
+import time
+from typing import Callable
+
+
+import logger
+
+
+# Интервал (в секундах) повторной проверки интервала отключенной задачи
+DISABLED_RECHECK_INTERVAL: float = 60
+
+
+@dataclasses.dataclass
+class Job:
+    name: str
+    func: Callable[[], None]
+    # Интервал запуска (в секундах, 0 - задача отключена)
+    interval: float | Callable[[], float]
+    # Максимальный случайный сдвиг времени запуска (доля интервала)
+    jitter: float = 0.1
+    # Задержка (в секундах) первого запуска (None - через интервал после запуска планировщика)
+    delay: float | None = None
+
+
+class Scheduler:
+    def __init__(self, jobs: list[Job]):
+        """
+        :param jobs: Задачи
+        """
+        self._jobs = list(jobs)
+        self._condition = threading.Condition()
+        self._stopping = False
+        self._thread: threading.Thread | None = None
+        # Потоки выполняющихся задач и время следующего запуска задач
+        self._running: dict[str, threading.Thread] = dict()
+        self._next_run: dict[str, float] = dict()
+
+    @property
+    def jobs(self) -> list[Job]:
+        return list(self._jobs)
+
+    @staticmethod
+    def _interval(job: Job) -> float:
+        """
+        Текущий интервал запуска задачи (ошибка получения интервала отключает задачу до следующей проверки)
+        """
+        try:
+            interval = job.interval() if callable(job.interval) else job.interval
+        except Exception as e:
+            logger.Logger().error('[Scheduler] Getting interval of job "{}" failed! Exception text: {}', job.name, e)
+            return 0
+        if not isinstance(interval, int | float) or isinstance(interval, bool) or interval <= 0:
+            return 0
+        return interval
+
+    def _schedule(self, job: Job, now: float, first: bool = False) -> None:
+        """
+        Расчет времени следующего запуска задачи (вызывается под блокировкой)
+        """
+        interval = self._interval(job)
+        if interval == 0:
+            self._next_run[job.name] = now + DISABLED_RECHECK_INTERVAL
+            return None
+        delay = interval if not first or job.delay is None else job.delay
+        self._next_run[job.name] = now + delay + random.uniform(0, interval * max(job.jitter, 0))
+
+    def start(self) -> None:
+        with self._condition:
+            if self._thread is not None:
+                return None
+            self._stopping = False
+            now = time.monotonic()
+            for job in self._jobs:
+                self._schedule(job, now, first=True)
+            self._thread = threading.Thread(target=self._loop, name='scheduler', daemon=True)
+            self._thread.start()
+        logger.Logger().info(f'[Scheduler] Scheduler started ({len(self._jobs)} jobs)')
+
+    def _loop(self) -> None:
+        """
+        Запуск задач по расписанию
+        """
+        with self._condition:
+            while not self._stopping:
+                now = time.monotonic()
+                for job in self._jobs:
+                    if self._next_run[job.name] > now:
+                        continue
+                    if self._interval(job) > 0:
+                        self._launch(job)
+                    self._schedule(job, now)
+                self._condition.wait(max(min(self._next_run.values(), default=now + DISABLED_RECHECK_INTERVAL) - now,
+                                         0))
+
+    def _launch(self, job: Job) -> None:
+        """
+        Запуск задачи в отдельном потоке (вызывается под блокировкой)
+        """
+        thread = self._running.get(job.name)
+        if thread is not None and thread.is_alive():
+            logger.Logger().warning('[Scheduler] Job "{}" is still running. Run skipped', job.name)
+            return None
+        thread = threading.Thread(target=self._run, args=(job,), name=f'job-{job.name}', daemon=True)
+        self._running[job.name] = thread
+        thread.start()
+
+    @staticmethod
+    def _run(job: Job) -> None:
+        started = time.monotonic()
+        try:
+            job.func()
+        except Exception as e:
+            logger.Logger().error('[Scheduler] Job "{}" failed! Exception text: {}', job.name, e)
+            return None
+        logger.Logger().debug(lambda: f'[Scheduler] Job "{job.name}" finished in {time.monotonic() - started:.3f} '
+                                      f'seconds')
+
+    def run_now(self, name: str) -> bool:
+        """
+        Внеочередной запуск задачи
+        :param name: Имя задачи
+        :return: Найдена ли задача
+        """
+        with self._condition:
+            for job in self._jobs:
+                if job.name == name:
+                    self._launch(job)
+                    return True
+        return False
+
+    def stop(self, timeout: float | None = None) -> bool:
+        """
+        Остановка планировщика с ожиданием завершения выполняющихся задач
+        :param timeout: Максимальное время ожидания (в секундах)
+        :return: True - все задачи завершены, False - истекло время ожидания
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+            thread, self._thread = self._thread, None
+            running = list(self._running.values())
+        if thread is not None:
+            thread.join()
+        for job_thread in running:
+            job_thread.join(None if deadline is None else max(deadline - time.monotonic(), 0))
+            if job_thread.is_alive():
+                return False
+        return True
@@ -6,6 +6,26 @@
 
 Данные хранятся в json файле. По умолчанию файл настроек храниться в рабочей директории и называется gatekeeper.conf,
 однако можно указать иной путь через переменную среды "GATEKEEPER_CONF" или с помощью аргумента в конструкторе объекта.
+Если путь до файла заканчивается на .db, .sqlite или .sqlite3, настройки хранятся в базе данных SQLite (см. модуль
+storage). Изменения списков пользователей и кодов приглашения (методы add_user, remove_user, add_invite и т.д.)
+сохраняются сразу, без перезаписи остальных настроек.
+
+Вместо пути до файла можно указать адрес сервера ключ-значение (kv://секрет@хост:порт/пространство_имен, см. модули kv и
+storage): тогда настройки, пользователи и коды приглашения общие для всех экземпляров бота, использующих этот адрес, в
+том числе на разных узлах. Изменения, внесенные другими экземплярами, подхватываются так же, как изменения файла (метод
+refresh).
+
+Данные настроек (объект SettingsData) - неизменяемый снимок: методы изменения настроек создают новый снимок и заменяют
+ссылку на него после сохранения изменений, поэтому чтение настроек выполняется без блокировок. Полученный через
+свойство data снимок не изменяется, даже если настройки были изменены другим потоком. Цена такого подхода - запись:
+каждое изменение списка пользователей или кодов приглашения копирует весь список (время и память O(n) от размера
+списка), чтение при этом не замедляется.
+
+Несколько процессов могут одновременно изменять один файл настроек: изменения, внесенные другим процессом, не
+теряются (см. модуль storage), а данные в памяти загружаются заново после объединения изменений.
+
+Изменения файла настроек, внесенные вручную или другим процессом, подхватываются методом refresh: он не чаще раза в
+bot -> reload_interval секунд проверяет, изменился ли файл, и только в этом случае загружает настройки заново.
 
 Пример файла настроек:
 {
@@ -17,13 +37,42 @@
         "bot_token": "base64 encoded string",
         "access_list": [tg_id_1, tg_id_2, ...],
         "phone_owner": tg_id_3,
-        "invite_codes": ["x", "y", "z"]
+        "invite_codes": ["x", "y", "z"],
+        "users": {"tg_id_1": {"username": "name", "invited_by": tg_id_3, "invite_code": "x", "added": 1700000000}},
+        "invites": {"y": {"created_by": tg_id_3, "created": 1700000000, "expires": 1700086400, "max_uses": 3,
+                          "used": 1}}
     },
     "logger": {
         "level": 1,
         "print_log"
         "force_use_file": false,
-        "file_path": "/path/to/file.log"
+        "file_path": "/path/to/file.log",
+        "rotate_size": 104857600,
+        "rotate_interval": 86400,
+        "rotate_keep": 5,
+        "structured": false,
+        "rate_limit": 1,
+        "rate_burst": 20,
+        "sample_rate": 100
+    },
+    "bot": {
+        "open_dedupe_window": 5,
+        "handler_priorities": {"open_gate": "high", "video": "low"},
+        "lane_workers": {"high": 2, "normal": 1, "low": 1},
+        "pending_max_age": 300,
+        "drain_timeout": 30,
+        "health_host": "127.0.0.1",
+        "health_port": 8080,
+        "broadcast_workers": 8,
+        "broadcast_rate": 25,
+        "write_delay": 0.5,
+        "reload_interval": 5,
+        "invite_codes_max": 1000,
+        "invite_sweep_interval": 60,
+        "gate_cache_ttl": 60,
+        "scheduler": true,
+        "key_check_interval": 3600,
+        "gate_refresh_interval": 50
     }
 }
 
@@ -37,42 +86,485 @@
     - phone_owner - id пользователя имеющего доступ к номеру телефона, который используется в api привратника
     - invite_codes - список одноразовых кодов, которые будут использоваться для добавление нового пользователя в список
 пользователей
+    - users - (необязательно) дополнительная информация о пользователях из списка access_list: имя пользователя, id
+пригласившего пользователя, код приглашения и время добавления (unix time)
+    - invites - (необязательно) дополнительная информация о кодах приглашения: id создавшего код пользователя, время
+создания и время истечения срока действия (unix time), максимальное и текущее количество активаций кода (по умолчанию
+код одноразовый и бессрочный)
 - logger - (необязательно) настройки логирования
     - level - (необязательно) уровень логирования, принимаемые значения 0-5 (по умолчанию: 1)
     - print_log - (необязательно) дублирование записи лога в консоль (по умолчанию: false)
     - force_use_file - (необязательно) принудительная запись лога в файл (актуально для linux систем, по умолчанию: false)
     - file_path - (необязательно) путь до файла, куда будет писаться логи (по умолчанию: %current_dir%/gatekeeper.log)
+    - rotate_size - (необязательно) размер файла лога (в байтах), по достижении которого файл ротируется:
+переименовывается в сегмент file_path.ГГГГММДД-ЧЧММСС, сжимаемый gzip (по умолчанию: 0 - ротация по размеру отключена)
+    - rotate_interval - (необязательно) интервал (в секундах) ротации файла лога, отсчитываемый от начала эпохи
+unix (86400 - ротация в полночь по UTC, по умолчанию: 0 - ротация по времени отключена)
+    - rotate_keep - (необязательно) количество хранимых сегментов лога (по умолчанию: 5, 0 - хранить все)
+    - structured - (необязательно) запись лога строками json с полями timestamp, level, component, message, event,
+user_id, gate, latency, outcome (по умолчанию: false)
+    - rate_limit - (необязательно) количество записей в секунду, вызванных одним источником (например, сообщениями
+неавторизованных пользователей), сверх которого записи подавляются (по умолчанию: 1, 0 - без ограничения)
+    - rate_burst - (необязательно) количество записей одного источника, записываемых подряд без ограничения
+(по умолчанию: 20)
+    - sample_rate - (необязательно) из подавленных записей записывается каждая sample_rate-я (по умолчанию: 100, 0 -
+подавленные записи не записываются). Количество подавленных записей записывается в лог
+- bot - (необязательно) параметры работы обработчиков бота
+    - open_dedupe_window - (необязательно) окно (в секундах), в течение которого повторные запросы на открытие того же
+шлагбаума присоединяются к уже выполняемому/выполненному запросу (по умолчанию: 0 - отключено)
+    - handler_priorities - (необязательно) приоритеты обработчиков команд (high / normal / low). Имена обработчиков:
+open_gate, sms, activate_invite, login, invite, block, cancel, broadcast, start_and_help, video, list, history
+    - lane_workers - (необязательно) количество потоков для обработчиков каждого приоритета (по умолчанию: high - 2,
+normal - 1, low - 1)
+    - pending_max_age - (необязательно) максимальный возраст (в секундах) сообщений, накопившихся пока бот был
+остановлен. Более старые сообщения не обрабатываются (по умолчанию: 300, 0 - обрабатывать все)
+    - drain_timeout - (необязательно) время (в секундах), в течение которого при остановке бота ожидается завершение
+обработки уже полученных команд (по умолчанию: 30)
+    - health_host - (необязательно) адрес http-сервера проверки состояния бота (по умолчанию: 127.0.0.1)
+    - health_port - (необязательно) порт http-сервера проверки состояния бота (по умолчанию: 0 - сервер отключен)
+    - broadcast_workers - (необязательно) количество потоков отправки сообщений при рассылке (по умолчанию: 8)
+    - broadcast_rate - (необязательно) максимальное количество сообщений в секунду при рассылке (по умолчанию: 25)
+    - write_delay - (необязательно) задержка (в секундах) сохранения изменений в json файл настроек: изменения,
+внесенные в течение задержки, сохраняются одной записью файла и вступают в силу после неё (по умолчанию: 0 -
+изменения сохраняются сразу)
+    - reload_interval - (необязательно) минимальный интервал (в секундах) между проверками изменения файла настроек
+(по умолчанию: 5, 0 - не проверять)
+    - invite_codes_max - (необязательно) максимальное количество действующих кодов приглашения (по умолчанию: 1000)
+    - invite_sweep_interval - (необязательно) интервал (в секундах) удаления просроченных кодов приглашения (по
+умолчанию: 60)
+    - gate_cache_ttl - (необязательно) время (в секундах), в течение которого используется ранее полученный список
+шлагбаумов (общий для экземпляров бота при хранении настроек на сервере ключ-значение, по умолчанию: 0 - список
+запрашивается каждый раз)
+    - scheduler - (необязательно) выполнение периодических задач (см. модуль scheduled_tasks) в процессе бота. Если
+задачи выполняются отдельным процессом (scheduled_tasks.py -d), следует отключить (по умолчанию: true)
+    - key_check_interval - (необязательно) интервал (в секундах) проверки api ключа приложения "ПривратникЪ" (по
+умолчанию: 3600, 0 - не проверять)
+    - gate_refresh_interval - (необязательно) интервал (в секундах) обновления кэша списка шлагбаумов, должен быть
+меньше gate_cache_ttl (по умолчанию: 0 - не обновлять)
 """
 
 
 import dataclasses
+import threading
+import secrets
+import string
 import base64
-import json
+import bisect
+import heapq
+import enum
+import time
 import os
 import re
+from typing import Callable, Iterable
 
 
+import storage
 import logger
 
 
-@dataclasses.dataclass
+_PRIORITIES = ('high', 'normal', 'low')
+
+
+class Role(enum.Enum):
+    GUEST = 0
+    USER = 1
+    OWNER = 2
+
+
+@dataclasses.dataclass(frozen=True)
 class GatekeeperData:
     phone: int
     key: str
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True)
+class UserInfo:
+    user_id: int
+    username: str | None = None
+    invited_by: int | None = None
+    invite_code: str | None = None
+    added: int | None = None
+
+
+@dataclasses.dataclass(frozen=True)
+class InviteInfo:
+    code: str
+    created_by: int | None = None
+    created: int | None = None
+    expires: int | None = None
+    max_uses: int | None = None
+    used: int | None = None
+
+    def expired(self, now: float | None = None) -> bool:
+        """
+        :param now: (необязательно) Текущее время (unix time)
+        :return: Истек ли срок действия кода
+        """
+        if self.expires is None:
+            return False
+        return (time.time() if now is None else now) >= self.expires
+
+    @property
+    def uses_left(self) -> int:
+        """
+        Оставшееся количество активаций кода (по умолчанию код одноразовый)
+        """
+        return (1 if self.max_uses is None else self.max_uses) - (0 if self.used is None else self.used)
+
+
+class AccessList:
+    """
+    Список авторизованных пользователей. Хранится в словаре (id пользователя -> информация о пользователе), поэтому
+    проверка наличия выполняется за постоянное время. Для постраничного просмотра (метод page) используется
+    отсортированный индекс id пользователей, который создается при первом обращении и затем поддерживается при
+    изменении списка и его копировании, поэтому при созданном индексе добавление и удаление пользователя выполняются
+    за O(n). Опубликованный в снимке настроек список не изменяется: изменения вносятся в копию (метод copy, O(n))
+    """
+
+    def __init__(self, users: Iterable = ()):
+        """
+        :param users: id пользователей или объекты UserInfo
+        :exception TypeError: Неверный тип id пользователя
+        """
+        self._users: dict[int, UserInfo] = dict()
+        self._index: list[int] | None = None
+        self._frozen = False
+        for user in users:
+            self.add(user)
+
+    def freeze(self) -> None:
+        """
+        Запрет изменения списка (для списков, опубликованных в снимке настроек)
+        """
+        self._frozen = True
+
+    def copy(self) -> 'AccessList':
+        """
+        Копирование словаря пользователей и индекса (время и память O(n))
+        :return: Изменяемая копия списка
+        """
+        result = AccessList()
+        result._users = dict(self._users)
+        result._index = None if self._index is None else list(self._index)
+        return result
+
+    def add(self, user: int | UserInfo) -> bool:
+        """
+        :param user: id пользователя или объект UserInfo
+        :return: True - пользователь добавлен, False - пользователь уже в списке
+        :exception TypeError: Неверный тип id пользователя
+        """
+        if isinstance(user, int) and not isinstance(user, bool):
+            user = UserInfo(user_id=user)
+        if not isinstance(user, UserInfo) or not isinstance(user.user_id, int) or isinstance(user.user_id, bool):
+            raise TypeError('Wrong type of telegram user id (access list)')
+        if self._frozen:
+            raise TypeError('Access list is read-only')
+        if user.user_id in self._users:
+            return False
+        self._users[user.user_id] = user
+        if self._index is not None:
+            bisect.insort(self._index, user.user_id)
+        return True
+
+    def remove(self, user_id: int) -> UserInfo | None:
+        """
+        :return: Информация об удаленном пользователе (None - пользователя нет в списке)
+        :exception TypeError: Список опубликован в снимке настроек и не может быть изменен
+        """
+        if self._frozen:
+            raise TypeError('Access list is read-only')
+        user = self._users.pop(user_id, None)
+        if user is not None and self._index is not None:
+            del self._index[bisect.bisect_left(self._index, user_id)]
+        return user
+
+    def get(self, user_id: int) -> UserInfo | None:
+        return self._users.get(user_id)
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._users
+
+    def __iter__(self):
+        return iter(list(self._users))
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+    def to_list(self) -> list:
+        return list(self._users)
+
+    def page(self, after: int | None = None, before: int | None = None,
+             limit: int = 10) -> tuple[int, list[UserInfo]]:
+        """
+        Страница списка пользователей, упорядоченного по id
+        :param after: (необязательно) Курсор: страница начинается с пользователя, следующего за пользователем с этим id
+        :param before: (необязательно) Курсор: страница заканчивается пользователем, предшествующим пользователю с
+        этим id
+        :param limit: Количество пользователей на странице
+        :return: Порядковый номер (с 0) первого пользователя страницы и пользователи страницы
+        """
+        if self._index is None:
+            self._index = sorted(self._users)
+        start, end = _page(self._index, after, before, limit)
+        return start, [self._users[user_id] for user_id in self._index[start:end]]
+
+    def metadata(self) -> dict:
+        """
+        :return: Дополнительная информация о пользователях в формате файла настроек
+        """
+        result = dict()
+        for user in list(self._users.values()):
+            info = {key: value for key, value in dataclasses.asdict(user).items() if key != 'user_id' and
+                    value is not None}
+            if len(info) > 0:
+                result[str(user.user_id)] = info
+        return result
+
+    @classmethod
+    def from_json(cls, access_list: list, metadata: dict | None = None) -> 'AccessList':
+        """
+        :param access_list: Список id пользователей
+        :param metadata: Дополнительная информация о пользователях в формате файла настроек
+        :exception TypeError: Неверный тип id пользователя
+        """
+        if not isinstance(metadata, dict):
+            metadata = dict()
+        result = cls()
+        for user_id in access_list:
+            info = metadata.get(str(user_id))
+            if not isinstance(info, dict):
+                info = dict()
+            result.add(UserInfo(user_id=user_id,
+                                username=_typed(info.get('username'), str),
+                                invited_by=_typed(info.get('invited_by'), int),
+                                invite_code=_typed(info.get('invite_code'), str),
+                                added=_typed(info.get('added'), int)))
+        return result
+
+
+class InviteCodes:
+    """
+    Список кодов приглашения. Хранится в словаре (код -> информация о коде), поэтому проверка наличия кода выполняется
+    за постоянное время. Коды с ограниченным сроком действия дополнительно хранятся в куче, упорядоченной по времени
+    истечения срока, поэтому проверка наличия просроченных кодов выполняется за постоянное время. При созданном индексе
+    для постраничного просмотра добавление и удаление кода выполняются за O(n). Опубликованный в снимке настроек список
+    не изменяется: изменения вносятся в копию (метод copy, O(n))
+    """
+
+    def __init__(self, codes: Iterable = ()):
+        """
+        :param codes: Коды приглашения или объекты InviteInfo
+        :exception TypeError: Неверный тип кода приглашения
+        """
+        self._codes: dict[str, InviteInfo] = dict()
+        # Куча (время истечения срока, код). Записи удаленных кодов удаляются из кучи при извлечении просроченных кодов
+        self._expiry: list[tuple[int, str]] = list()
+        # Отсортированный индекс кодов для постраничного просмотра (создается при первом обращении)
+        self._index: list[str] | None = None
+        self._frozen = False
+        for code in codes:
+            self.add(code)
+
+    def freeze(self) -> None:
+        """
+        Запрет изменения списка (для списков, опубликованных в снимке настроек)
+        """
+        self._frozen = True
+
+    def copy(self) -> 'InviteCodes':
+        """
+        Копирование словаря кодов, кучи и индекса (время и память O(n))
+        :return: Изменяемая копия списка
+        """
+        result = InviteCodes()
+        result._codes = dict(self._codes)
+        result._expiry = list(self._expiry)
+        result._index = None if self._index is None else list(self._index)
+        return result
+
+    def add(self, code: str | InviteInfo) -> bool:
+        """
+        :param code: Код приглашения или объект InviteInfo
+        :return: True - код добавлен, False - код уже в списке или пустой
+        :exception TypeError: Неверный тип кода приглашения
+        """
+        if isinstance(code, str):
+            code = InviteInfo(code=code)
+        if not isinstance(code, InviteInfo) or not isinstance(code.code, str):
+            raise TypeError('Wrong type of telegram invite code')
+        if self._frozen:
+            raise TypeError('Invite codes list is read-only')
+        if len(code.code) == 0 or code.code in self._codes:
+            return False
+        self._codes[code.code] = code
+        if code.expires is not None:
+            heapq.heappush(self._expiry, (code.expires, code.code))
+        if self._index is not None:
+            bisect.insort(self._index, code.code)
+        return True
+
+    def remove(self, code: str) -> InviteInfo | None:
+        """
+        :return: Информация об удаленном коде (None - кода нет в списке)
+        :exception TypeError: Список опубликован в снимке настроек и не может быть изменен
+        """
+        if self._frozen:
+            raise TypeError('Invite codes list is read-only')
+        invite = self._codes.pop(code, None)
+        if invite is not None:
+            self._unindex(code)
+        return invite
+
+    def _unindex(self, code: str) -> None:
+        if self._index is not None:
+            del self._index[bisect.bisect_left(self._index, code)]
+
+    def get(self, code: str) -> InviteInfo | None:
+        return self._codes.get(code)
+
+    @property
+    def next_expiry(self) -> int | None:
+        """
+        Ближайшее время истечения срока действия кода (может относиться к уже удаленному коду)
+        """
+        return self._expiry[0][0] if len(self._expiry) > 0 else None
+
+    def remove_expired(self, now: float) -> list[InviteInfo]:
+        """
+        Удаление просроченных кодов
+        :param now: Текущее время (unix time)
+        :return: Информация об удаленных кодах
+        :exception TypeError: Список опубликован в снимке настроек и не может быть изменен
+        """
+        if self._frozen:
+            raise TypeError('Invite codes list is read-only')
+        removed = list()
+        while len(self._expiry) > 0 and self._expiry[0][0] <= now:
+            expires, code = heapq.heappop(self._expiry)
+            invite = self._codes.get(code)
+            if invite is not None and invite.expires == expires:
+                removed.append(self._codes.pop(code))
+                self._unindex(code)
+        return removed
+
+    def __contains__(self, code: str) -> bool:
+        return code in self._codes
+
+    def __iter__(self):
+        return iter(list(self._codes))
+
+    def __len__(self) -> int:
+        return len(self._codes)
+
+    def to_list(self) -> list:
+        return list(self._codes)
+
+    def page(self, after: str | None = None, before: str | None = None,
+             limit: int = 10) -> tuple[int, list[InviteInfo]]:
+        """
+        Страница списка кодов приглашения, упорядоченного по коду
+        :param after: (необязательно) Курсор: страница начинается с кода, следующего за этим кодом
+        :param before: (необязательно) Курсор: страница заканчивается кодом, предшествующим этому коду
+        :param limit: Количество кодов на странице
+        :return: Порядковый номер (с 0) первого кода страницы и коды страницы
+        """
+        if self._index is None:
+            self._index = sorted(self._codes)
+        start, end = _page(self._index, after, before, limit)
+        return start, [self._codes[code] for code in self._index[start:end]]
+
+    def metadata(self) -> dict:
+        """
+        :return: Дополнительная информация о кодах в формате файла настроек
+        """
+        result = dict()
+        for invite in list(self._codes.values()):
+            info = {key: value for key, value in dataclasses.asdict(invite).items() if key != 'code' and
+                    value is not None}
+            if len(info) > 0:
+                result[invite.code] = info
+        return result
+
+    @classmethod
+    def from_json(cls, invite_codes: list, metadata: dict | None = None) -> 'InviteCodes':
+        """
+        :param invite_codes: Список кодов приглашения
+        :param metadata: Дополнительная информация о кодах в формате файла настроек
+        :exception TypeError: Неверный тип кода приглашения
+        """
+        if not isinstance(metadata, dict):
+            metadata = dict()
+        result = cls()
+        for code in invite_codes:
+            info = metadata.get(code) if isinstance(code, str) else None
+            if not isinstance(info, dict):
+                info = dict()
+            result.add(InviteInfo(code=code,
+                                  created_by=_typed(info.get('created_by'), int),
+                                  created=_typed(info.get('created'), int),
+                                  expires=_typed(info.get('expires'), int),
+                                  max_uses=_typed(info.get('max_uses'), int),
+                                  used=_typed(info.get('used'), int)))
+        return result
+
+
+def _page(index: list, after=None, before=None, limit: int = 10) -> tuple[int, int]:
+    """
+    Вспомогательный метод для постраничного просмотра: границы страницы в отсортированном индексе (бинарный поиск
+    курсора, поэтому стоимость не зависит от длины списка)
+    :return: Индексы начала и конца (не включительно) страницы
+    """
+    if before is not None:
+        end = bisect.bisect_left(index, before)
+        return max(0, end - limit), end
+    start = 0 if after is None else bisect.bisect_right(index, after)
+    return start, min(len(index), start + limit)
+
+
+def _typed(value, value_type: type):
+    """
+    Вспомогательный метод для загрузки необязательных значений: возвращает значение, если оно нужного типа, иначе None
+    """
+    if isinstance(value, value_type) and not isinstance(value, bool):
+        return value
+    return None
+
+
+@dataclasses.dataclass(frozen=True)
 class TelegramData:
     bot_token: str
-    access_list: list
+    access_list: AccessList
     phone_owner: int
-    invite_codes: list
+    invite_codes: InviteCodes
+
+
+@dataclasses.dataclass(frozen=True)
+class BotData:
+    open_dedupe_window: float = 0
+    handler_priorities: dict = dataclasses.field(default_factory=dict)
+    lane_workers: dict = dataclasses.field(default_factory=dict)
+    pending_max_age: int = 300
+    drain_timeout: int = 30
+    health_host: str = '127.0.0.1'
+    health_port: int = 0
+    broadcast_workers: int = 8
+    broadcast_rate: float = 25
+    write_delay: float = 0
+    reload_interval: float = 5
+    invite_codes_max: int = 1000
+    invite_sweep_interval: int = 60
+    gate_cache_ttl: float = 0
+    scheduler: bool = True
+    key_check_interval: float = 3600
+    gate_refresh_interval: float = 0
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True)
 class SettingsData:
     gatekeeper: GatekeeperData
     telegram: TelegramData
+    bot: BotData = dataclasses.field(default_factory=BotData)
 
 
 class Settings:
@@ -83,6 +575,7 @@ class Settings:
 
     _data: SettingsData | None = None
     _file_path: str
+    _storage: storage.Storage
 
     def __new__(cls, *args, **kwargs):
         if cls.__instance is None:
@@ -108,7 +601,13 @@ class Settings:
                 self._file_path = self.__DEFAULT_FILE_PATH
             else:
                 self._file_path = file_path
+        self._storage = storage.open_storage(self._file_path)
         self._data = None
+        # Снимок настроек с изменениями, ожидающими отложенной записи (публикуется после их сохранения)
+        self._pending: SettingsData | None = None
+        self._write_lock = threading.RLock()
+        self._refresh_lock = threading.Lock()
+        self._checked = 0
         if autoload:
             self.load()
 
@@ -128,56 +627,429 @@ class Settings:
         """
         if not isinstance(value, SettingsData):
             raise TypeError('Wrong root value type')
-        if not isinstance(value.gatekeeper, GatekeeperData) or not isinstance(value.telegram, TelegramData):
-            raise TypeError('Wrong gatekeeper or telegram data type')
+        if not isinstance(value.gatekeeper, GatekeeperData) or not isinstance(value.telegram, TelegramData) or \
+           not isinstance(value.bot, BotData):
+            raise TypeError('Wrong gatekeeper, telegram or bot data type')
         if not isinstance(value.gatekeeper.phone, int) or not isinstance(value.gatekeeper.key, str):
             raise TypeError('Wrong gatekeeper phone/key data type')
         if len(str(value.gatekeeper.phone)) not in (10, 11) or len(value.gatekeeper.key) not in (0, 32):
             raise ValueError('Wrong gatekeeper phone/key data')
-        if not isinstance(value.telegram.bot_token, str) or not isinstance(value.telegram.access_list, list) or \
-           not isinstance(value.telegram.phone_owner, int) or not isinstance(value.telegram.invite_codes, list):
+        if isinstance(value.telegram.access_list, list):
+            value = self._with_telegram(value, access_list=AccessList(value.telegram.access_list))
+        if isinstance(value.telegram.invite_codes, list):
+            value = self._with_telegram(value, invite_codes=InviteCodes(value.telegram.invite_codes))
+        if not isinstance(value.telegram.bot_token, str) or not isinstance(value.telegram.access_list, AccessList) or \
+           not isinstance(value.telegram.phone_owner, int) or not isinstance(value.telegram.invite_codes, InviteCodes):
             raise TypeError('Wrong telegram data type')
         if not re.search(r'^[0-9]{8,10}:[a-zA-Z0-9_-]{35}$', value.telegram.bot_token):
             raise ValueError('Wrong telegram bot token')
-        for user_id in value.telegram.access_list:
-            if not isinstance(user_id, int):
-                raise TypeError('Wrong type of telegram user id (access list)')
-        for code in value.telegram.invite_codes:
-            if not isinstance(code, str):
-                raise TypeError('Wrong type of telegram invite code')
-            if len(code) == 0:
-                value.telegram.invite_codes.remove(code)
-        self._data = value
+        if not isinstance(value.bot.open_dedupe_window, int | float) or isinstance(value.bot.open_dedupe_window, bool):
+            raise TypeError('Wrong type of open dedupe window')
+        if value.bot.open_dedupe_window < 0:
+            raise ValueError('Wrong open dedupe window')
+        if not isinstance(value.bot.handler_priorities, dict) or not isinstance(value.bot.lane_workers, dict):
+            raise TypeError('Wrong type of handler priorities or lane workers')
+        for handler_name, priority in value.bot.handler_priorities.items():
+            if not isinstance(handler_name, str) or priority not in _PRIORITIES:
+                raise ValueError('Wrong handler priority')
+        for priority, workers in value.bot.lane_workers.items():
+            if priority not in _PRIORITIES or not isinstance(workers, int) or workers < 1:
+                raise ValueError('Wrong lane workers count')
+        if not isinstance(value.bot.pending_max_age, int) or not isinstance(value.bot.drain_timeout, int):
+            raise TypeError('Wrong type of pending max age or drain timeout')
+        if value.bot.pending_max_age < 0 or value.bot.drain_timeout < 0:
+            raise ValueError('Wrong pending max age or drain timeout')
+        if not isinstance(value.bot.health_host, str) or not isinstance(value.bot.health_port, int):
+            raise TypeError('Wrong type of health server host or port')
+        if not 0 <= value.bot.health_port <= 65535:
+            raise ValueError('Wrong health server port')
+        if not isinstance(value.bot.broadcast_workers, int) or not isinstance(value.bot.broadcast_rate, int | float):
+            raise TypeError('Wrong type of broadcast workers or rate')
+        if value.bot.broadcast_workers < 1 or value.bot.broadcast_rate <= 0:
+            raise ValueError('Wrong broadcast workers or rate')
+        if not isinstance(value.bot.write_delay, int | float) or isinstance(value.bot.write_delay, bool):
+            raise TypeError('Wrong type of write delay')
+        if value.bot.write_delay < 0:
+            raise ValueError('Wrong write delay')
+        if not isinstance(value.bot.reload_interval, int | float) or isinstance(value.bot.reload_interval, bool):
+            raise TypeError('Wrong type of reload interval')
+        if value.bot.reload_interval < 0:
+            raise ValueError('Wrong reload interval')
+        if not isinstance(value.bot.invite_codes_max, int) or not isinstance(value.bot.invite_sweep_interval, int):
+            raise TypeError('Wrong type of invite codes max count or sweep interval')
+        if value.bot.invite_codes_max < 1 or value.bot.invite_sweep_interval < 1:
+            raise ValueError('Wrong invite codes max count or sweep interval')
+        if not isinstance(value.bot.gate_cache_ttl, int | float) or isinstance(value.bot.gate_cache_ttl, bool):
+            raise TypeError('Wrong type of gate cache ttl')
+        if value.bot.gate_cache_ttl < 0:
+            raise ValueError('Wrong gate cache ttl')
+        if not isinstance(value.bot.scheduler, bool):
+            raise TypeError('Wrong type of scheduler flag')
+        for interval in (value.bot.key_check_interval, value.bot.gate_refresh_interval):
+            if not isinstance(interval, int | float) or isinstance(interval, bool):
+                raise TypeError('Wrong type of key check or gate refresh interval')
+            if interval < 0:
+                raise ValueError('Wrong key check or gate refresh interval')
+        value.telegram.access_list.freeze()
+        value.telegram.invite_codes.freeze()
+        with self._write_lock:
+            self._data = value
+        if isinstance(self._storage, storage.JSONStorage):
+            self._storage.write_delay = value.bot.write_delay
 
-    def save(self) -> bool:
+    def role(self, user_id: int) -> Role:
         """
-        Сохранение данных в конфигурационный файл
-        :return: True - данные сохранены, False - ошибка в данных/пути до файла
-        :exception IOError: Ошибка записи файла
+        Определение роли пользователя (за постоянное время, независимо от количества пользователей)
+        :param user_id: id пользователя telegram
+        :return: Роль пользователя
         """
-        if self.data is None or self._file_path is None or self._file_path == '':
-            return False
-        data = {
+        data = self._data
+        if data is None:
+            return Role.GUEST
+        if user_id == data.telegram.phone_owner:
+            return Role.OWNER
+        if user_id in data.telegram.access_list:
+            return Role.USER
+        return Role.GUEST
+
+    def _update(self, build: Callable[[SettingsData], tuple], wait: bool = True):
+        """
+        Изменение настроек (копирование при записи). Изменения выполняются последовательно: build получает текущий
+        снимок настроек и возвращает новый снимок, который публикуется (атомарной заменой ссылки) только после
+        сохранения изменений в хранилище. Читатели не блокируются и всегда видят целостный снимок.
+        При отложенной записи (bot -> write_delay) build получает снимок с ещё не сохраненными изменениями, а снимок
+        публикуется фоновой записью после сохранения изменений. Если запись не удалась, все не сохраненные изменения
+        отбрасываются (опубликованным остается последний сохраненный снимок).
+        Изменение списка пользователей или кодов приглашения копирует этот список целиком, поэтому каждая запись
+        выполняется за O(n) от размера списка (чтение снимка - без блокировок и копирования)
+        :param build: Функция, возвращающая кортеж: новый снимок (None - изменений нет), список изменений для хранилища
+        (пустой список - снимок публикуется без записи в хранилище), результат операции
+        :param wait: Ожидать сохранения изменений на диск (при отложенной записи)
+        :return: Результат операции
+        :exception IOError: Ошибка записи настроек (изменения не применены)
+        """
+        generation = None
+        with self._write_lock:
+            data, changes, result = build(self._data if self._pending is None else self._pending)
+            if data is None:
+                return result
+            if len(changes) == 0:
+                # Изменения не затрагивают сохраняемые данные (например, очистка служебных индексов). Если есть не
+                # сохраненные изменения, снимок будет опубликован вместе с ними
+                if self._pending is None:
+                    self._data = data
+                else:
+                    self._pending = data
+                return result
+            try:
+                if self._storage.deferred:
+                    generation = self._storage.enqueue(changes, lambda: self._document(data),
+                                                       lambda error: self._saved(data, error))
+                    self._pending = data
+                else:
+                    self._storage.apply(changes, lambda: self._document(data))
+                    self._data = data
+            except Exception as e:
+                raise IOError(str(e))
+            # Изменения были объединены с изменениями другого процесса: загрузка актуальных данных
+            if not self._storage.pending and self._storage.changed():
+                try:
+                    self.load()
+                except IOError as e:
+                    logger.Logger().error(f'[Settings] Configuration changed by another process cannot be read! '
+                                          f'Exception text: {e}')
+        if generation is not None and wait:
+            self._storage.wait(generation)
+        return result
+
+    def _saved(self, data: SettingsData, error: Exception | None) -> None:
+        """
+        Публикация снимка настроек после отложенной записи изменений (вызывается фоновой записью хранилища)
+        :param data: Снимок настроек, изменения которого записаны
+        :param error: Ошибка записи (None - изменения сохранены)
+        """
+        with self._write_lock:
+            if error is None:
+                self._data = data
+                if self._pending is data:
+                    self._pending = None
+                return None
+            # Изменения, поставленные в очередь до этого момента, основаны на не сохраненном снимке
+            self._storage.discard(error)
+            self._pending = None
+
+    @staticmethod
+    def _with_telegram(data: SettingsData, **values) -> SettingsData:
+        """
+        Создание нового снимка настроек с измененными значениями раздела telegram
+        """
+        for value in values.values():
+            if isinstance(value, AccessList | InviteCodes):
+                value.freeze()
+        return dataclasses.replace(data, telegram=dataclasses.replace(data.telegram, **values))
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """
+        Ожидание сохранения всех отложенных изменений настроек
+        :param timeout: Максимальное время ожидания (в секундах)
+        :return: True - все изменения сохранены, False - истекло время ожидания или запись завершилась ошибкой
+        """
+        return self._storage.flush(timeout)
+
+    def add_user(self, user_id: int, username: str | None = None, invited_by: int | None = None,
+                 invite_code: str | None = None) -> bool:
+        """
+        Добавление пользователя в список авторизованных
+        :param user_id: id пользователя telegram
+        :param username: (необязательно) Имя пользователя telegram
+        :param invited_by: (необязательно) id пригласившего пользователя
+        :param invite_code: (необязательно) Активированный пользователем код приглашения
+        :return: True - пользователь добавлен, False - пользователь уже в списке
+        :exception TypeError: Неверный тип id пользователя
+        :exception IOError: Ошибка записи настроек
+        """
+        user_info = UserInfo(user_id=user_id, username=username, invited_by=invited_by, invite_code=invite_code,
+                             added=int(time.time()))
+
+        def build(data: SettingsData) -> tuple:
+            access_list = data.telegram.access_list.copy()
+            if not access_list.add(user_info):
+                return None, None, False
+            return (self._with_telegram(data, access_list=access_list),
+                    [storage.Change('add_user', dataclasses.asdict(user_info))], True)
+
+        return self._update(build)
+
+    def remove_user(self, user_id: int) -> UserInfo | None:
+        """
+        Удаление пользователя из списка авторизованных
+        :param user_id: id пользователя telegram
+        :return: Информация об удаленном пользователе (None - пользователя нет в списке)
+        :exception IOError: Ошибка записи настроек
+        """
+        removed = self.remove_users((user_id,))
+        return removed[0] if len(removed) > 0 else None
+
+    def remove_users(self, user_ids: Iterable, wait: bool = True) -> list[UserInfo]:
+        """
+        Удаление нескольких пользователей из списка авторизованных (одной записью в хранилище)
+        :param user_ids: id пользователей telegram
+        :param wait: Ожидать сохранения изменений на диск
+        :return: Информация об удаленных пользователях
+        :exception IOError: Ошибка записи настроек
+        """
+        user_ids = list(user_ids)
+
+        def build(data: SettingsData) -> tuple:
+            access_list = data.telegram.access_list.copy()
+            removed = [user_info for user_info in (access_list.remove(user_id) for user_id in user_ids)
+                       if user_info is not None]
+            if len(removed) == 0:
+                return None, None, removed
+            return (self._with_telegram(data, access_list=access_list),
+                    [storage.Change('remove_user', user_info.user_id) for user_info in removed], removed)
+
+        return self._update(build, wait=wait)
+
+    def add_invite(self, invite_info: InviteInfo) -> bool:
+        """
+        Добавление кода приглашения
+        :param invite_info: Информация о коде приглашения
+        :return: True - код добавлен, False - код уже в списке или пустой
+        :exception TypeError: Неверный тип кода приглашения
+        :exception IOError: Ошибка записи настроек
+        """
+
+        def build(data: SettingsData) -> tuple:
+            invite_codes = data.telegram.invite_codes.copy()
+            if not invite_codes.add(invite_info):
+                return None, None, False
+            return (self._with_telegram(data, invite_codes=invite_codes),
+                    [storage.Change('add_invite', dataclasses.asdict(invite_info))], True)
+
+        return self._update(build)
+
+    def remove_invite(self, code: str) -> InviteInfo | None:
+        """
+        Удаление кода приглашения
+        :param code: Код приглашения
+        :return: Информация об удаленном коде (None - кода нет в списке)
+        :exception IOError: Ошибка записи настроек
+        """
+
+        def build(data: SettingsData) -> tuple:
+            invite_codes = data.telegram.invite_codes.copy()
+            invite_info = invite_codes.remove(code)
+            if invite_info is None:
+                return None, None, None
+            return (self._with_telegram(data, invite_codes=invite_codes),
+                    [storage.Change('remove_invite', code)], invite_info)
+
+        return self._update(build)
+
+    def generate_invites(self, count: int, created_by: int | None = None, ttl: int | None = None,
+                         max_uses: int | None = None) -> list[InviteInfo]:
+        """
+        Генерация кодов приглашения (одной записью в хранилище)
+        :param count: Количество кодов
+        :param created_by: (необязательно) id создавшего коды пользователя
+        :param ttl: (необязательно) Срок действия кодов (в секундах)
+        :param max_uses: (необязательно) Максимальное количество активаций каждого кода (по умолчанию: 1)
+        :return: Информация о созданных кодах (пустой список - превышено максимальное количество кодов)
+        :exception IOError: Ошибка записи настроек
+        """
+        alphabet = string.ascii_uppercase + string.digits
+        created = int(time.time())
+
+        def build(data: SettingsData) -> tuple:
+            if count < 1 or len(data.telegram.invite_codes) + count > data.bot.invite_codes_max:
+                return None, None, list()
+            invite_codes = data.telegram.invite_codes.copy()
+            invites = list()
+            while len(invites) < count:
+                invite_info = InviteInfo(code=''.join(secrets.choice(alphabet) for _ in range(5)),
+                                         created_by=created_by, created=created,
+                                         expires=None if ttl is None else created + ttl, max_uses=max_uses)
+                if invite_codes.add(invite_info):
+                    invites.append(invite_info)
+            return (self._with_telegram(data, invite_codes=invite_codes),
+                    [storage.Change('add_invite', dataclasses.asdict(invite_info)) for invite_info in invites], invites)
+
+        return self._update(build)
+
+    def activate_invite(self, code: str, user_id: int, username: str | None = None) -> InviteInfo | None:
+        """
+        Активация кода приглашения: учет активации (удаление кода после последней активации) и добавление пользователя
+        в список авторизованных (одной записью в хранилище)
+        :param code: Код приглашения
+        :param user_id: id пользователя telegram
+        :param username: (необязательно) Имя пользователя telegram
+        :return: Информация об активированном коде (None - кода нет в списке или истек срок его действия)
+        :exception TypeError: Неверный тип id пользователя
+        :exception IOError: Ошибка записи настроек
+        """
+
+        def build(data: SettingsData) -> tuple:
+            invite_info = data.telegram.invite_codes.get(code)
+            if invite_info is None or invite_info.expired():
+                return None, None, None
+            invite_codes = data.telegram.invite_codes.copy()
+            invite_codes.remove(code)
+            if invite_info.uses_left > 1:
+                used = dataclasses.replace(invite_info, used=(invite_info.used or 0) + 1)
+                invite_codes.add(used)
+                changes = [storage.Change('add_invite', dataclasses.asdict(used))]
+            else:
+                changes = [storage.Change('remove_invite', code)]
+            user_info = UserInfo(user_id=user_id, username=username, invited_by=invite_info.created_by,
+                                 invite_code=code, added=int(time.time()))
+            access_list = data.telegram.access_list.copy()
+            if access_list.add(user_info):
+                changes.append(storage.Change('add_user', dataclasses.asdict(user_info)))
+            return self._with_telegram(data, access_list=access_list, invite_codes=invite_codes), changes, invite_info
+
+        return self._update(build)
+
+    def remove_expired_invites(self) -> list[InviteInfo]:
+        """
+        Удаление просроченных кодов приглашения. Если просроченных кодов нет, выполняется за постоянное время
+        :return: Информация об удаленных кодах
+        :exception IOError: Ошибка записи настроек
+        """
+        now = time.time()
+        data = self._data
+        if data is None or data.telegram.invite_codes.next_expiry is None or \
+           data.telegram.invite_codes.next_expiry > now:
+            return list()
+
+        def build(data: SettingsData) -> tuple:
+            invite_codes = data.telegram.invite_codes.copy()
+            removed = invite_codes.remove_expired(now)
+            return (self._with_telegram(data, invite_codes=invite_codes),
+                    [storage.Change('remove_invite', invite_info.code) for invite_info in removed], removed)
+
+        return self._update(build)
+
+    def set_gatekeeper_key(self, key: str) -> None:
+        """
+        Изменение ключа api привратника
+        :param key: Ключ api (пустая строка - ключ сброшен)
+        :exception ValueError: Неверная длина ключа
+        :exception IOError: Ошибка записи настроек
+        """
+        if not isinstance(key, str) or len(key) not in (0, 32):
+            raise ValueError('Wrong gatekeeper key')
+
+        def build(data: SettingsData) -> tuple:
+            return (dataclasses.replace(data, gatekeeper=dataclasses.replace(data.gatekeeper, key=key)),
+                    [storage.Change('set', ('gatekeeper', 'key', base64.b64encode(key.encode()).decode()))], None)
+
+        self._update(build)
+
+    def _document(self, data: SettingsData | None = None) -> dict:
+        """
+        :param data: (необязательно) Снимок настроек (по умолчанию - текущий)
+        :return: Настройки в формате json файла настроек
+        """
+        if data is None:
+            data = self._data
+        return {
                 'gatekeeper': {
-                    'phone': self.data.gatekeeper.phone,
-                    'key': base64.b64encode(self.data.gatekeeper.key.encode()).decode()
+                    'phone': data.gatekeeper.phone,
+                    'key': base64.b64encode(data.gatekeeper.key.encode()).decode()
                 },
                 'telegram': {
-                    'bot_token': base64.b64encode(self.data.telegram.bot_token.encode()).decode(),
-                    'access_list': self.data.telegram.access_list,
-                    'phone_owner': self.data.telegram.phone_owner,
-                    'invite_codes': self.data.telegram.invite_codes
+                    'bot_token': base64.b64encode(data.telegram.bot_token.encode()).decode(),
+                    'access_list': data.telegram.access_list.to_list(),
+                    'phone_owner': data.telegram.phone_owner,
+                    'invite_codes': data.telegram.invite_codes.to_list(),
+                    'users': data.telegram.access_list.metadata(),
+                    'invites': data.telegram.invite_codes.metadata()
                 },
                 'logger': {
                     'level': logger.Logger().log_level.value,
                     'print_log': logger.Logger().print_log,
                     'force_use_file': logger.Logger().force_use_file_log,
-                    'file_path': logger.Logger().file_path
+                    'file_path': logger.Logger().file_path,
+                    'rotate_size': logger.Logger().rotate_size,
+                    'rotate_interval': logger.Logger().rotate_interval,
+                    'rotate_keep': logger.Logger().rotate_keep,
+                    'structured': logger.Logger().structured,
+                    'rate_limit': logger.Logger().rate_limit,
+                    'rate_burst': logger.Logger().rate_burst,
+                    'sample_rate': logger.Logger().sample_rate
+                },
+                'bot': {
+                    'open_dedupe_window': data.bot.open_dedupe_window,
+                    'handler_priorities': data.bot.handler_priorities,
+                    'lane_workers': data.bot.lane_workers,
+                    'pending_max_age': data.bot.pending_max_age,
+                    'drain_timeout': data.bot.drain_timeout,
+                    'health_host': data.bot.health_host,
+                    'health_port': data.bot.health_port,
+                    'broadcast_workers': data.bot.broadcast_workers,
+                    'broadcast_rate': data.bot.broadcast_rate,
+                    'write_delay': data.bot.write_delay,
+                    'reload_interval': data.bot.reload_interval,
+                    'invite_codes_max': data.bot.invite_codes_max,
+                    'invite_sweep_interval': data.bot.invite_sweep_interval,
+                    'gate_cache_ttl': data.bot.gate_cache_ttl,
+                    'scheduler': data.bot.scheduler,
+                    'key_check_interval': data.bot.key_check_interval,
+                    'gate_refresh_interval': data.bot.gate_refresh_interval
                 }
         }
+
+    def save(self) -> bool:
+        """
+        Сохранение всех данных в конфигурационный файл
+        :return: True - данные сохранены, False - ошибка в данных/пути до файла
+        :exception IOError: Ошибка записи файла
+        """
+        if self.data is None or self._file_path is None or self._file_path == '':
+            return False
         try:
-            with open(self._file_path, 'w') as f:
-                json.dump(data, f)
+            self._storage.write(self._document())
             return True
         except Exception as e:
             raise IOError(str(e))
@@ -188,13 +1060,16 @@ class Settings:
         :return: True - настройки сохранены. False - ошибка в данных/пути до файла
         :exception IOError: Ошибка чтения файла настроек
         """
+        with self._write_lock:
+            return self._load()
+
+    def _load(self) -> bool:
         if self._file_path is None:
             return False
-        if not os.path.exists(self._file_path) or not os.path.isfile(self._file_path):
+        if not self._storage.exists():
             return False
         try:
-            with open(self._file_path, 'r') as f:
-                json_data = json.load(f)
+            json_data = self._storage.read()
         except Exception as e:
             raise IOError(str(e))
         try:
@@ -202,14 +1077,75 @@ class Settings:
             key = base64.b64decode(json_data.get('gatekeeper', dict()).get('key').encode()).decode()
         except Exception as e:
             raise IOError(str(e))
+        access_list = json_data.get('telegram', dict()).get('access_list')
+        invite_codes = json_data.get('telegram', dict()).get('invite_codes')
+        if not isinstance(access_list, list) or not isinstance(invite_codes, list):
+            raise IOError('Wrong type of access list or invite codes')
+        try:
+            access_list = AccessList.from_json(access_list, json_data.get('telegram').get('users'))
+            invite_codes = InviteCodes.from_json(invite_codes, json_data.get('telegram').get('invites'))
+        except TypeError as e:
+            raise IOError(str(e))
         telegram_data = TelegramData(bot_token=token,
-                                     access_list=json_data.get('telegram', dict()).get('access_list'),
+                                     access_list=access_list,
                                      phone_owner=json_data.get('telegram', dict()).get('phone_owner'),
-                                     invite_codes=json_data.get('telegram', dict()).get('invite_codes'))
+                                     invite_codes=invite_codes)
         gatekeeper_data = GatekeeperData(phone=json_data.get('gatekeeper', dict()).get('phone'),
                                          key=key)
+        bot_values = dict()
+        if isinstance(json_data.get('bot'), dict):
+            open_dedupe_window = json_data.get('bot').get('open_dedupe_window')
+            if isinstance(open_dedupe_window, int | float) and not isinstance(open_dedupe_window, bool) and \
+               open_dedupe_window >= 0:
+                bot_values['open_dedupe_window'] = open_dedupe_window
+            handler_priorities = json_data.get('bot').get('handler_priorities')
+            if isinstance(handler_priorities, dict):
+                bot_values['handler_priorities'] = {name: priority for name, priority in handler_priorities.items()
+                                                    if priority in _PRIORITIES}
+            lane_workers = json_data.get('bot').get('lane_workers')
+            if isinstance(lane_workers, dict):
+                bot_values['lane_workers'] = {priority: workers for priority, workers in lane_workers.items()
+                                              if priority in _PRIORITIES and isinstance(workers, int) and workers > 0}
+            pending_max_age = json_data.get('bot').get('pending_max_age')
+            if isinstance(pending_max_age, int) and not isinstance(pending_max_age, bool) and pending_max_age >= 0:
+                bot_values['pending_max_age'] = pending_max_age
+            drain_timeout = json_data.get('bot').get('drain_timeout')
+            if isinstance(drain_timeout, int) and not isinstance(drain_timeout, bool) and drain_timeout >= 0:
+                bot_values['drain_timeout'] = drain_timeout
+            health_host = json_data.get('bot').get('health_host')
+            if isinstance(health_host, str) and health_host != '':
+                bot_values['health_host'] = health_host
+            health_port = json_data.get('bot').get('health_port')
+            if isinstance(health_port, int) and not isinstance(health_port, bool) and 0 <= health_port <= 65535:
+                bot_values['health_port'] = health_port
+            broadcast_workers = json_data.get('bot').get('broadcast_workers')
+            if isinstance(broadcast_workers, int) and not isinstance(broadcast_workers, bool) and broadcast_workers > 0:
+                bot_values['broadcast_workers'] = broadcast_workers
+            broadcast_rate = json_data.get('bot').get('broadcast_rate')
+            if isinstance(broadcast_rate, int | float) and not isinstance(broadcast_rate, bool) and broadcast_rate > 0:
+                bot_values['broadcast_rate'] = broadcast_rate
+            write_delay = json_data.get('bot').get('write_delay')
+            if isinstance(write_delay, int | float) and not isinstance(write_delay, bool) and write_delay >= 0:
+                bot_values['write_delay'] = write_delay
+            reload_interval = json_data.get('bot').get('reload_interval')
+            if isinstance(reload_interval, int | float) and not isinstance(reload_interval, bool) and \
+               reload_interval >= 0:
+                bot_values['reload_interval'] = reload_interval
+            for key in ('invite_codes_max', 'invite_sweep_interval'):
+                value = json_data.get('bot').get(key)
+                if isinstance(value, int) and not isinstance(value, bool) and value > 0:
+                    bot_values[key] = value
+            gate_cache_ttl = json_data.get('bot').get('gate_cache_ttl')
+            if isinstance(gate_cache_ttl, int | float) and not isinstance(gate_cache_ttl, bool) and gate_cache_ttl >= 0:
+                bot_values['gate_cache_ttl'] = gate_cache_ttl
+            if isinstance(json_data.get('bot').get('scheduler'), bool):
+                bot_values['scheduler'] = json_data.get('bot').get('scheduler')
+            for key in ('key_check_interval', 'gate_refresh_interval'):
+                value = json_data.get('bot').get(key)
+                if isinstance(value, int | float) and not isinstance(value, bool) and value >= 0:
+                    bot_values[key] = value
         try:
-            self.data = SettingsData(gatekeeper=gatekeeper_data, telegram=telegram_data)
+            self.data = SettingsData(gatekeeper=gatekeeper_data, telegram=telegram_data, bot=BotData(**bot_values))
         except (TypeError or ValueError) as e:
             raise IOError(str(e))
         if isinstance(json_data.get('logger'), dict):
@@ -226,4 +1162,28 @@ class Settings:
             log_file_path = json_data.get('logger').get('file_path')
             if isinstance(log_file_path, str) and log_file_path != '':
                 logger.Logger().file_path = log_file_path
+            for key in ('rotate_size', 'rotate_interval', 'rotate_keep', 'structured', 'rate_limit', 'rate_burst',
+                        'sample_rate'):
+                if key in json_data.get('logger'):
+                    setattr(logger.Logger(), key, json_data.get('logger').get(key))
         return True
+
+    def refresh(self) -> bool:
+        """
+        Повторная загрузка настроек, если файл настроек был изменен (вручную или другим процессом). Проверка выполняется
+        не чаще раза в bot -> reload_interval секунд, файл разбирается только при его изменении
+        :return: True - настройки загружены заново, False - файл не изменялся (или проверка ещё не требуется)
+        :exception IOError: Ошибка чтения файла настроек
+        """
+        data = self._data
+        if data is None or data.bot.reload_interval <= 0 or time.monotonic() - self._checked < data.bot.reload_interval:
+            return False
+        if not self._refresh_lock.acquire(blocking=False):
+            return False
+        try:
+            self._checked = time.monotonic()
+            if self._storage.pending or not self._storage.changed():
+                return False
+            return self.load()
+        finally:
+            self._refresh_lock.release()
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+
+
+"""
+Быстрый запуск точек входа (main.py, scheduled_tasks.py, kv.py).
+
+Тяжелые модули (telebot, requests, модули обработчиков бота) импортируются не при загрузке точки входа, а в ветке
+кода, которой они нужны: так справка, настройка, миграция настроек и однократная проверка ключа не тратят время на
+импорт того, что не используют. Для импорта сторонних модулей в момент использования - функция require (при
+отсутствии модуля выводит то же сообщение, что и импорт в начале модуля).
+
+Флаг --profile-startup точек входа включает профилирование запуска: время импорта каждого модуля (общее - с
+вложенными импортами и собственное) и время этапов инициализации (phase). Отчет (report) выводится в stderr по окончании
+запуска.
+"""
+
+
+import contextlib
+import importlib.util
+import builtins
+import time
+import sys
+from types import ModuleType
+
+
+# Флаг командной строки, включающий профилирование запуска
+PROFILE_FLAG: str = '--profile-startup'
+# Количество самых медленных модулей в отчете
+REPORT_MODULES: int = 25
+
+
+_original_import = builtins.__import__
+_started: float | None = None
+# Время вложенных импортов (стек вызовов импорта)
+_stack: list[float] = list()
+# Импортированные модули: имя, общее и собственное время импорта (в секундах)
+_imports: list[tuple[str, float, float]] = list()
+# Этапы инициализации: имя и время выполнения (в секундах)
+_phases: list[tuple[str, float]] = list()
+
+
+def require(name: str, package: str | None = None) -> ModuleType:
+    """
+    Импорт стороннего модуля в момент использования
+    :param name: Имя модуля
+    :param package: (необязательно) Имя пакета, устанавливающего модуль (для сообщения об ошибке)
+    :return: Модуль
+    """
+    try:
+        return importlib.import_module(name)
+    except ModuleNotFoundError:
+        print(f'Module "{package or name}" not found! Please install required modules from file "requirements.txt"')
+        exit(1)
+
+
+def _timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+    modules = len(sys.modules)
+    start = time.perf_counter()
+    _stack.append(0.0)
+    try:
+        return _original_import(name, globals, locals, fromlist, level)
+    finally:
+        elapsed = time.perf_counter() - start
+        nested = _stack.pop()
+        # Учитываются только вызовы, загрузившие новые модули (повторный импорт - поиск в sys.modules)
+        if len(sys.modules) != modules:
+            if level > 0 and globals is not None:
+                name = importlib.util.resolve_name('.' * level + name, globals.get('__package__'))
+            if fromlist and name in sys.modules and hasattr(sys.modules[name], '__path__'):
+                name = f'{name}.{{{", ".join(fromlist)}}}'
+            _imports.append((name, elapsed, elapsed - nested))
+            if len(_stack) > 0:
+                _stack[-1] += elapsed
+
+
+def enable_profiling(argv: list[str] | None = None) -> bool:
+    """
+    Включение профилирования запуска, если в аргументах командной строки указан флаг PROFILE_FLAG
+    :param argv: (необязательно) Аргументы командной строки (по умолчанию: sys.argv)
+    :return: Включено ли профилирование
+    """
+    global _started
+    if PROFILE_FLAG not in (sys.argv if argv is None else argv):
+        return False
+    if _started is None:
+        _started = time.perf_counter()
+        builtins.__import__ = _timed_import
+    return True
+
+
+@contextlib.contextmanager
+def phase(name: str):
+    """
+    Этап инициализации (время выполнения блока with попадает в отчет профилирования)
+    :param name: Имя этапа
+    """
+    if _started is None:
+        yield
+        return None
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _phases.append((name, time.perf_counter() - start))
+
+
+def report() -> None:
+    """
+    Вывод отчета профилирования запуска в stderr и отключение профилирования
+    """
+    global _started
+    if _started is None:
+        return None
+    total = time.perf_counter() - _started
+    builtins.__import__ = _original_import
+    _started = None
+    lines = [f'Startup profile: {total * 1000:.1f} ms since profiling started, '
+             f'{sum(item[2] for item in _imports) * 1000:.1f} ms in {len(_imports)} imports',
+             '', f'{"total, ms":>10} {"self, ms":>10}  module']
+    for name, elapsed, own in sorted(_imports, key=lambda item: item[1], reverse=True)[:REPORT_MODULES]:
+        lines.append(f'{elapsed * 1000:10.1f} {own * 1000:10.1f}  {name}')
+    if len(_phases) > 0:
+        lines += ['', f'{"time, ms":>10}  phase']
+        for name, elapsed in _phases:
+            lines.append(f'{elapsed * 1000:10.1f}  {name}')
+    print('\n'.join(lines), file=sys.stderr)
+    _imports.clear()
+    _phases.clear()
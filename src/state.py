@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+
+
+"""
+Общее состояние экземпляров бота: временные значения с ограниченным временем жизни (кэш списка шлагбаумов, окна
+объединения повторяющихся запросов).
+
+Доступные реализации:
+* LocalState - в памяти процесса (используется, если настройки хранятся в локальном файле)
+* KVState - на сервере ключ-значение (см. модуль kv), общем для экземпляров бота на разных узлах. Используется, если
+путь до файла настроек - адрес сервера (kv://секрет@хост:порт/пространство_имен)
+
+Выбор реализации по пути до файла настроек - функция open_state.
+"""
+
+
+import threading
+import time
+import abc
+from typing import Any
+
+
+import logger
+import kv
+
+
+class SharedState(abc.ABC):
+    @property
+    def shared(self) -> bool:
+        """
+        Состояние доступно другим экземплярам бота
+        """
+        return False
+
+    @abc.abstractmethod
+    def get(self, key: str) -> Any:
+        """
+        :param key: Ключ
+        :return: Значение (None - значения нет или истекло время его жизни)
+        :exception ConnectionError: Ошибка подключения к хранилищу состояния
+        """
+
+    @abc.abstractmethod
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        """
+        :param key: Ключ
+        :param value: Значение (должно сериализоваться в json)
+        :param ttl: Время жизни значения (в секундах)
+        :exception ConnectionError: Ошибка подключения к хранилищу состояния
+        """
+
+    @abc.abstractmethod
+    def claim(self, key: str, value: Any, ttl: float) -> tuple[bool, Any]:
+        """
+        Запись значения, только если ключа нет (атомарно)
+        :param key: Ключ
+        :param value: Значение (должно сериализоваться в json)
+        :param ttl: Время жизни значения (в секундах)
+        :return: Записано ли значение и текущее значение ключа
+        :exception ConnectionError: Ошибка подключения к хранилищу состояния
+        """
+
+    @abc.abstractmethod
+    def delete(self, key: str) -> None:
+        """
+        :param key: Ключ
+        :exception ConnectionError: Ошибка подключения к хранилищу состояния
+        """
+
+
+class LocalState(SharedState):
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values: dict[str, tuple[Any, float]] = dict()
+
+    def _alive(self, key: str, now: float) -> tuple[Any, float] | None:
+        """
+        Получение не истекшего значения (вызывается под блокировкой)
+        """
+        entry = self._values.get(key)
+        if entry is not None and entry[1] <= now:
+            del self._values[key]
+            return None
+        return entry
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            entry = self._alive(key, time.monotonic())
+            return None if entry is None else entry[0]
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        with self._lock:
+            self._values[key] = (value, time.monotonic() + ttl)
+
+    def claim(self, key: str, value: Any, ttl: float) -> tuple[bool, Any]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._alive(key, now)
+            if entry is not None:
+                return False, entry[0]
+            self._values[key] = (value, now + ttl)
+            return True, value
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._values.pop(key, None)
+
+
+class KVState(SharedState):
+    def __init__(self, url: str):
+        """
+        :param url: Адрес сервера ключ-значение (kv://секрет@хост:порт/пространство_имен)
+        :exception ValueError: Неверный адрес
+        """
+        self._client = kv.KVClient(url)
+
+    @property
+    def shared(self) -> bool:
+        return True
+
+    def get(self, key: str) -> Any:
+        return self._client.get(key)
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        self._client.set(key, value, ttl)
+
+    def claim(self, key: str, value: Any, ttl: float) -> tuple[bool, Any]:
+        return self._client.claim(key, value, ttl)
+
+    def delete(self, key: str) -> None:
+        self._client.delete(key)
+
+
+def open_state(path: str) -> SharedState:
+    """
+    Выбор реализации общего состояния по пути до файла настроек
+    :param path: Путь до файла настроек
+    :return: Объект общего состояния
+    """
+    if kv.is_url(path):
+        try:
+            return KVState(path)
+        except ValueError as e:
+            logger.Logger().error(f'[State] Wrong key-value server url! Local state is used. Exception text: {e}')
+    return LocalState()
@@ -0,0 +1,755 @@
+# -*- coding: utf-8 -*-
+
+
+"""
+Хранилища файла настроек.
+
+Настройки передаются между объектом settings.Settings и хранилищем в виде словаря в формате json файла настроек (см.
+описание модуля settings). Кроме полной перезаписи (write) хранилище умеет применять точечные изменения (apply):
+добавление и удаление пользователей и кодов приглашения, изменение отдельных значений.
+
+Доступные хранилища:
+* JSONStorage - json файл (используется по умолчанию). Любое изменение приводит к перезаписи файла целиком. Файл
+записывается атомарно (во временный файл с последующим переименованием), поэтому сбой во время записи не повреждает
+настройки. При ненулевой задержке записи (write_delay) изменения, внесенные в течение задержки, сохраняются одной
+перезаписью файла в фоновом потоке
+* SQLiteStorage - база данных SQLite в режиме WAL. Каждое изменение - небольшая транзакция, затрагивающая только
+изменяемые строки, поэтому её стоимость не зависит от количества пользователей. Используется, если путь до файла
+настроек заканчивается на .db, .sqlite или .sqlite3
+* KVStorage - сервер ключ-значение (см. модуль kv), общий для экземпляров бота на разных узлах. Каждое значение
+настроек, пользователь и код приглашения хранятся под отдельным ключом, изменения применяются атомарным пакетом
+операций. Используется, если путь до файла настроек - адрес вида kv://секрет@хост:порт/пространство_имен
+
+Для повторной загрузки настроек без перезапуска бота хранилище умеет дешево определять, изменились ли данные другим
+процессом (или вручную) с момента последнего чтения/записи (changed): json файл - по времени изменения, inode и размеру
+файла, SQLite - по значению PRAGMA data_version, сервер ключ-значение - по счетчику версий сервера.
+
+Несколько процессов (например, несколько экземпляров бота) могут работать с одним файлом настроек:
+* json файл содержит счетчик версий (ключ version). Запись выполняется под рекомендательной блокировкой файла
+%путь_до_файла%.lock, при этом версия файла сравнивается с версией, прочитанной/записанной этим процессом. Если файл
+был изменен другим процессом, изменения не перезаписывают его, а применяются повторно к актуальным данным из файла
+* SQLite выполняет каждое изменение в транзакции BEGIN IMMEDIATE, изменения затрагивают только свои строки
+
+Перенос настроек между хранилищами - функция migrate.
+"""
+
+
+import dataclasses
+import threading
+import sqlite3
+import json
+import abc
+import os
+import re
+from typing import Any, Callable
+
+
+try:
+    import fcntl
+except ModuleNotFoundError:
+    fcntl = None
+try:
+    import msvcrt
+except ModuleNotFoundError:
+    msvcrt = None
+
+
+import logger
+import kv
+
+
+SQLITE_SUFFIXES = ('.db', '.sqlite', '.sqlite3')
+
+
+@dataclasses.dataclass
+class Change:
+    """
+    Точечное изменение настроек
+    kind:
+    * add_user - value: словарь с информацией о пользователе (user_id, username, invited_by, invite_code, added)
+    * remove_user - value: id пользователя
+    * add_invite - value: словарь с информацией о коде приглашения (code, created_by, created)
+    * remove_invite - value: код приглашения
+    * set - value: кортеж (раздел, ключ, значение)
+    """
+    kind: str
+    value: Any
+
+
+class Storage(abc.ABC):
+    def __init__(self, path: str):
+        """
+        :param path: Путь до файла хранилища
+        """
+        self._path = path
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    def exists(self) -> bool:
+        return os.path.exists(self._path) and os.path.isfile(self._path)
+
+    @abc.abstractmethod
+    def read(self) -> dict:
+        """
+        Чтение настроек
+        :return: Настройки в формате json файла настроек
+        :exception Exception: Ошибка чтения
+        """
+
+    @abc.abstractmethod
+    def write(self, document: dict) -> None:
+        """
+        Полная перезапись настроек
+        :param document: Настройки в формате json файла настроек
+        :exception Exception: Ошибка записи
+        """
+
+    def apply(self, changes: list[Change], document: Callable[[], dict], wait: bool = True) -> None:
+        """
+        Сохранение точечных изменений настроек
+        :param changes: Список изменений
+        :param document: Функция, возвращающая настройки целиком (с уже внесенными изменениями) в формате json файла
+        настроек. Используется хранилищами, не поддерживающими точечные изменения
+        :param wait: Ожидать сохранения изменений на диск (для хранилищ с отложенной записью)
+        :exception Exception: Ошибка записи
+        """
+        self.write(document())
+
+    @property
+    def deferred(self) -> bool:
+        """
+        Используется отложенная запись изменений
+        """
+        return False
+
+    def enqueue(self, changes: list[Change], document: Callable[[], dict],
+                saved: Callable[[Exception | None], None] | None = None) -> int:
+        """
+        Постановка изменений в очередь на сохранение (без ожидания записи). Хранилища без отложенной записи сохраняют
+        изменения сразу
+        :param changes: Список изменений
+        :param document: Функция, возвращающая настройки целиком в формате json файла настроек
+        :param saved: (необязательно) Функция, вызываемая после записи изменений (None - изменения сохранены, иначе -
+        ошибка записи). При ошибке записи не сохраненные изменения отбрасываются (см. discard)
+        :return: Номер (поколение) изменений для метода wait
+        :exception Exception: Ошибка записи (для хранилищ без отложенной записи)
+        """
+        self.apply(changes, document)
+        if saved is not None:
+            saved(None)
+        return 0
+
+    def discard(self, error: Exception) -> None:
+        """
+        Отбрасывание изменений, ожидающих сохранения (ожидающие их сохранения получат ошибку записи)
+        :param error: Ошибка записи
+        """
+        pass
+
+    def wait(self, generation: int) -> None:
+        """
+        Ожидание сохранения изменений
+        :param generation: Номер (поколение) изменений, полученный от метода enqueue
+        :exception IOError: Ошибка записи
+        """
+        pass
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """
+        Ожидание сохранения всех отложенных изменений
+        :param timeout: Максимальное время ожидания (в секундах)
+        :return: True - все изменения сохранены, False - истекло время ожидания или запись завершилась ошибкой
+        """
+        return True
+
+    @property
+    def pending(self) -> bool:
+        """
+        Наличие не сохраненных (отложенных) изменений
+        """
+        return False
+
+    def changed(self) -> bool:
+        """
+        Проверка изменения данных хранилища извне с момента последнего чтения/записи
+        :return: True - данные изменены (или проверка невозможна)
+        """
+        return True
+
+    def close(self) -> None:
+        pass
+
+
+class FileLock:
+    """
+    Межпроцессная рекомендательная блокировка на основе отдельного файла (fcntl.flock в unix, msvcrt.locking в windows).
+    Внутри процесса дополнительно используется обычная блокировка потоков
+    """
+
+    def __init__(self, path: str):
+        """
+        :param path: Путь до файла блокировки
+        """
+        self._path = path
+        self._lock = threading.Lock()
+        self._file = None
+
+    def __enter__(self) -> 'FileLock':
+        self._lock.acquire()
+        try:
+            self._file = open(self._path, 'a+')
+            if fcntl is not None:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+            elif msvcrt is not None:
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_LOCK, 1)
+        except BaseException:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            self._lock.release()
+            raise
+        return self
+
+    def __exit__(self, *_) -> None:
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            elif msvcrt is not None:
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self._file.close()
+            self._file = None
+            self._lock.release()
+
+
+def _replay(document: dict, changes: list[Change]) -> dict:
+    """
+    Применение изменений к настройкам в формате json файла настроек
+    :param document: Настройки (изменяются на месте)
+    :param changes: Список изменений
+    :return: Измененные настройки
+    """
+    telegram = document.setdefault('telegram', dict())
+    access_list = telegram.setdefault('access_list', list())
+    users = telegram.setdefault('users', dict())
+    invite_codes = telegram.setdefault('invite_codes', list())
+    invites = telegram.setdefault('invites', dict())
+    for change in changes:
+        match change.kind:
+            case 'add_user':
+                info = {key: value for key, value in change.value.items() if key != 'user_id' and value is not None}
+                if change.value['user_id'] not in access_list:
+                    access_list.append(change.value['user_id'])
+                if len(info) > 0:
+                    users[str(change.value['user_id'])] = info
+            case 'remove_user':
+                if change.value in access_list:
+                    access_list.remove(change.value)
+                users.pop(str(change.value), None)
+            case 'add_invite':
+                info = {key: value for key, value in change.value.items() if key != 'code' and value is not None}
+                if change.value['code'] not in invite_codes:
+                    invite_codes.append(change.value['code'])
+                if len(info) > 0:
+                    invites[change.value['code']] = info
+            case 'remove_invite':
+                if change.value in invite_codes:
+                    invite_codes.remove(change.value)
+                invites.pop(change.value, None)
+            case 'set':
+                section, key, value = change.value
+                document.setdefault(section, dict())[key] = value
+            case _:
+                raise ValueError(f'Unknown change type: {change.kind}')
+    return document
+
+
+class JSONStorage(Storage):
+    def __init__(self, path: str, write_delay: float = 0):
+        """
+        :param path: Путь до файла хранилища
+        :param write_delay: Задержка записи (в секундах), в течение которой изменения накапливаются для сохранения
+        одной перезаписью файла (0 - изменения сохраняются сразу)
+        """
+        super().__init__(path)
+        self.write_delay = write_delay
+        self._file_lock = FileLock(path + '.lock')
+        self._condition = threading.Condition()
+        self._document: Callable[[], dict] | None = None
+        self._saved: Callable[[Exception | None], None] | None = None
+        self._changes: list[Change] = list()
+        # Номера (поколения) изменений: последнего внесенного, последнего сохраненного и последнего не сохраненного
+        # из-за ошибки
+        self._requested = 0
+        self._flushed = 0
+        self._failed = 0
+        self._error: Exception | None = None
+        self._flush_now = threading.Event()
+        self._closing = False
+        self._thread: threading.Thread | None = None
+        # Состояние файла (stat) и версия данных на момент последнего чтения/записи этим процессом
+        self._version: tuple | None = None
+        self._data_version: int = 0
+
+    def _stat(self) -> tuple | None:
+        try:
+            stat = os.stat(self._path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_ino, stat.st_size
+
+    def read(self) -> dict:
+        version = self._stat()
+        with open(self._path, 'r') as f:
+            document = json.load(f)
+        self._version = version
+        self._data_version = document.get('version', 0) if isinstance(document.get('version'), int) else 0
+        return document
+
+    @property
+    def pending(self) -> bool:
+        return self._requested > max(self._flushed, self._failed)
+
+    def changed(self) -> bool:
+        return self._stat() != self._version
+
+    def _replace(self, document: dict) -> None:
+        """
+        Атомарная запись файла (вызывается под блокировкой файла)
+        """
+        tmp_path = self._path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(document, f)
+            f.flush()
+            os.fsync(f.fileno())
+        if os.path.exists(self._path):
+            os.chmod(tmp_path, os.stat(self._path).st_mode & 0o777)
+        os.replace(tmp_path, self._path)
+        if hasattr(os, 'O_DIRECTORY'):
+            directory = os.open(os.path.dirname(os.path.abspath(self._path)), os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(directory)
+            finally:
+                os.close(directory)
+
+    def _disk_version(self) -> tuple[int, dict | None]:
+        """
+        Получение версии данных в файле (вызывается под блокировкой файла). Файл читается, только если он изменился с
+        момента последнего чтения/записи этим процессом
+        :return: Версия данных и настройки из файла (None - файл не изменялся или отсутствует)
+        """
+        if self._stat() == self._version or not os.path.exists(self._path):
+            return self._data_version, None
+        with open(self._path, 'r') as f:
+            document = json.load(f)
+        version = document.get('version')
+        return (version if isinstance(version, int) else 0), document
+
+    def write(self, document: dict) -> None:
+        with self._file_lock:
+            version, disk_document = self._disk_version()
+            if disk_document is not None:
+                logger.Logger().warning('[Storage] Configuration file changed outside of this process is overwritten '
+                                        'entirely')
+            document = dict(document, version=version + 1)
+            self._replace(document)
+            self._version = self._stat()
+            self._data_version = document['version']
+
+    def _commit(self, changes: list[Change], document: Callable[[], dict]) -> None:
+        """
+        Сохранение изменений с проверкой состояния файла (compare-and-swap): если файл был изменен другим процессом или
+        вручную (версия данных при ручном изменении может остаться прежней), изменения применяются к актуальным данным
+        из файла
+        """
+        with self._file_lock:
+            version, disk_document = self._disk_version()
+            if disk_document is None:
+                result = dict(document(), version=version + 1)
+            else:
+                logger.Logger().info(f'[Storage] Configuration file changed outside of this process (version '
+                                     f'{self._data_version} -> {version}). Changes applied to the actual data')
+                result = dict(_replay(disk_document, changes), version=version + 1)
+            self._replace(result)
+            # После объединения с чужими изменениями данные в памяти устарели: changed() вернет True
+            self._version = self._stat() if disk_document is None else None
+            self._data_version = result['version']
+
+    @property
+    def deferred(self) -> bool:
+        return self.write_delay > 0 or self._thread is not None
+
+    def apply(self, changes: list[Change], document: Callable[[], dict], wait: bool = True) -> None:
+        if not self.deferred:
+            self._commit(changes, document)
+            return None
+        generation = self.enqueue(changes, document)
+        if wait:
+            self.wait(generation)
+
+    def enqueue(self, changes: list[Change], document: Callable[[], dict],
+                saved: Callable[[Exception | None], None] | None = None) -> int:
+        if not self.deferred:
+            return super().enqueue(changes, document, saved)
+        with self._condition:
+            if self._closing:
+                raise IOError('Storage is closed')
+            self._document = document
+            self._saved = saved
+            self._changes.extend(changes)
+            self._requested += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._flusher, name='settings-writer', daemon=True)
+                self._thread.start()
+            self._condition.notify_all()
+            return self._requested
+
+    def discard(self, error: Exception) -> None:
+        with self._condition:
+            self._changes = list()
+            self._failed = self._requested
+            self._error = error
+            self._condition.notify_all()
+
+    def wait(self, generation: int) -> None:
+        with self._condition:
+            self._condition.wait_for(lambda: self._flushed >= generation or self._failed >= generation)
+            if self._flushed < generation:
+                raise IOError(str(self._error))
+
+    def flush(self, timeout: float | None = None) -> bool:
+        with self._condition:
+            generation = self._requested
+            self._flush_now.set()
+            self._condition.notify_all()
+            self._condition.wait_for(lambda: self._flushed >= generation or self._failed >= generation, timeout)
+            return self._flushed >= generation
+
+    def close(self) -> None:
+        self.flush()
+        with self._condition:
+            self._closing = True
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _flusher(self) -> None:
+        """
+        Фоновое сохранение накопленных изменений
+        """
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._requested > max(self._flushed, self._failed) or self._closing)
+                if self._requested <= max(self._flushed, self._failed):
+                    return None
+            self._flush_now.wait(self.write_delay)
+            self._flush_now.clear()
+            with self._condition:
+                generation = self._requested
+                document, saved = self._document, self._saved
+                changes, self._changes = self._changes, list()
+            try:
+                self._commit(changes, document)
+            except Exception as e:
+                logger.Logger().error(f'[Storage] Saving configuration file failed! Changes discarded. Exception '
+                                      f'text: {e}')
+                # Изменения, поставленные в очередь во время записи, основаны на не сохраненных: отбрасываются все.
+                # Функция saved вызывается без блокировки хранилища (она может ставить изменения в очередь)
+                self.discard(e)
+                if saved is not None:
+                    saved(e)
+                continue
+            if saved is not None:
+                saved(None)
+            with self._condition:
+                self._flushed = generation
+                self._condition.notify_all()
+
+
+class SQLiteStorage(Storage):
+    _SCHEMA = (
+        'CREATE TABLE IF NOT EXISTS settings (section TEXT NOT NULL, key TEXT NOT NULL, value TEXT, '
+        'PRIMARY KEY (section, key))',
+        'CREATE TABLE IF NOT EXISTS users (user_id INTEGER PRIMARY KEY, username TEXT, invited_by INTEGER, '
+        'invite_code TEXT, added INTEGER)',
+        'CREATE TABLE IF NOT EXISTS invites (code TEXT PRIMARY KEY, created_by INTEGER, created INTEGER, '
+        'expires INTEGER, max_uses INTEGER, used INTEGER)'
+    )
+    _USER_FIELDS = ('user_id', 'username', 'invited_by', 'invite_code', 'added')
+    _INVITE_FIELDS = ('code', 'created_by', 'created', 'expires', 'max_uses', 'used')
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self._lock = threading.Lock()
+        self._connection: sqlite3.Connection | None = None
+        self._version: int | None = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            connection = sqlite3.connect(self._path, check_same_thread=False, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            for statement in self._SCHEMA:
+                connection.execute(statement)
+            # Добавление столбцов, появившихся в новых версиях, в ранее созданную базу данных
+            columns = {row[1] for row in connection.execute('PRAGMA table_info(invites)')}
+            for column in self._INVITE_FIELDS:
+                if column not in columns:
+                    connection.execute(f'ALTER TABLE invites ADD COLUMN {column} INTEGER')
+            self._connection = connection
+        return self._connection
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def read(self) -> dict:
+        with self._lock:
+            connection = self._connect()
+            document = dict()
+            for section, key, value in connection.execute('SELECT section, key, value FROM settings'):
+                document.setdefault(section, dict())[key] = json.loads(value)
+            telegram = document.setdefault('telegram', dict())
+            telegram['access_list'] = list()
+            telegram['users'] = dict()
+            for row in connection.execute(f'SELECT {", ".join(self._USER_FIELDS)} FROM users ORDER BY rowid'):
+                telegram['access_list'].append(row[0])
+                info = {key: value for key, value in zip(self._USER_FIELDS[1:], row[1:]) if value is not None}
+                if len(info) > 0:
+                    telegram['users'][str(row[0])] = info
+            telegram['invite_codes'] = list()
+            telegram['invites'] = dict()
+            for row in connection.execute(f'SELECT {", ".join(self._INVITE_FIELDS)} FROM invites ORDER BY rowid'):
+                telegram['invite_codes'].append(row[0])
+                info = {key: value for key, value in zip(self._INVITE_FIELDS[1:], row[1:]) if value is not None}
+                if len(info) > 0:
+                    telegram['invites'][row[0]] = info
+            self._version = connection.execute('PRAGMA data_version').fetchone()[0]
+        return document
+
+    def changed(self) -> bool:
+        # Значение data_version меняется только при изменениях, внесенных другими подключениями к базе данных
+        with self._lock:
+            return self._connect().execute('PRAGMA data_version').fetchone()[0] != self._version
+
+    def write(self, document: dict) -> None:
+        changes = list()
+        for section, values in document.items():
+            if not isinstance(values, dict):
+                continue
+            for key, value in values.items():
+                if section == 'telegram' and key in ('access_list', 'users', 'invite_codes', 'invites'):
+                    continue
+                changes.append(Change('set', (section, key, value)))
+        telegram = document.get('telegram', dict())
+        users = telegram.get('users', dict())
+        for user_id in telegram.get('access_list', list()):
+            changes.append(Change('add_user', dict(users.get(str(user_id), dict()), user_id=user_id)))
+        invites = telegram.get('invites', dict())
+        for code in telegram.get('invite_codes', list()):
+            changes.append(Change('add_invite', dict(invites.get(code, dict()), code=code)))
+        with self._lock:
+            connection = self._connect()
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                connection.execute('DELETE FROM settings')
+                connection.execute('DELETE FROM users')
+                connection.execute('DELETE FROM invites')
+                self._execute(connection, changes)
+                connection.execute('COMMIT')
+            except BaseException:
+                connection.execute('ROLLBACK')
+                raise
+
+    def apply(self, changes: list[Change], document: Callable[[], dict], wait: bool = True) -> None:
+        with self._lock:
+            connection = self._connect()
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                self._execute(connection, changes)
+                connection.execute('COMMIT')
+            except BaseException:
+                connection.execute('ROLLBACK')
+                raise
+
+    def _execute(self, connection: sqlite3.Connection, changes: list[Change]) -> None:
+        for change in changes:
+            match change.kind:
+                case 'add_user':
+                    connection.execute(f'INSERT OR REPLACE INTO users ({", ".join(self._USER_FIELDS)}) VALUES '
+                                       f'(?, ?, ?, ?, ?)', [change.value.get(key) for key in self._USER_FIELDS])
+                case 'remove_user':
+                    connection.execute('DELETE FROM users WHERE user_id = ?', (change.value,))
+                case 'add_invite':
+                    connection.execute(f'INSERT OR REPLACE INTO invites ({", ".join(self._INVITE_FIELDS)}) VALUES '
+                                       f'({", ".join("?" * len(self._INVITE_FIELDS))})',
+                                       [change.value.get(key) for key in self._INVITE_FIELDS])
+                case 'remove_invite':
+                    connection.execute('DELETE FROM invites WHERE code = ?', (change.value,))
+                case 'set':
+                    section, key, value = change.value
+                    connection.execute('INSERT OR REPLACE INTO settings (section, key, value) VALUES (?, ?, ?)',
+                                       (section, key, json.dumps(value)))
+                case _:
+                    raise ValueError(f'Unknown change type: {change.kind}')
+
+
+class KVStorage(Storage):
+    """
+    Хранилище на сервере ключ-значение. Ключи: settings/раздел/ключ, users/id_пользователя, invites/код
+    """
+
+    def __init__(self, path: str):
+        """
+        :param path: Адрес сервера (kv://секрет@хост:порт/пространство_имен)
+        :exception ValueError: Неверный адрес
+        """
+        super().__init__(path)
+        self._client = kv.KVClient(path)
+        self._lock = threading.Lock()
+        self._version: int | None = None
+
+    def exists(self) -> bool:
+        """
+        :exception ConnectionError: Ошибка подключения к серверу
+        """
+        return len(self._client.items('settings/')[1]) > 0
+
+    def read(self) -> dict:
+        version, items = self._client.items()
+        document = dict()
+        telegram = document.setdefault('telegram', dict())
+        telegram.update(access_list=list(), users=dict(), invite_codes=list(), invites=dict())
+        for key, value in items.items():
+            kind, _, name = key.partition('/')
+            match kind:
+                case 'settings':
+                    section, _, name = name.partition('/')
+                    document.setdefault(section, dict())[name] = value
+                case 'users' if isinstance(value, dict):
+                    telegram['access_list'].append(int(name))
+                    if len(value) > 0:
+                        telegram['users'][name] = value
+                case 'invites' if isinstance(value, dict):
+                    telegram['invite_codes'].append(name)
+                    if len(value) > 0:
+                        telegram['invites'][name] = value
+        with self._lock:
+            self._version = version
+        return document
+
+    def changed(self) -> bool:
+        return self._client.version() != self._version
+
+    def _commit(self, ops: list[dict], replace: bool = False) -> None:
+        version = self._client.batch(ops)
+        with self._lock:
+            # Собственные изменения не считаются внешними, если между ними не было изменений других экземпляров бота
+            if replace or (self._version is not None and version == self._version + 1):
+                self._version = version
+            else:
+                self._version = None
+
+    def write(self, document: dict) -> None:
+        ops = [{'op': 'delete_prefix', 'prefix': ''}]
+        for section, values in document.items():
+            if not isinstance(values, dict):
+                continue
+            for key, value in values.items():
+                if section == 'telegram' and key in ('access_list', 'users', 'invite_codes', 'invites'):
+                    continue
+                ops.append({'op': 'put', 'key': f'settings/{section}/{key}', 'value': value})
+        telegram = document.get('telegram', dict())
+        users = telegram.get('users', dict())
+        for user_id in telegram.get('access_list', list()):
+            ops.append({'op': 'put', 'key': f'users/{user_id}', 'value': users.get(str(user_id), dict())})
+        invites = telegram.get('invites', dict())
+        for code in telegram.get('invite_codes', list()):
+            ops.append({'op': 'put', 'key': f'invites/{code}', 'value': invites.get(code, dict())})
+        self._commit(ops, replace=True)
+
+    def apply(self, changes: list[Change], document: Callable[[], dict], wait: bool = True) -> None:
+        ops = list()
+        for change in changes:
+            match change.kind:
+                case 'add_user':
+                    ops.append({'op': 'put', 'key': f'users/{change.value["user_id"]}',
+                                'value': {key: value for key, value in change.value.items()
+                                          if key != 'user_id' and value is not None}})
+                case 'remove_user':
+                    ops.append({'op': 'delete', 'key': f'users/{change.value}'})
+                case 'add_invite':
+                    ops.append({'op': 'put', 'key': f'invites/{change.value["code"]}',
+                                'value': {key: value for key, value in change.value.items()
+                                          if key != 'code' and value is not None}})
+                case 'remove_invite':
+                    ops.append({'op': 'delete', 'key': f'invites/{change.value}'})
+                case 'set':
+                    section, key, value = change.value
+                    ops.append({'op': 'put', 'key': f'settings/{section}/{key}', 'value': value})
+                case _:
+                    raise ValueError(f'Unknown change type: {change.kind}')
+        self._commit(ops)
+
+
+def is_local(path: str) -> bool:
+    """
+    :param path: Путь до файла настроек
+    :return: Хранятся ли настройки в локальном файле
+    """
+    return not kv.is_url(path)
+
+
+def local_path(path: str) -> str:
+    """
+    Путь для служебных файлов экземпляра бота (id последнего обновления telegram, журнал рассылки), хранящихся рядом с
+    файлом настроек. Для настроек на сервере ключ-значение файлы хранятся в рабочей директории
+    :param path: Путь до файла настроек
+    :return: Путь до файла настроек или имя, составленное из адреса сервера (без общего секрета)
+    """
+    if is_local(path):
+        return path
+    return re.sub(r'[^\w.-]+', '_', kv.redact(path)[len(kv.URL_SCHEME) + 3:]).strip('_')
+
+
+def open_storage(path: str) -> Storage:
+    """
+    Выбор хранилища по расширению файла (или адресу сервера ключ-значение)
+    :param path: Путь до файла настроек
+    :return: Объект хранилища
+    :exception ValueError: Неверный адрес сервера ключ-значение
+    """
+    if not is_local(path):
+        return KVStorage(path)
+    if os.path.splitext(path)[1].lower() in SQLITE_SUFFIXES:
+        return SQLiteStorage(path)
+    return JSONStorage(path)
+
+
+def migrate(source_path: str, destination_path: str) -> None:
+    """
+    Перенос настроек из одного хранилища в другое (тип хранилища определяется расширением файла или адресом)
+    :param source_path: Путь до исходного файла настроек
+    :param destination_path: Путь до нового файла настроек
+    :exception IOError: Ошибка чтения/записи настроек
+    """
+    try:
+        source = open_storage(source_path)
+        destination = open_storage(destination_path)
+    except ValueError as e:
+        raise IOError(str(e))
+    if not source.exists():
+        raise IOError('Source configuration file not found')
+    try:
+        destination.write(source.read())
+    except Exception as e:
+        raise IOError(str(e))
+    finally:
+        source.close()
+        destination.close()
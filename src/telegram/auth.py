@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+
+
+"""
+Промежуточный обработчик (middleware) авторизации. Выполняется один раз для каждого полученного сообщения (и нажатия
+кнопки под сообщением), до выбора обработчика команды: загружает настройки (если они ещё не загружены, либо если файл
+настроек изменился) и определяет роль отправителя. Настройки и роль передаются обработчикам через словарь data (ключи
+config и role). Если настройки загрузить не удалось, роль равна None.
+"""
+
+
+try:
+    import telebot
+    from telebot.handler_backends import BaseMiddleware
+except ModuleNotFoundError:
+    print('Module "PyTelegramBotAPI" not found! Please install required modules from file "requirements.txt"')
+    exit(1)
+
+
+import settings
+import logger
+
+
+class AuthMiddleware(BaseMiddleware):
+    def __init__(self):
+        super().__init__()
+        self.update_types = ['message', 'callback_query']
+
+    def pre_process(self, message: telebot.types.Message | telebot.types.CallbackQuery, data: dict) -> None:
+        config = settings.Settings()
+        data['config'] = config
+        if config.data is None:
+            try:
+                if not config.load():
+                    logger.Logger().error('[Telegram auth] Configuration not loaded!')
+            except IOError as e:
+                logger.Logger().error(f'[Telegram auth] Configuration not loaded! Exception text: {e}')
+        else:
+            try:
+                if config.refresh():
+                    logger.Logger().info('[Telegram auth] Configuration file changed and reloaded')
+            except IOError as e:
+                logger.Logger().error(f'[Telegram auth] Changed configuration file cannot be read! Previous '
+                                      f'configuration is used. Exception text: {e}')
+        if config.data is None:
+            data['role'] = None
+        elif message.from_user is None:
+            data['role'] = settings.Role.GUEST
+        else:
+            data['role'] = config.role(message.from_user.id)
+
+    def post_process(self, message: telebot.types.Message | telebot.types.CallbackQuery, data: dict,
+                     exception: BaseException | None) -> None:
+        pass
@@ -7,19 +7,26 @@
 Доступные команды:
 * /start - Команда запуска бота
 * /help - Команда для получения справки (списка доступных команд)
-* /invite - Команда генерации кода приглашения
+* /invite [N] [часы] [активации] - Команда генерации кодов приглашения (N кодов с ограниченным сроком действия и
+количеством активаций)
 * /invite_XXXXX - Команда активации кода приглашения и добавление пользователя в список авторизованных
 * /login - Авторизация пользователя в приложении привратник (запрос смс)
 * /open_XXX - Отправка команды на открытие шлагбаума
 * /video - Получение ссылок на трансляции с камер на шлагбаумах
 * /block_XXXXXX - заблокировать пользователя с id XXXXXX
 * /cancel_XXXXX - аннулировать команду приглашения с кодом XXXXX
+* /broadcast текст - рассылка сообщения всем авторизованным пользователям
+* /users, /invites - постраничный просмотр списков пользователей и действующих кодов приглашения (переход между
+страницами - кнопками под сообщением)
+* /history, /history_user_XXXXXX, /history_gate_XXX - последние события открытия шлагбаумов (всех, пользователя с id
+XXXXXX, шлагбаума с номером XXX)
 """
 
 
-import random
-import string
+import enum
+import time
 import re
+import io
 
 
 try:
@@ -29,19 +36,90 @@ except ModuleNotFoundError:
     exit(1)
 
 
+from . import broadcast as broadcasting
+from . import dedupe
+from . import lanes
 from . import texts
 import gatekeeper
 import settings
 import logger
+import audit
+import state
+
+
+# Максимальная длина текста сообщения telegram
+MESSAGE_MAX_LENGTH: int = 4096
+# Количество элементов на странице списков пользователей и кодов приглашения
+LIST_PAGE_SIZE: int = 20
+# Данные кнопок перехода между страницами списков: список, направление (< - назад, > - вперед), курсор
+LIST_CALLBACK_REGEXP: str = r'^(users|invites):([<>]):(\w{1,20})$'
+# Количество событий в ответе на команды просмотра журнала открытия шлагбаумов
+HISTORY_SIZE: int = 20
+# Максимальная длина текста сообщения пользователя в записях лога
+LOG_TEXT_MAX_LENGTH: int = 100
+
+
+class OpenGateStatus(enum.Enum):
+    OPENED = 0
+    NOT_OPENED = 1
+    EMPTY_GATE_LIST = 2
+    WRONG_GATE_NUMBER = 3
+    INFO_WRONG_SERVER_ANSWER = 4
+    INFO_LOGIN_REQUIRED = 5
+    INFO_CONNECTION_ERROR = 6
+    OPEN_WRONG_SERVER_ANSWER = 7
+    OPEN_LOGIN_REQUIRED = 8
+    OPEN_CONNECTION_ERROR = 9
+
+
+def broadcast_reporter(bot: telebot.TeleBot, chat_id: int, message_id: int | None = None):
+    """
+    Создание функции, сообщающей о ходе рассылки
+    :param bot: Объект telegram бота
+    :param chat_id: id чата, в который отправляются отчеты
+    :param message_id: (необязательно) id сообщения, которое будет обновляться отчетами
+    """
+
+    def report(progress: broadcasting.Progress) -> None:
+        nonlocal message_id
+        if progress.finished:
+            text = texts.BROADCAST_FINISHED.format(sent=progress.sent, total=progress.total, failed=progress.failed,
+                                                   blocked=progress.blocked)
+        else:
+            text = texts.BROADCAST_PROGRESS.format(done=progress.sent + progress.failed + progress.blocked,
+                                                   total=progress.total, sent=progress.sent, failed=progress.failed,
+                                                   blocked=progress.blocked)
+        try:
+            if message_id is None:
+                message_id = bot.send_message(chat_id, text).message_id
+            else:
+                bot.edit_message_text(text, chat_id, message_id)
+        except Exception as e:
+            logger.Logger().debug('[Telegram handlers::broadcast] Sending broadcast report failed! Exception text: {}',
+                                  e)
+
+    return report
+
 
+def handlers(bot: telebot.TeleBot, dispatcher: lanes.Lanes, broadcaster: broadcasting.Broadcaster,
+             audit_log: audit.AuditLog) -> None:
 
-def handlers(bot: telebot.TeleBot) -> None:
+    shared_state = state.open_state(settings.Settings().file_path)
+    open_deduplicator = dedupe.Deduplicator(shared_state, name='open_gate', encode=lambda status: status.name,
+                                            decode=lambda name: OpenGateStatus[name])
+
+    def gatekeeper_api(config: settings.Settings) -> gatekeeper.GatekeeperAPI:
+        """
+        Создание объекта api привратника с общим для экземпляров бота кэшем списка шлагбаумов
+        """
+        return gatekeeper.GatekeeperAPI(phone=config.data.gatekeeper.phone, key=config.data.gatekeeper.key,
+                                        cache=shared_state, cache_ttl=config.data.bot.gate_cache_ttl)
 
     def by_user(message: telebot.types.Message, user_str: bool = True) -> str:
         """
         Вспомогательный метод для логирования
         """
-        if not isinstance(message, telebot.types.Message):
+        if not isinstance(message, telebot.types.Message | telebot.types.CallbackQuery):
             return 'UNKNOWN'
         if message.from_user.username is None:
             res = ''
@@ -52,149 +130,106 @@ def handlers(bot: telebot.TeleBot) -> None:
         else:
             return f'@{message.from_user.username} (id: {message.from_user.id})'
 
-    def load_config(func):
+    def log_text(message: telebot.types.Message | telebot.types.CallbackQuery) -> str:
         """
-        Декоратор-загрузчик настроек. Для использования необходимо применить данный декоратор ПОСЛЕ декоратора telebot'а
+        Вспомогательный метод для логирования текста сообщения (длинный текст обрезается)
         """
-
-        def updated_function(message: telebot.types.Message, *args, **kwargs):
-            config = settings.Settings()
-            if config.data is None:
-                try:
-                    if not config.load():
-                        logger.Logger().error(f'[Telegram handlers::load config] Received message "{message.text}" by '
-                                              f'{by_user(message)}. Configuration not loaded!')
-                        return bot.reply_to(message, texts.CONFIGURATION_NOT_LOADED)
-                except IOError as e:
-                    logger.Logger().error(f'[Telegram handlers::load config] Received message "{message.text}" by '
-                                          f'{by_user(message)}. Configuration not loaded!')
-                    logger.Logger().debug(f'Exception text: {str(e)}')
-                    return bot.reply_to(message, texts.CONFIGURATION_NOT_LOADED)
-            return func(message, config, *args, **kwargs)
-
-        return updated_function
-
-    def no_auth(func):
+        text = message.data if isinstance(message, telebot.types.CallbackQuery) else getattr(message, 'text', None)
+        if text is None:
+            return 'without text'
+        if len(text) > LOG_TEXT_MAX_LENGTH:
+            text = text[:LOG_TEXT_MAX_LENGTH] + '...'
+        return f'"{text}"'
+
+    def authorize(*roles: settings.Role):
         """
-        Декоратор-фильтр, отсеивающий авторизованных пользователей, включая владельца номера. Для использования
-        необходимо применить данный декоратор ПОСЛЕ декоратора load_config
+        Декоратор-фильтр, пропускающий к обработчику только пользователей с указанными ролями. Роль пользователя
+        определяется один раз для каждого сообщения промежуточным обработчиком auth.AuthMiddleware. Для использования
+        необходимо применить данный декоратор сразу ПОСЛЕ декоратора telebot'а
+        :param roles: Роли пользователей, которым доступен обработчик
         """
 
-        def updated_function(message: telebot.types.Message, config: settings.Settings, *args, **kwargs):
-            if config.data is None:
-                logger.Logger().warning(f'[Telegram handlers::no auth] Received message "{message.text}" by '
-                                        f'{by_user(message)}. Authentication check failed!')
-                return bot.reply_to(message, texts.CONFIGURATION_NOT_LOADED)
-            if message.from_user.id in config.data.telegram.access_list or \
-               message.from_user.id == config.data.telegram.phone_owner:
-                logger.Logger().warning(f'[Telegram handlers::no auth] Received message "{message.text}" by '
-                                        f'authorized user {by_user(message, user_str=False)}')
-                return lambda: None
-            return func(message, config, *args, **kwargs)
-
-        return updated_function
-
-    def auth_only(func):
-        """
-        Декоратор-фильтр, отсеивающий неавторизованных пользователей. Для использования необходимо применить данный
-        декоратор ПОСЛЕ декоратора load_config
-        """
-
-        def updated_function(message: telebot.types.Message, config: settings.Settings, *args, **kwargs):
-            if config.data is None:
-                logger.Logger().warning(f'[Telegram handlers::auth only] Received message "{message.text}" by '
-                                        f'{by_user(message)}. Authentication check failed!')
-                return bot.reply_to(message, texts.CONFIGURATION_NOT_LOADED)
-            if message.from_user.id not in config.data.telegram.access_list and \
-               message.from_user.id != config.data.telegram.phone_owner:
-                logger.Logger().warning(f'[Telegram handlers::auth only] Received message "{message.text}" by '
-                                        f'unauthorized user {by_user(message, user_str=False)}')
-                return lambda: None
-            return func(message, config, *args, **kwargs)
-
-        return updated_function
-
-    def owner_only(func):
-        """
-        Декоратор-фильтр, отсеивающий всех пользователей, кроме владельца номера. Для использования необходимо
-        применить данный декоратор ПОСЛЕ декоратора load_config
-        """
+        def decorator(func):
+
+            def updated_function(message: telebot.types.Message | telebot.types.CallbackQuery, data: dict):
+                config = data.get('config')
+                role = data.get('role')
+                if role is None:
+                    logger.Logger().error(lambda: f'[Telegram handlers::authorize] Received message '
+                                                  f'{log_text(message)} by {by_user(message)}. Configuration not '
+                                                  f'loaded!',
+                                          limit_key='authorize_not_loaded')
+                    if isinstance(message, telebot.types.CallbackQuery):
+                        return bot.answer_callback_query(message.id, texts.CONFIGURATION_NOT_LOADED)
+                    return bot.reply_to(message, texts.CONFIGURATION_NOT_LOADED)
+                if role not in roles:
+                    # Сообщения неавторизованных пользователей логируются с ограничением частоты: поток сообщений от
+                    # постороннего пользователя не должен превращаться в поток записей лога
+                    logger.Logger().warning(lambda: f'[Telegram handlers::authorize] Received message '
+                                                    f'{log_text(message)} by {role.name.lower()} '
+                                                    f'{by_user(message, user_str=False)}',
+                                            limit_key=f'authorize_{role.name.lower()}')
+                    return None
+                return func(message, config, role)
 
-        def updated_function(message: telebot.types.Message, config: settings.Settings, *args, **kwargs):
-            if config.data is None:
-                logger.Logger().warning(f'[Telegram handlers::owner only] Received message "{message.text}" by '
-                                        f'{by_user(message)}. Authentication check failed!')
-                return bot.reply_to(message, texts.CONFIGURATION_NOT_LOADED)
-            if message.from_user.id != config.data.telegram.phone_owner:
-                logger.Logger().warning(f'[Telegram handlers::owner only] Received message "{message.text}" by '
-                                        f'{by_user(message)}')
-                return lambda: None
-            return func(message, config, *args, **kwargs)
+            return updated_function
 
-        return updated_function
+        return decorator
 
     @bot.message_handler(regexp=r'/invite_\w{1,5}')
-    @load_config
-    @no_auth
-    def activate_invite(message: telebot.types.Message, config: settings.Settings):
+    @authorize(settings.Role.GUEST)
+    @dispatcher.lane('activate_invite')
+    def activate_invite(message: telebot.types.Message, config: settings.Settings, role: settings.Role):
         """
         Обработчик активации пригласительных кодов и добавления пользователя в список авторизованных
         """
         if len(message.text.split()) > 1:
             if message.forward_from is None:
-                logger.Logger().warning(f'[Telegram handlers::activate invite] Received wrong invite message by '
-                                        f'{by_user(message)}')
+                logger.Logger().warning(lambda: f'[Telegram handlers::activate invite] Received wrong invite message '
+                                                f'by {by_user(message)}', limit_key='activate_invite')
                 return bot.send_message(message.chat.id, texts.WRONG_INVITE_CODE)
             if bot.get_me().id != message.forward_from.id:
-                logger.Logger().warning(f'[Telegram handlers::activate invite] Received wrong forwarded message by '
-                                        f'{by_user(message)}')
+                logger.Logger().warning(lambda: f'[Telegram handlers::activate invite] Received wrong forwarded '
+                                                f'message by {by_user(message)}', limit_key='activate_invite')
                 return bot.send_message(message.chat.id, texts.WRONG_INVITE_CODE)
         received_code = re.search(r'/invite_(\w{1,5})', message.text).groups()[0]
-        if received_code not in config.data.telegram.invite_codes:
-            logger.Logger().warning(f'[Telegram handlers::activate invite] Received wrong invite code ({received_code})'
-                                    f' by {by_user(message)}')
-            return bot.send_message(message.chat.id, texts.WRONG_INVITE_CODE)
-        config.data.telegram.access_list.append(message.from_user.id)
-        config.data.telegram.invite_codes.remove(received_code)
         try:
-            if config.save():
-                logger.Logger().info(f'[Telegram handlers::activate invite] User {by_user(message, user_str=False)} '
-                                     f'added to access list (code:{received_code})')
-                bot.send_message(message.chat.id, texts.INVITE_CODE_ACTIVATED)
-                username = ''
-                if message.from_user.username is not None:
-                    username = ' @' + message.from_user.username
-                return bot.send_message(config.data.telegram.phone_owner,
-                                        texts.INVITE_CODE_ACTIVATED_OWNER.format(code=received_code,
-                                                                                 username=username,
-                                                                                 user_id=message.from_user.id))
-            else:
-                config.data.telegram.access_list.remove(message.from_user.id)
-                config.data.telegram.invite_codes.remove(received_code)
-                logger.Logger().error(f'[Telegram handlers::activate invite] User {by_user(message, user_str=False)} '
-                                      f'NOT added to access list! Saving configuration file failed! (code: '
-                                      f'{received_code})')
-                return bot.send_message(message.chat.id, texts.INVITE_CODE_NOT_SAVED_CONF)
+            invite_info = config.activate_invite(received_code, message.from_user.id,
+                                                 username=message.from_user.username)
         except IOError as e:
-            config.data.telegram.access_list.remove(message.from_user.id)
-            config.data.telegram.invite_codes.remove(received_code)
-            logger.Logger().error(f'[Telegram handlers::activate invite] User {by_user(message, user_str=False)} NOT '
-                                  f'added to access list! Saving configuration file failed! (code: {received_code})')
-            logger.Logger().debug(f'[Telegram handlers::activate invite] Exception text: {e}')
+            logger.Logger().error(lambda: f'[Telegram handlers::activate invite] User '
+                                          f'{by_user(message, user_str=False)} NOT added to access list! Saving '
+                                          f'configuration file failed! (code: {received_code})')
+            logger.Logger().debug('[Telegram handlers::activate invite] Exception text: {}', e)
             return bot.send_message(message.chat.id, texts.INVITE_CODE_NOT_SAVED_CONF)
+        if invite_info is None:
+            logger.Logger().warning(lambda: f'[Telegram handlers::activate invite] Received wrong invite code '
+                                            f'({received_code}) by {by_user(message)}', limit_key='activate_invite')
+            return bot.send_message(message.chat.id, texts.WRONG_INVITE_CODE)
+        logger.Logger().info(lambda: f'[Telegram handlers::activate invite] User {by_user(message, user_str=False)} '
+                                     f'added to access list (code:{received_code})', event='activate_invite',
+                             user_id=message.from_user.id, outcome='activated')
+        bot.send_message(message.chat.id, texts.INVITE_CODE_ACTIVATED)
+        username = ''
+        if message.from_user.username is not None:
+            username = ' @' + message.from_user.username
+        return bot.send_message(config.data.telegram.phone_owner,
+                                texts.INVITE_CODE_ACTIVATED_OWNER.format(code=received_code,
+                                                                         username=username,
+                                                                         user_id=message.from_user.id))
 
     @bot.message_handler(commands=['start', 'help'])
-    @load_config
-    @auth_only
-    def start_and_help(message: telebot.types.Message, config: settings.Settings):
+    @authorize(settings.Role.OWNER, settings.Role.USER)
+    @dispatcher.lane('start_and_help')
+    def start_and_help(message: telebot.types.Message, config: settings.Settings, role: settings.Role):
         """
         Обработчик команды справки
         """
         msg = texts.HELP_PREFIX
-        if message.from_user.id == config.data.telegram.phone_owner:
+        if role == settings.Role.OWNER:
             msg += texts.HELP_PHONE_OWNER
         try:
-            api = gatekeeper.GatekeeperAPI(phone=config.data.gatekeeper.phone, key=config.data.gatekeeper.key)
+            api = gatekeeper_api(config)
             info = api.get_info()
             if len(info) > 0:
                 msg += texts.HELP_GATES_LIST_PREFIX
@@ -203,154 +238,179 @@ def handlers(bot: telebot.TeleBot) -> None:
                     msg += texts.HELP_GATE_LIST_ITEM.format(number=i, gate_name=gate.name)
                     i += 1
         except gatekeeper.WrongServerAnswerError:
-            logger.Logger().error(f'[Telegram handlers::start/help] Wrong server answer for getting gates info. Request'
-                                  f' by {by_user(message)}')
+            logger.Logger().error(lambda: f'[Telegram handlers::start/help] Wrong server answer for getting gates '
+                                          f'info. Request by {by_user(message)}')
             return bot.send_message(message.chat.id, texts.HELP_WRONG_SERVER_ANSWER)
         except gatekeeper.LogoutError:
-            logger.Logger().error(f'[Telegram handlers::start/help] Getting gates info failed. Login required. Request'
-                                  f'by {by_user(message)}')
-            if message.from_user.id == config.data.telegram.phone_owner:
+            logger.Logger().error(lambda: f'[Telegram handlers::start/help] Getting gates info failed. Login required. '
+                                          f'Request by {by_user(message)}')
+            if role == settings.Role.OWNER:
                 return bot.send_message(message.chat.id, texts.HELP_LOGIN_REQUIRED_OWNER)
             else:
                 return bot.send_message(message.chat.id, texts.HELP_LOGIN_REQUIRED)
         except ConnectionError:
-            logger.Logger().error(f'[Telegram handlers::start/help] Connection to gatekeeper server for getting gates '
-                                  f'info failed. Request by {by_user(message)}')
+            logger.Logger().error(lambda: f'[Telegram handlers::start/help] Connection to gatekeeper server for '
+                                          f'getting gates info failed. Request by {by_user(message)}')
             return bot.send_message(message.chat.id, texts.HELP_CONNECT_TO_SERVER_FAIL)
         msg += texts.HELP_VIDEO_LINKS
         msg = bot.send_message(message.chat.id, msg)
         bot.pin_chat_message(message.chat.id, msg.message_id)
 
     @bot.message_handler(commands=['video'])
-    @load_config
-    @auth_only
-    def video(message: telebot.types.Message, config: settings.Settings):
+    @authorize(settings.Role.OWNER, settings.Role.USER)
+    @dispatcher.lane('video')
+    def video(message: telebot.types.Message, config: settings.Settings, role: settings.Role):
         """
         Обработчик команды получения ссылок на трансляции с камер на шлагбаумах
         """
         try:
-            api = gatekeeper.GatekeeperAPI(phone=config.data.gatekeeper.phone, key=config.data.gatekeeper.key)
+            api = gatekeeper_api(config)
             gates_info = api.get_info()
         except gatekeeper.WrongServerAnswerError:
-            logger.Logger().error(f'[Telegram handlers::video] Wrong server answer for getting gates info. Request by '
-                                  f'{by_user(message)}')
+            logger.Logger().error(lambda: f'[Telegram handlers::video] Wrong server answer for getting gates '
+                                          f'info. Request by {by_user(message)}')
             return bot.send_message(message.chat.id, texts.VIDEO_WRONG_SERVER_ANSWER)
         except gatekeeper.LogoutError:
-            logger.Logger().error(f'[Telegram handlers::video] Getting gates info failed. Login required. Request by '
-                                  f'{by_user(message)}')
-            if message.from_user.id == config.data.telegram.phone_owner:
+            logger.Logger().error(lambda: f'[Telegram handlers::video] Getting gates info failed. Login required. '
+                                          f'Request by {by_user(message)}')
+            if role == settings.Role.OWNER:
                 return bot.send_message(message.chat.id, texts.VIDEO_LOGIN_REQUIRED_OWNER)
             else:
                 return bot.send_message(message.chat.id, texts.VIDEO_LOGIN_REQUIRED)
         except ConnectionError:
-            logger.Logger().error(f'[Telegram handlers::video] Connection to gatekeeper server for getting gates info '
-                                  f'failed. Request by {by_user(message)}')
+            logger.Logger().error(lambda: f'[Telegram handlers::video] Connection to gatekeeper server for getting '
+                                          f'gates info failed. Request by {by_user(message)}')
             return bot.send_message(message.chat.id, texts.VIDEO_CONNECT_TO_SERVER_FAIL)
         if len(gates_info) < 1:
-            logger.Logger().error(f'[Telegram handlers::video] Gatekeeper objects not available. Request by '
-                                  f'{by_user(message)}')
+            logger.Logger().error(lambda: f'[Telegram handlers::video] Gatekeeper objects not available. Request by '
+                                          f'{by_user(message)}')
             return bot.send_message(message.chat.id, texts.VIDEO_NO_OBJECTS)
         msg = texts.VIDEO_PREFIX
         for gate in gates_info:
             try:
                 msg += texts.VIDEO_ITEM.format(link=api.get_stream_link(gate.id), name=gate.name)
             except gatekeeper.WrongServerAnswerError:
-                logger.Logger().error(f'[Telegram handlers::video] Wrong server answer for get gate video link. Request'
-                                      f' by {by_user(message)}')
+                logger.Logger().error(lambda: f'[Telegram handlers::video] Wrong server answer for get gate video '
+                                              f'link. Request by {by_user(message)}')
                 return bot.send_message(message.chat.id, texts.VIDEO_WRONG_SERVER_ANSWER)
             except gatekeeper.LogoutError:
-                logger.Logger().error(f'[Telegram handlers::video] Getting gate video link failed. Login required. '
-                                      f'Request by {by_user(message)}')
-                if message.from_user.id == config.data.telegram.phone_owner:
+                logger.Logger().error(lambda: f'[Telegram handlers::video] Getting gate video link failed. Login '
+                                              f'required. Request by {by_user(message)}')
+                if role == settings.Role.OWNER:
                     return bot.send_message(message.chat.id, texts.VIDEO_LOGIN_REQUIRED_OWNER)
                 else:
                     return bot.send_message(message.chat.id, texts.VIDEO_LOGIN_REQUIRED)
             except ConnectionError:
-                logger.Logger().error(f'[Telegram handlers::video] Connection to gatekeeper server for getting gates '
-                                      f'info failed.Request by {by_user(message)}')
+                logger.Logger().error(lambda: f'[Telegram handlers::video] Connection to gatekeeper server for getting '
+                                              f'gates info failed. Request by {by_user(message)}')
                 return bot.send_message(message.chat.id, texts.VIDEO_CONNECT_TO_SERVER_FAIL)
-        logger.Logger().info(f'[Telegram handlers::video] Video links requested by {by_user(message)}')
+        logger.Logger().info(lambda: f'[Telegram handlers::video] Video links requested by {by_user(message)}')
         return bot.send_message(message.chat.id, msg)
 
     @bot.message_handler(regexp=r'^/open_\d{1,3}$')
-    @load_config
-    @auth_only
-    def open_gate(message: telebot.types.Message, config: settings.Settings):
+    @authorize(settings.Role.OWNER, settings.Role.USER)
+    @dispatcher.lane('open_gate')
+    def open_gate(message: telebot.types.Message, config: settings.Settings, role: settings.Role):
         """
         Обработчик команды открытия шлагбаума
         """
         gate_number = re.search(r'^/open_(\d{1,3})$', message.text)
         if not gate_number:
-            logger.Logger().warning(f'[Telegram handlers::open gate] Bad open gate command. "{message.text}" by '
-                                    f'{by_user(message)}')
+            logger.Logger().warning(lambda: f'[Telegram handlers::open gate] Bad open gate command {log_text(message)} '
+                                            f'by {by_user(message)}', limit_key='open_gate_bad_command')
             return bot.send_message(message.chat.id, texts.WRONG_OPEN_GATE_COMMAND)
         gate_number = int(gate_number.groups()[0])
-        api = gatekeeper.GatekeeperAPI(phone=config.data.gatekeeper.phone, key=config.data.gatekeeper.key)
-        try:
-            gate_info = api.get_info()
-        except gatekeeper.WrongServerAnswerError:
-            logger.Logger().error('[Telegram handlers::open gate] Wrong server answer for getting gates info. Request '
-                                  f'by {by_user(message)} for open gate №{gate_number}')
-            return bot.send_message(message.chat.id, texts.OPEN_GATE_WRONG_SERVER_ANSWER)
-        except gatekeeper.LogoutError:
-            logger.Logger().error(f'[Telegram handlers::open gate] Getting gates info failed. Login required. Request '
-                                  f'by {by_user(message)} for open gate №{gate_number}')
-            if message.from_user.id == config.data.telegram.phone_owner:
-                return bot.send_message(message.chat.id, texts.OPEN_GATE_LOGIN_REQUIRED_OWNER)
-            else:
-                return bot.send_message(message.chat.id, texts.OPEN_GATE_LOGIN_REQUIRED)
-        except ConnectionError:
-            logger.Logger().error(f'[Telegram handlers::open gate] Connection to gatekeeper server for getting gates '
-                                  f'info failed. Request by {by_user(message)} for open gate №{gate_number}')
-            return bot.send_message(message.chat.id, texts.OPEN_GATE_CONNECT_TO_SERVER_FAIL)
-        if len(gate_info) == 0:
-            logger.Logger().info(f'[Telegram handlers::open gate] No available gates found. Request by '
-                                 f'{by_user(message)} for open gate №{gate_number}')
-            return bot.send_message(message.chat.id, texts.CLEAN_GATE_LIST)
-        if gate_number > len(gate_info) or gate_number < 1:
-            logger.Logger().warning(f'[Telegram handlers::open gate] Received wrong gate number ({gate_number} by '
-                                    f'{by_user(message)}')
-            return bot.send_message(message.chat.id, texts.WRONG_GATE_NUMBER)
-        gate = gate_info[gate_number - 1]
-        try:
-            if api.open_gate(gate.id):
-                logger.Logger().info(f'[Telegram handlers::open gate] Gate №{gate_number} opened by {by_user(message)}')
+
+        def request_open() -> OpenGateStatus:
+            api = gatekeeper_api(config)
+            try:
+                gate_info = api.get_info()
+            except gatekeeper.WrongServerAnswerError:
+                return OpenGateStatus.INFO_WRONG_SERVER_ANSWER
+            except gatekeeper.LogoutError:
+                return OpenGateStatus.INFO_LOGIN_REQUIRED
+            except ConnectionError:
+                return OpenGateStatus.INFO_CONNECTION_ERROR
+            if len(gate_info) == 0:
+                return OpenGateStatus.EMPTY_GATE_LIST
+            if gate_number > len(gate_info) or gate_number < 1:
+                return OpenGateStatus.WRONG_GATE_NUMBER
+            try:
+                if api.open_gate(gate_info[gate_number - 1].id):
+                    return OpenGateStatus.OPENED
+                return OpenGateStatus.NOT_OPENED
+            except gatekeeper.WrongServerAnswerError:
+                return OpenGateStatus.OPEN_WRONG_SERVER_ANSWER
+            except gatekeeper.LogoutError:
+                return OpenGateStatus.OPEN_LOGIN_REQUIRED
+            except ConnectionError:
+                return OpenGateStatus.OPEN_CONNECTION_ERROR
+
+        started = time.monotonic()
+        status, joined = open_deduplicator.run(gate_number, config.data.bot.open_dedupe_window, request_open,
+                                               lambda result: result == OpenGateStatus.OPENED)
+        # Поля структурированного лога (доступны и в шаблонах текста записей)
+        fields = {'event': 'open_gate', 'user_id': message.from_user.id, 'gate': gate_number,
+                  'latency': round(time.monotonic() - started, 3), 'outcome': status.name.lower()}
+        audit_log.record(message.from_user.id, gate_number, status.value, time.monotonic() - started)
+        user = by_user(message)
+        if joined:
+            logger.Logger().debug('[Telegram handlers::open gate] Request by {} for open gate №{gate} joined to '
+                                  'previous request ({outcome})', user, **fields)
+        match status:
+            case OpenGateStatus.INFO_WRONG_SERVER_ANSWER:
+                logger.Logger().error('[Telegram handlers::open gate] Wrong server answer for getting gates info. '
+                                      'Request by {} for open gate №{gate}', user, **fields)
+                return bot.send_message(message.chat.id, texts.OPEN_GATE_WRONG_SERVER_ANSWER)
+            case OpenGateStatus.INFO_LOGIN_REQUIRED:
+                logger.Logger().error('[Telegram handlers::open gate] Getting gates info failed. Login required. '
+                                      'Request by {} for open gate №{gate}', user, **fields)
+            case OpenGateStatus.INFO_CONNECTION_ERROR:
+                logger.Logger().error('[Telegram handlers::open gate] Connection to gatekeeper server for getting '
+                                      'gates info failed. Request by {} for open gate №{gate}', user, **fields)
+                return bot.send_message(message.chat.id, texts.OPEN_GATE_CONNECT_TO_SERVER_FAIL)
+            case OpenGateStatus.EMPTY_GATE_LIST:
+                logger.Logger().info('[Telegram handlers::open gate] No available gates found. Request by {} for open '
+                                     'gate №{gate}', user, **fields)
+                return bot.send_message(message.chat.id, texts.CLEAN_GATE_LIST)
+            case OpenGateStatus.WRONG_GATE_NUMBER:
+                logger.Logger().warning('[Telegram handlers::open gate] Received wrong gate number ({gate}) by {}',
+                                        user, **fields)
+                return bot.send_message(message.chat.id, texts.WRONG_GATE_NUMBER)
+            case OpenGateStatus.OPENED:
+                logger.Logger().info('[Telegram handlers::open gate] Gate №{gate} opened by {}', user, **fields)
                 return bot.reply_to(message, texts.GATE_OPENED)
-            else:
-                logger.Logger().warning(f'[Telegram handlers::open gate] Gate №{gate_number} NOT opened by '
-                                        f'{by_user(message)}')
+            case OpenGateStatus.NOT_OPENED:
+                logger.Logger().warning('[Telegram handlers::open gate] Gate №{gate} NOT opened by {}', user, **fields)
                 return bot.reply_to(message, texts.GATE_NOT_OPENED)
-        except gatekeeper.WrongServerAnswerError:
-            logger.Logger().error(f'[Telegram handlers::open gate] Wrong server answer for open gate ({gate_number}) by'
-                                  f' {by_user(message)}')
-            return bot.send_message(message.chat.id, texts.OPEN_GATE_WRONG_SERVER_ANSWER)
-        except gatekeeper.LogoutError:
-            logger.Logger().error(f'[Telegram handlers::open gate] Open gate ({gate_number}) failed. Login required. '
-                                  f'Request by {by_user(message)}')
-            if message.from_user.id == config.data.telegram.phone_owner:
-                return bot.send_message(message.chat.id, texts.OPEN_GATE_LOGIN_REQUIRED_OWNER)
-            else:
-                return bot.send_message(message.chat.id, texts.OPEN_GATE_LOGIN_REQUIRED)
-        except ConnectionError:
-            logger.Logger().error(f'[Telegram handlers::open gate] Connection to gatekeeper server for open gate '
-                                  f'({gate_number}) failed. Request by {by_user(message)}')
-            return bot.send_message(message.chat.id, texts.OPEN_GATE_CONNECT_TO_SERVER_FAIL)
+            case OpenGateStatus.OPEN_WRONG_SERVER_ANSWER:
+                logger.Logger().error('[Telegram handlers::open gate] Wrong server answer for open gate ({gate}) by {}',
+                                      user, **fields)
+                return bot.send_message(message.chat.id, texts.OPEN_GATE_WRONG_SERVER_ANSWER)
+            case OpenGateStatus.OPEN_LOGIN_REQUIRED:
+                logger.Logger().error('[Telegram handlers::open gate] Open gate ({gate}) failed. Login required. '
+                                      'Request by {}', user, **fields)
+            case OpenGateStatus.OPEN_CONNECTION_ERROR:
+                logger.Logger().error('[Telegram handlers::open gate] Connection to gatekeeper server for open gate '
+                                      '({gate}) failed. Request by {}', user, **fields)
+                return bot.send_message(message.chat.id, texts.OPEN_GATE_CONNECT_TO_SERVER_FAIL)
+        if role == settings.Role.OWNER:
+            return bot.send_message(message.chat.id, texts.OPEN_GATE_LOGIN_REQUIRED_OWNER)
+        else:
+            return bot.send_message(message.chat.id, texts.OPEN_GATE_LOGIN_REQUIRED)
 
     @bot.message_handler(commands=['login'])
-    @load_config
-    @owner_only
-    def login(message: telebot.types.Message, config: settings.Settings):
+    @authorize(settings.Role.OWNER)
+    @dispatcher.lane('login')
+    def login(message: telebot.types.Message, config: settings.Settings, role: settings.Role):
         """
         Обработчик входа в приложение привратник (запрос смс)
         """
-        config.data.gatekeeper.key = ''
         try:
-            if not config.save():
-                logger.Logger().error('[Telegram handlers::login] Clear gatekeeper key in configuration file failed!')
-                return bot.send_message(message.from_user.id, texts.REQUIRE_SMS_CODE_FAILED)
+            config.set_gatekeeper_key('')
         except IOError as e:
             logger.Logger().error('[Telegram handlers::login] Clear gatekeeper key in configuration file failed!')
-            logger.Logger().debug(f'Exception text: {e}')
+            logger.Logger().debug('Exception text: {}', e)
             return bot.send_message(message.from_user.id, texts.REQUIRE_SMS_CODE_FAILED)
         api = gatekeeper.GatekeeperAPI(phone=config.data.gatekeeper.phone)
         api.request_sms_code()
@@ -358,9 +418,9 @@ def handlers(bot: telebot.TeleBot) -> None:
         return bot.send_message(message.chat.id, texts.REQUIRED_SMS_CODE)
 
     @bot.message_handler(regexp=r'^\d{5}$')
-    @load_config
-    @owner_only
-    def sms(message: telebot.types.Message, config: settings.Settings):
+    @authorize(settings.Role.OWNER)
+    @dispatcher.lane('sms')
+    def sms(message: telebot.types.Message, config: settings.Settings, role: settings.Role):
         """
         Обработчик sms кодов для получения api ключа приложения ПривратникЪ
         """
@@ -369,22 +429,16 @@ def handlers(bot: telebot.TeleBot) -> None:
         api = gatekeeper.GatekeeperAPI(phone=config.data.gatekeeper.phone)
         try:
             if api.request_api_key(message.text):
-                config.data.gatekeeper.key = api.key
                 try:
-                    if config.save():
-                        logger.Logger().info('[Telegram handlers::sms] Gatekeeper api key updated!')
-                        return bot.send_message(message.chat.id, texts.API_KEY_UPDATED)
-                    else:
-                        logger.Logger().error('[Telegram handlers::sms] Gatekeeper api key not saved to configuration '
-                                              'file!')
-                        logger.Logger().debug(f'[Telegram handlers::sms] API key: {api.key}')
-                        return bot.send_message(message.chat.id, texts.API_KEY_NOT_SAVED_CONF)
-                except IOError as e:
+                    config.set_gatekeeper_key(api.key)
+                except (IOError, ValueError) as e:
                     logger.Logger().error('[Telegram handlers::sms] Gatekeeper api key not saved to configuration '
                                           'file!')
-                    logger.Logger().debug(f'[Telegram handlers::sms] Exception text: {e}')
-                    logger.Logger().debug(f'[Telegram handlers::sms] API key: {api.key}')
+                    logger.Logger().debug('[Telegram handlers::sms] Exception text: {}', e)
+                    logger.Logger().debug('[Telegram handlers::sms] API key: {}', api.key)
                     return bot.send_message(message.chat.id, texts.API_KEY_NOT_SAVED_CONF)
+                logger.Logger().info('[Telegram handlers::sms] Gatekeeper api key updated!')
+                return bot.send_message(message.chat.id, texts.API_KEY_UPDATED)
             else:
                 logger.Logger().error('[Telegram handlers::sms] SMS code not accepted!')
                 return bot.send_message(message.chat.id, texts.API_KEY_NOT_ACCEPTED)
@@ -396,89 +450,237 @@ def handlers(bot: telebot.TeleBot) -> None:
             return bot.send_message(message.chat.id, texts.API_KEY_CONNECTION_ERROR)
 
     @bot.message_handler(commands=['invite'])
-    @load_config
-    @owner_only
-    def invite(message: telebot.types.Message, config: settings.Settings):
-        """
-        Обработчик генерации кодов приглашения
-        """
-        if len(config.data.telegram.invite_codes) > 50:
-            logger.Logger().error('[Telegram handlers::invite] Requested generate an invite code although count of '
-                                  'codes has reached maximum!')
-            return bot.send_message(message.from_user.id, texts.INVITE_CODES_LIST_LEN_MAX)
-        code = ''.join(random.SystemRandom().choice(string.ascii_uppercase + string.digits) for _ in range(5))
-        config.data.telegram.invite_codes.append(code)
+    @authorize(settings.Role.OWNER)
+    @dispatcher.lane('invite')
+    def invite(message: telebot.types.Message, config: settings.Settings, role: settings.Role):
+        """
+        Обработчик генерации кодов приглашения: /invite [количество] [срок действия в часах] [количество активаций]
+        """
+        args = message.text.split()[1:]
         try:
-            if config.save():
-                logger.Logger().info(f'[Telegram handlers::invite] Generated new invite code: {code}')
-                msg = bot.send_message(message.chat.id, texts.INVITE_CODE_GEN.format(code=code))
-                return bot.reply_to(msg, texts.CANCEL_INVITE_CODE_GEN.format(code=code))
-            else:
-                config.data.telegram.invite_codes.remove(code)
-                logger.Logger().error('[Telegram handlers::invite] Generated invite code not saved in configuration '
-                                      'file!')
-                return bot.send_message(message.chat.id, texts.INVITE_CODE_GEN_NOT_SAVED_CONF)
+            count = int(args[0]) if len(args) > 0 else 1
+            hours = int(args[1]) if len(args) > 1 else None
+            max_uses = int(args[2]) if len(args) > 2 else None
+        except ValueError:
+            return bot.send_message(message.chat.id, texts.INVITE_WRONG_ARGUMENTS)
+        if count < 1 or (hours is not None and hours < 1) or (max_uses is not None and max_uses < 1):
+            return bot.send_message(message.chat.id, texts.INVITE_WRONG_ARGUMENTS)
+        try:
+            invites = config.generate_invites(count, created_by=message.from_user.id,
+                                              ttl=None if hours is None else hours * 3600, max_uses=max_uses)
         except IOError as e:
-            logger.Logger().error(f'[Telegram handlers::invite] Generated invite code not saved in configuration file!')
-            logger.Logger().debug(f'[Telegram handlers::invite] Exception text: {e}')
+            logger.Logger().error('[Telegram handlers::invite] Generated invite codes not saved in configuration file!')
+            logger.Logger().debug('[Telegram handlers::invite] Exception text: {}', e)
             return bot.send_message(message.chat.id, texts.INVITE_CODE_GEN_NOT_SAVED_CONF)
+        if len(invites) == 0:
+            logger.Logger().error('[Telegram handlers::invite] Requested generate {} invite codes although count of '
+                                  'codes has reached maximum!', count)
+            return bot.send_message(message.chat.id, texts.INVITE_CODES_LIST_LEN_MAX.format(
+                max=config.data.bot.invite_codes_max))
+        if len(invites) == 1 and hours is None and max_uses is None:
+            code = invites[0].code
+            logger.Logger().info('[Telegram handlers::invite] Generated new invite code: {}', code)
+            msg = bot.send_message(message.chat.id, texts.INVITE_CODE_GEN.format(code=code))
+            return bot.reply_to(msg, texts.CANCEL_INVITE_CODE_GEN.format(code=code))
+        logger.Logger().info('[Telegram handlers::invite] Generated {} new invite codes (hours: {}, max uses: {})',
+                             len(invites), hours, max_uses)
+        limits = ''
+        if hours is not None:
+            limits += texts.INVITE_CODES_TTL.format(hours=hours)
+        if max_uses is not None:
+            limits += texts.INVITE_CODES_USES.format(uses=max_uses)
+        codes = '\n'.join(f'/invite_{invite_info.code}' for invite_info in invites)
+        text = texts.INVITE_CODES_GEN.format(count=len(invites), limits=limits, codes=codes)
+        if len(text) <= MESSAGE_MAX_LENGTH:
+            return bot.send_message(message.chat.id, text)
+        return bot.send_document(message.chat.id, io.BytesIO(codes.encode()), visible_file_name='invites.txt',
+                                 caption=texts.INVITE_CODES_GEN_FILE.format(count=len(invites), limits=limits))
 
     @bot.message_handler(regexp=r'^/block_\d{1,20}$')
-    @load_config
-    @owner_only
-    def block(message: telebot.types.Message, config: settings.Settings):
+    @authorize(settings.Role.OWNER)
+    @dispatcher.lane('block')
+    def block(message: telebot.types.Message, config: settings.Settings, role: settings.Role):
         user_id = re.search(r'^/block_(\d{1,20})$', message.text).groups()[0]
         try:
             user_id = int(user_id)
         except ValueError:
-            logger.Logger().error(f'[Telegram handlers::block] Convert user id ({user_id}) to integer failed!')
+            logger.Logger().error('[Telegram handlers::block] Convert user id ({}) to integer failed!', user_id)
             return bot.send_message(message.chat.id, texts.BLOCK_USER_ID_CONVERT_ERROR)
-        if user_id not in config.data.telegram.access_list:
-            logger.Logger().warning(f'[Telegram handlers::block] Received block request for user with id {user_id}. '
-                                    f'User id not found in configuration file!')
-            return bot.send_message(message.chat.id, texts.BLOCK_USER_NOT_EXIST.format(user_id=user_id))
-        config.data.telegram.access_list.remove(user_id)
         try:
-            if config.save():
-                logger.Logger().info(f'[Telegram handlers::block] User with id {user_id} blocked!')
-                bot.send_message(message.chat.id, texts.BLOCK_USER_DONE.format(user_id=user_id))
-            else:
-                config.data.telegram.access_list.append(user_id)
-                logger.Logger().error(f'[Telegram handlers::block] User with id {user_id} not blocked! Saving '
-                                      f'configuration file failed!')
-                return bot.send_message(message.chat.id, texts.BLOCK_USER_NOT_SAVED_CONF.format(user_id=user_id))
+            user_info = config.remove_user(user_id)
         except IOError as e:
-            config.data.telegram.access_list.append(user_id)
-            logger.Logger().error(f'[Telegram handlers::block] User with id {user_id} not blocked! Saving '
-                                  f'configuration file failed!')
-            logger.Logger().debug(f'[Telegram handlers::block] Exception text: {e}')
+            logger.Logger().error('[Telegram handlers::block] User with id {} not blocked! Saving configuration file '
+                                  'failed!', user_id)
+            logger.Logger().debug('[Telegram handlers::block] Exception text: {}', e)
             return bot.send_message(message.chat.id, texts.BLOCK_USER_NOT_SAVED_CONF.format(user_id=user_id))
+        if user_info is None:
+            logger.Logger().warning('[Telegram handlers::block] Received block request for user with id {}. User id '
+                                    'not found in configuration file!', user_id)
+            return bot.send_message(message.chat.id, texts.BLOCK_USER_NOT_EXIST.format(user_id=user_id))
+        logger.Logger().info('[Telegram handlers::block] User with id {user_id} blocked!', event='block',
+                             user_id=user_id, outcome='blocked')
+        bot.send_message(message.chat.id, texts.BLOCK_USER_DONE.format(user_id=user_id))
 
     @bot.message_handler(regexp=r'^/cancel_\w{1,5}$')
-    @load_config
-    @owner_only
-    def cancel(message: telebot.types.Message, config: settings.Settings):
+    @authorize(settings.Role.OWNER)
+    @dispatcher.lane('cancel')
+    def cancel(message: telebot.types.Message, config: settings.Settings, role: settings.Role):
         """
         Аннулирование кода (команды) приглашения
         """
         invite_code = re.search(r'^/cancel_(\w{1,5})$', message.text).groups()[0]
-        if invite_code not in config.data.telegram.invite_codes:
-            logger.Logger().error(f'[Telegram handlers::cancel] Invite code {invite_code} not found in configuration '
-                                  f'file!')
-            return bot.send_message(message.chat.id, texts.CANCEL_INVITE_NOT_EXIST.format(code=invite_code))
-        config.data.telegram.invite_codes.remove(invite_code)
         try:
-            if config.save():
-                logger.Logger().info(f'[Telegram handlers::cancel] Invite code {invite_code} removed from list')
-                return bot.send_message(message.chat.id, texts.CANCEL_INVITE_DONE.format(code=invite_code))
-            else:
-                config.data.telegram.invite_codes.append(invite_code)
-                logger.Logger().error(f'[Telegram handlers::cancel] Invite code {invite_code} not removed! Saving '
-                                      f'configuration file failed!')
-                return bot.send_message(message.chat.id, texts.CANCEL_INVITE_NOT_SAVED_CONF.format(code=invite_code))
+            invite_info = config.remove_invite(invite_code)
         except IOError as e:
-            config.data.telegram.invite_codes.append(invite_code)
-            logger.Logger().error(f'[Telegram handlers::cancel] Invite code {invite_code} not removed! Saving '
-                                  f'configuration file failed!')
-            logger.Logger().debug(f'[Telegram handlers::block] Exception text: {e}')
+            logger.Logger().error('[Telegram handlers::cancel] Invite code {} not removed! Saving configuration file '
+                                  'failed!', invite_code)
+            logger.Logger().debug('[Telegram handlers::cancel] Exception text: {}', e)
             return bot.send_message(message.chat.id, texts.CANCEL_INVITE_NOT_SAVED_CONF.format(code=invite_code))
+        if invite_info is None:
+            logger.Logger().error('[Telegram handlers::cancel] Invite code {} not found in configuration file!',
+                                  invite_code)
+            return bot.send_message(message.chat.id, texts.CANCEL_INVITE_NOT_EXIST.format(code=invite_code))
+        logger.Logger().info('[Telegram handlers::cancel] Invite code {} removed from list', invite_code)
+        return bot.send_message(message.chat.id, texts.CANCEL_INVITE_DONE.format(code=invite_code))
+
+    @bot.message_handler(commands=['broadcast'])
+    @authorize(settings.Role.OWNER)
+    @dispatcher.lane('broadcast')
+    def broadcast(message: telebot.types.Message, config: settings.Settings, role: settings.Role):
+        """
+        Рассылка сообщения всем авторизованным пользователям
+        """
+        text = message.text.split(maxsplit=1)
+        if len(text) < 2:
+            return bot.send_message(message.chat.id, texts.BROADCAST_EMPTY_TEXT)
+        recipients = list(config.data.telegram.access_list)
+        if len(recipients) == 0:
+            return bot.send_message(message.chat.id, texts.BROADCAST_NO_RECIPIENTS)
+        if broadcaster.running:
+            logger.Logger().warning('[Telegram handlers::broadcast] Requested new broadcast although previous is not '
+                                    'finished')
+            return bot.send_message(message.chat.id, texts.BROADCAST_ALREADY_RUNNING)
+        status = bot.send_message(message.chat.id, texts.BROADCAST_STARTED.format(total=len(recipients)))
+        if not broadcaster.start(text[1], recipients, broadcast_reporter(bot, message.chat.id, status.message_id)):
+            return bot.send_message(message.chat.id, texts.BROADCAST_ALREADY_RUNNING)
+        logger.Logger().info('[Telegram handlers::broadcast] Broadcast to {} users started', len(recipients))
+
+    def list_page(data: settings.SettingsData, kind: str, after: int | str | None = None,
+                  before: int | str | None = None) -> tuple[str, telebot.types.InlineKeyboardMarkup | None]:
+        """
+        Формирование страницы списка пользователей или кодов приглашения с кнопками перехода между страницами. Страница
+        выбирается курсором по отсортированному индексу списка, форматируются только элементы страницы
+        :param data: Снимок настроек
+        :param kind: Список: users - пользователи, invites - коды приглашения
+        :param after: (необязательно) Курсор: страница начинается после элемента с этим ключом
+        :param before: (необязательно) Курсор: страница заканчивается перед элементом с этим ключом
+        :return: Текст сообщения и кнопки
+        """
+        entries = data.telegram.access_list if kind == 'users' else data.telegram.invite_codes
+        start, page = entries.page(after, before, LIST_PAGE_SIZE)
+        if len(page) == 0 and (after is not None or before is not None):
+            # Все элементы после/до курсора удалены: показывается первая страница
+            start, page = entries.page(limit=LIST_PAGE_SIZE)
+        if len(page) == 0:
+            return (texts.USERS_LIST_EMPTY if kind == 'users' else texts.INVITES_LIST_EMPTY), None
+        items = ''
+        for number, entry in enumerate(page, start + 1):
+            if kind == 'users':
+                items += texts.USERS_LIST_ITEM.format(
+                    number=number, user_id=entry.user_id,
+                    username='' if entry.username is None else f'@{entry.username}, ',
+                    added='' if entry.added is None else texts.USERS_LIST_ADDED.format(
+                        date=time.strftime('%d.%m.%Y', time.localtime(entry.added))))
+            else:
+                items += texts.INVITES_LIST_ITEM.format(
+                    number=number, code=entry.code, uses_left=entry.uses_left,
+                    expires='' if entry.expires is None else texts.INVITES_LIST_EXPIRES.format(
+                        date=time.strftime('%d.%m.%Y %H:%M', time.localtime(entry.expires))))
+        text = (texts.USERS_LIST_PAGE if kind == 'users' else texts.INVITES_LIST_PAGE).format(
+            first=start + 1, last=start + len(page), total=len(entries), items=items)
+        buttons = list()
+        if start > 0:
+            cursor = page[0].user_id if kind == 'users' else page[0].code
+            buttons.append(telebot.types.InlineKeyboardButton(texts.LIST_PREVIOUS_PAGE,
+                                                              callback_data=f'{kind}:<:{cursor}'))
+        if start + len(page) < len(entries):
+            cursor = page[-1].user_id if kind == 'users' else page[-1].code
+            buttons.append(telebot.types.InlineKeyboardButton(texts.LIST_NEXT_PAGE, callback_data=f'{kind}:>:{cursor}'))
+        if len(buttons) == 0:
+            return text, None
+        return text, telebot.types.InlineKeyboardMarkup().row(*buttons)
+
+    @bot.message_handler(commands=['users', 'invites'])
+    @authorize(settings.Role.OWNER)
+    @dispatcher.lane('list')
+    def list_entries(message: telebot.types.Message, config: settings.Settings, role: settings.Role):
+        """
+        Первая страница списка пользователей или кодов приглашения
+        """
+        kind = telebot.util.extract_command(message.text)
+        text, markup = list_page(config.data, kind)
+        logger.Logger().info(lambda: f'[Telegram handlers::list] List of {kind} requested by {by_user(message)}')
+        return bot.send_message(message.chat.id, text, reply_markup=markup)
+
+    @bot.callback_query_handler(func=lambda call: call.data is not None and
+                                re.search(LIST_CALLBACK_REGEXP, call.data) is not None)
+    @authorize(settings.Role.OWNER)
+    @dispatcher.lane('list')
+    def list_turn_page(call: telebot.types.CallbackQuery, config: settings.Settings, role: settings.Role):
+        """
+        Переход между страницами списка (кнопки под сообщением со списком)
+        """
+        kind, direction, cursor = re.search(LIST_CALLBACK_REGEXP, call.data).groups()
+        if kind == 'users':
+            try:
+                cursor = int(cursor)
+            except ValueError:
+                return bot.answer_callback_query(call.id)
+        text, markup = list_page(config.data, kind, after=cursor if direction == '>' else None,
+                                 before=cursor if direction == '<' else None)
+        try:
+            bot.edit_message_text(text, call.message.chat.id, call.message.message_id, reply_markup=markup)
+        except telebot.apihelper.ApiTelegramException as e:
+            # Например, страница не изменилась с момента предыдущего нажатия
+            logger.Logger().debug('[Telegram handlers::list] Page of {} list not updated! Exception text: {}', kind,
+                                  e)
+        return bot.answer_callback_query(call.id)
+
+    @bot.message_handler(regexp=r'^/history(_user_\d{1,20}|_gate_\d{1,3})?$')
+    @authorize(settings.Role.OWNER)
+    @dispatcher.lane('history')
+    def history(message: telebot.types.Message, config: settings.Settings, role: settings.Role):
+        """
+        Последние события открытия шлагбаумов (всех, пользователя или шлагбаума)
+        """
+        kind, value = re.search(r'^/history(?:_(user|gate)_(\d+))?$', message.text).groups()
+        user_id = int(value) if kind == 'user' else None
+        gate_number = int(value) if kind == 'gate' else None
+        try:
+            events = audit_log.query(user_id=user_id, gate=gate_number, limit=HISTORY_SIZE)
+        except IOError as e:
+            logger.Logger().error('[Telegram handlers::history] Reading gate open events failed! Exception text: {}', e)
+            return bot.send_message(message.chat.id, texts.HISTORY_NOT_AVAILABLE)
+        logger.Logger().info(lambda: f'[Telegram handlers::history] History of gate openings requested by '
+                                     f'{by_user(message)}')
+        if len(events) == 0:
+            return bot.send_message(message.chat.id, texts.HISTORY_EMPTY)
+        items = ''
+        for event in events:
+            try:
+                status = OpenGateStatus(event.outcome)
+            except ValueError:
+                status = None
+            outcome = texts.HISTORY_OPENED if status == OpenGateStatus.OPENED else texts.HISTORY_FAILED.format(
+                reason=event.outcome if status is None else status.name.lower())
+            items += texts.HISTORY_ITEM.format(date=time.strftime('%d.%m.%Y %H:%M:%S', time.localtime(event.time)),
+                                               outcome=outcome, gate=event.gate, user_id=event.user_id,
+                                               latency=event.latency)
+        if kind == 'user':
+            title = texts.HISTORY_USER_TITLE.format(user_id=user_id)
+        elif kind == 'gate':
+            title = texts.HISTORY_GATE_TITLE.format(gate=gate_number)
+        else:
+            title = texts.HISTORY_TITLE
+        return bot.send_message(message.chat.id, texts.HISTORY_PAGE.format(title=title, count=len(events),
+                                                                           items=items))
@@ -0,0 +1,280 @@
+# -*- coding: utf-8 -*-
+
+
+"""
+Рассылка сообщения всем пользователям из списка авторизованных.
+
+Сообщения отправляются параллельно несколькими потоками с ограничением общей скорости отправки (ограничение telegram -
+около 30 сообщений в секунду). Состояние рассылки (текст и список ещё не обработанных получателей) периодически
+сохраняется в файл журнала, поэтому после аварийной остановки бота рассылка продолжается с места остановки (при запуске
+бота). Пользователи, заблокировавшие бота, удаляются из списка авторизованных по окончанию рассылки.
+"""
+
+
+import concurrent.futures
+import dataclasses
+import threading
+import json
+import time
+import os
+from typing import Callable
+
+
+try:
+    import telebot
+except ModuleNotFoundError:
+    print('Module "PyTelegramBotAPI" not found! Please install required modules from file "requirements.txt"')
+    exit(1)
+
+
+import settings
+import logger
+
+
+@dataclasses.dataclass
+class Progress:
+    total: int
+    sent: int = 0
+    failed: int = 0
+    blocked: int = 0
+    finished: bool = False
+
+
+@dataclasses.dataclass
+class _Job:
+    text: str
+    pending: set
+    progress: Progress
+    blocked: list = dataclasses.field(default_factory=list)
+
+
+class RateLimiter:
+    def __init__(self, rate: float):
+        """
+        :param rate: Максимальное количество операций в секунду
+        """
+        self._rate = rate
+        self._tokens = rate
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """
+        Ожидание разрешения на выполнение операции
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self._rate, self._tokens + (now - self._last) * self._rate)
+            self._last = now
+            self._tokens -= 1
+            wait = -self._tokens / self._rate if self._tokens < 0 else 0
+        if wait > 0:
+            time.sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        """
+        Приостановка выдачи разрешений для всех ожидающих потоков (например, после ответа telegram 429)
+        :param seconds: Длительность паузы в секундах
+        """
+        with self._lock:
+            self._last = max(self._last, time.monotonic() + seconds)
+            self._tokens = min(self._tokens, 0)
+
+
+class Broadcaster:
+    # Минимальный интервал (в секундах) между сохранениями журнала и между отчетами о ходе рассылки
+    _JOURNAL_INTERVAL: float = 2
+    _REPORT_INTERVAL: float = 3
+    # Количество повторных попыток отправки при превышении ограничения скорости telegram
+    _RETRIES: int = 3
+
+    def __init__(self, bot: telebot.TeleBot, journal_path: str, workers: int = 8, rate: float = 25):
+        """
+        :param bot: Объект telegram бота
+        :param journal_path: Путь до файла журнала рассылки
+        :param workers: Количество потоков отправки
+        :param rate: Максимальное количество отправляемых сообщений в секунду
+        """
+        self._bot = bot
+        self._journal_path = journal_path
+        self._workers = workers
+        self._rate = rate
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._job: _Job | None = None
+        self._thread: threading.Thread | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, text: str, chat_ids: list, report: Callable[[Progress], None] | None = None) -> bool:
+        """
+        Запуск рассылки
+        :param text: Текст сообщения
+        :param chat_ids: Список id получателей
+        :param report: (необязательно) Функция, получающая информацию о ходе рассылки
+        :return: True - рассылка запущена, False - предыдущая рассылка ещё не завершена
+        """
+        with self._lock:
+            if self.running:
+                return False
+            pending = set(chat_ids)
+            self._job = _Job(text=text, pending=pending, progress=Progress(total=len(pending)))
+            self._save_journal()
+            self._run_thread(report)
+        return True
+
+    def resume(self, report: Callable[[Progress], None] | None = None) -> bool:
+        """
+        Продолжение прерванной рассылки из журнала
+        :param report: (необязательно) Функция, получающая информацию о ходе рассылки
+        :return: True - рассылка продолжена, False - незавершенной рассылки нет
+        """
+        if not os.path.isfile(self._journal_path):
+            return False
+        try:
+            with open(self._journal_path, 'r') as f:
+                journal = json.load(f)
+            job = _Job(text=journal['text'],
+                       pending=set(journal['pending']),
+                       progress=Progress(total=journal['total'], sent=journal['sent'], failed=journal['failed'],
+                                         blocked=len(journal['blocked'])),
+                       blocked=journal['blocked'])
+        except Exception as e:
+            logger.Logger().error(f'[Telegram broadcast] Reading broadcast journal failed! Exception text: {e}')
+            return False
+        with self._lock:
+            if self.running:
+                return False
+            self._job = job
+            self._run_thread(report)
+        logger.Logger().info(f'[Telegram broadcast] Broadcast resumed ({len(job.pending)} of {job.progress.total} '
+                             f'recipients left)')
+        return True
+
+    def stop(self, timeout: float | None = None) -> None:
+        """
+        Остановка рассылки. Не обработанные получатели остаются в журнале и будут обработаны при следующем запуске
+        :param timeout: Максимальное время ожидания остановки (в секундах)
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run_thread(self, report: Callable[[Progress], None] | None) -> None:
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(self._job, report), name='broadcast')
+        self._thread.start()
+
+    def _save_journal(self) -> None:
+        job = self._job
+        journal = {
+            'text': job.text,
+            'pending': sorted(job.pending),
+            'total': job.progress.total,
+            'sent': job.progress.sent,
+            'failed': job.progress.failed,
+            'blocked': job.blocked
+        }
+        try:
+            with open(self._journal_path + '.tmp', 'w') as f:
+                json.dump(journal, f)
+            os.replace(self._journal_path + '.tmp', self._journal_path)
+        except Exception as e:
+            logger.Logger().error(f'[Telegram broadcast] Saving broadcast journal failed! Exception text: {e}')
+
+    def _send(self, chat_id: int, text: str, limiter: RateLimiter) -> str:
+        """
+        Отправка сообщения одному получателю
+        :param chat_id: Идентификатор чата получателя
+        :param text: Текст сообщения
+        :param limiter: Общий для всех потоков отправки ограничитель скорости
+        :return: Результат отправки (sent / blocked / failed)
+        """
+        for attempt in range(self._RETRIES + 1):
+            if attempt > 0:
+                limiter.acquire()
+            try:
+                self._bot.send_message(chat_id, text)
+                return 'sent'
+            except telebot.apihelper.ApiTelegramException as e:
+                if e.error_code == 403:
+                    return 'blocked'
+                if e.error_code == 429:
+                    retry_after = e.result_json.get('parameters', dict()).get('retry_after', 1)
+                    limiter.pause(retry_after)
+                    continue
+                logger.Logger().debug('[Telegram broadcast] Sending message to chat {} failed! Exception text: {}',
+                                      chat_id, e)
+                return 'failed'
+            except Exception as e:
+                logger.Logger().debug('[Telegram broadcast] Sending message to chat {} failed! Exception text: {}',
+                                      chat_id, e)
+                return 'failed'
+        return 'failed'
+
+    def _run(self, job: _Job, report: Callable[[Progress], None] | None) -> None:
+        limiter = RateLimiter(self._rate)
+        last_journal = last_report = time.monotonic()
+
+        def send(chat_id: int) -> tuple[int, str]:
+            if self._stop.is_set():
+                return chat_id, 'stopped'
+            limiter.acquire()
+            return chat_id, self._send(chat_id, job.text, limiter)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self._workers,
+                                                   thread_name_prefix='broadcast-worker') as executor:
+            for future in concurrent.futures.as_completed([executor.submit(send, chat_id)
+                                                           for chat_id in list(job.pending)]):
+                chat_id, result = future.result()
+                if result == 'stopped':
+                    continue
+                with self._lock:
+                    job.pending.discard(chat_id)
+                    if result == 'sent':
+                        job.progress.sent += 1
+                    elif result == 'blocked':
+                        job.progress.blocked += 1
+                        job.blocked.append(chat_id)
+                    else:
+                        job.progress.failed += 1
+                    now = time.monotonic()
+                    if now - last_journal > self._JOURNAL_INTERVAL:
+                        self._save_journal()
+                        last_journal = now
+                if report is not None and now - last_report > self._REPORT_INTERVAL:
+                    last_report = now
+                    report(dataclasses.replace(job.progress))
+        if len(job.pending) > 0:
+            self._save_journal()
+            logger.Logger().info(f'[Telegram broadcast] Broadcast stopped ({len(job.pending)} of '
+                                 f'{job.progress.total} recipients left)')
+            return None
+        self._drop_blocked(job.blocked)
+        try:
+            os.remove(self._journal_path)
+        except OSError:
+            pass
+        job.progress.finished = True
+        logger.Logger().info(f'[Telegram broadcast] Broadcast finished. Sent: {job.progress.sent}, failed: '
+                             f'{job.progress.failed}, blocked: {job.progress.blocked}')
+        if report is not None:
+            report(dataclasses.replace(job.progress))
+
+    @staticmethod
+    def _drop_blocked(blocked: list) -> None:
+        """
+        Удаление пользователей, заблокировавших бота, из списка авторизованных
+        """
+        try:
+            removed = settings.Settings().remove_users(blocked, wait=False)
+        except IOError as e:
+            logger.Logger().error('[Telegram broadcast] Users blocked the bot not removed from access list! Saving '
+                                  'configuration file failed!')
+            logger.Logger().debug('[Telegram broadcast] Exception text: {}', e)
+            return None
+        if len(removed) > 0:
+            logger.Logger().info(f'[Telegram broadcast] Users blocked the bot removed from access list: '
+                                 f'{", ".join(str(user_info.user_id) for user_info in removed)}')
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+
+
+"""
+Объединение повторяющихся запросов.
+
+Пока запрос с определенным ключом (например, номером шлагбаума) выполняется, либо с момента его успешного завершения
+прошло меньше указанного окна, повторные запросы с тем же ключом не выполняются заново, а получают результат первого.
+
+Если передано общее состояние нескольких экземпляров бота (state.SharedState с shared = True), запросы объединяются и
+между экземплярами: выполняющий запрос экземпляр занимает ключ в общем состоянии (claim), остальные ожидают появления
+результата. Ключ занимается на время выполнения запроса (не более timeout секунд, на случай остановки экземпляра), а
+результат хранится в течение окна. При недоступности общего состояния запросы объединяются только внутри процесса.
+"""
+
+
+import dataclasses
+import threading
+import time
+from typing import Any, Callable, Hashable
+
+
+import logger
+import state
+
+
+# Интервал (в секундах) проверки появления результата запроса, выполняемого другим экземпляром бота
+POLL_INTERVAL: float = 0.05
+# Время (в секундах), в течение которого ожидающие экземпляры могут получить результат, не используемый повторно
+RESULT_GRACE: float = 0.5
+
+
+@dataclasses.dataclass
+class _Entry:
+    done: threading.Event
+    result: Any = None
+    error: BaseException | None = None
+    finished: float | None = None
+
+
+class Deduplicator:
+    def __init__(self, shared_state: state.SharedState | None = None, name: str = 'dedupe', timeout: float = 30,
+                 encode: Callable[[Any], Any] = lambda result: result,
+                 decode: Callable[[Any], Any] = lambda value: value):
+        """
+        :param shared_state: (необязательно) Общее состояние экземпляров бота
+        :param name: Имя (префикс ключей в общем состоянии)
+        :param timeout: Максимальное время (в секундах) выполнения запроса другим экземпляром бота
+        :param encode: Функция преобразования результата запроса в значение, сериализуемое в json
+        :param decode: Функция обратного преобразования
+        """
+        self._lock = threading.Lock()
+        self._entries: dict[Hashable, _Entry] = dict()
+        self._state = shared_state if shared_state is not None and shared_state.shared else None
+        self._name = name
+        self._timeout = timeout
+        self._encode = encode
+        self._decode = decode
+
+    def run(self, key: Hashable, window: float, func: Callable[[], Any],
+            reusable: Callable[[Any], bool] = lambda _: True) -> tuple[Any, bool]:
+        """
+        Выполнение запроса с объединением повторов
+        :param key: Ключ запроса
+        :param window: Время (в секундах), в течение которого результат завершенного запроса используется повторно
+        (0 - объединение отключено)
+        :param func: Функция, выполняющая запрос
+        :param reusable: Функция, определяющая можно ли использовать результат после завершения запроса
+        :return: Результат запроса и признак того, что запрос был присоединен к ранее начатому
+        """
+        if window <= 0:
+            return func(), False
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (entry.finished is None or now - entry.finished < window):
+                joined = True
+            else:
+                entry = _Entry(done=threading.Event())
+                self._entries[key] = entry
+                joined = False
+        if joined:
+            entry.done.wait()
+            if entry.error is not None:
+                raise entry.error
+            return entry.result, True
+        try:
+            entry.result, joined = self._execute(key, window, func, reusable)
+        except BaseException as e:
+            entry.error = e
+            raise
+        finally:
+            with self._lock:
+                entry.finished = time.monotonic()
+                if (entry.error is not None or not reusable(entry.result)) and self._entries.get(key) is entry:
+                    del self._entries[key]
+            entry.done.set()
+        return entry.result, joined
+
+    def _execute(self, key: Hashable, window: float, func: Callable[[], Any],
+                 reusable: Callable[[Any], bool]) -> tuple[Any, bool]:
+        """
+        Выполнение запроса с объединением повторов между экземплярами бота
+        :return: Результат запроса и признак того, что был получен результат другого экземпляра
+        """
+        if self._state is None:
+            return func(), False
+        name = f'{self._name}/{key}'
+        deadline = time.monotonic() + self._timeout
+        try:
+            claimed, value = self._state.claim(name, {'running': True}, self._timeout)
+            while not claimed:
+                if isinstance(value, dict) and 'result' in value:
+                    return self._decode(value['result']), True
+                if time.monotonic() >= deadline:
+                    break
+                time.sleep(POLL_INTERVAL)
+                # Ключ освобождается, если другой экземпляр завершил запрос ошибкой: тогда запрос выполняется здесь
+                claimed, value = self._state.claim(name, {'running': True}, self._timeout)
+        except ConnectionError as e:
+            logger.Logger().warning(f'[Dedupe] Shared state not available! Request "{name}" is not deduplicated '
+                                    f'with other instances. Exception text: {e}')
+            return func(), False
+        try:
+            result = func()
+        except BaseException:
+            self._release(name)
+            raise
+        try:
+            self._state.set(name, {'result': self._encode(result)}, window if reusable(result) else RESULT_GRACE)
+        except ConnectionError as e:
+            logger.Logger().warning(f'[Dedupe] Result of request "{name}" not shared! Exception text: {e}')
+        return result, False
+
+    def _release(self, name: str) -> None:
+        try:
+            self._state.delete(name)
+        except ConnectionError as e:
+            logger.Logger().warning(f'[Dedupe] Key "{name}" not released! Exception text: {e}')
@@ -2,10 +2,17 @@
 
 
 """
-Вспомогательные методы для работы с telegram ботом
+Вспомогательные методы для работы с telegram ботом.
+
+Запросы к Bot API (кроме ожидания обновлений) выполняет клиент TelegramClient: одна сессия с пулом соединений
+(keep-alive) для всех потоков, у каждого запроса ограничено время ожидания ответа. Клиенты кэшируются по токену бота
+(функция client), поэтому повторные вызовы send_message и check_token (из любого потока) не открывают новое соединение.
+Метод send_messages отправляет одно сообщение нескольким получателям параллельно потоками клиента.
 """
 
 
+import concurrent.futures
+import threading
 import json
 import time
 import re
@@ -22,6 +29,147 @@ from . import exceptions
 import logger
 
 
+# Время ожидания новых обновлений сервером telegram (long polling, в секундах)
+POLL_TIMEOUT: int = 30
+# Запас времени ожидания ответа сервера сверх времени ожидания обновлений (в секундах)
+REQUEST_TIMEOUT_MARGIN: float = 10
+# Время ожидания ответа сервера telegram (в секундах)
+TIMEOUT: float = 15
+# Количество потоков (и соединений) для отправки сообщений нескольким получателям
+SEND_WORKERS: int = 8
+# Максимальное время ожидания (в секундах) перед повторной отправкой при превышении ограничения скорости telegram
+RETRY_AFTER_MAX: float = 30
+# Время (в секундах), через которое закрывается клиент прежнего токена (чтобы начатые запросы успели завершиться)
+CLOSE_GRACE_PERIOD: float = 2 * TIMEOUT + RETRY_AFTER_MAX
+
+
+class TelegramClient:
+    def __init__(self, token: str, workers: int = SEND_WORKERS, timeout: float = TIMEOUT):
+        """
+        :param token: Токен телеграм бота
+        :param workers: Количество потоков для отправки сообщений нескольким получателям
+        :param timeout: Время ожидания ответа сервера (в секундах)
+        """
+        self._url = f'https://api.telegram.org/bot{token}/'
+        self._workers = max(workers, 1)
+        self._timeout = timeout
+        self._session = requests.Session()
+        self._session.mount('https://', requests.adapters.HTTPAdapter(pool_connections=1,
+                                                                      pool_maxsize=self._workers))
+        # Потоки отправки создаются при первой отправке нескольким получателям и используются повторно
+        self._executor: concurrent.futures.ThreadPoolExecutor | None = None
+        self._lock = threading.Lock()
+
+    def close(self) -> None:
+        """
+        Остановка потоков отправки и закрытие соединений
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+        self._session.close()
+
+    def call(self, method: str, data: dict | None = None) -> dict:
+        """
+        Вызов метода Bot API
+        :param method: Имя метода
+        :param data: (необязательно) Параметры метода
+        :exception ConnectionError: Ошибка соединения с сервером telegram
+        :exception WrongAnswerError: Неверный ответ от сервера telegram
+        :return: Ответ сервера
+        """
+        try:
+            answer = self._session.post(self._url + method, data=data, timeout=self._timeout).json()
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            raise ConnectionError
+        except json.decoder.JSONDecodeError:
+            raise exceptions.WrongServerAnswerError
+        if not isinstance(answer, dict):
+            raise exceptions.WrongServerAnswerError
+        return answer
+
+    def check_token(self) -> bool:
+        """
+        :exception ConnectionError: Ошибка соединения с сервером telegram
+        :exception WrongAnswerError: Неверный ответ от сервера telegram
+        :return: валидность токена
+        """
+        return self.call('getMe').get('ok', False)
+
+    def send_message(self, chat_id: int, message: str, parse_mode: str = 'markdown') -> str:
+        """
+        Отправка сообщения (при превышении ограничения скорости telegram - одна повторная попытка)
+        :exception ConnectionError: Ошибка соединения с сервером telegram
+        :exception WrongAnswerError: Неверный ответ от сервера telegram
+        :return: Результат отправки (sent / blocked / failed)
+        """
+        data = {'chat_id': chat_id, 'text': message, 'parse_mode': parse_mode}
+        answer = self.call('sendMessage', data)
+        if answer.get('error_code') == 429:
+            time.sleep(min(answer.get('parameters', dict()).get('retry_after', 1), RETRY_AFTER_MAX))
+            answer = self.call('sendMessage', data)
+        if answer.get('ok', False):
+            return 'sent'
+        if answer.get('error_code') == 403:
+            return 'blocked'
+        logger.Logger().debug('[telegram helpers::send message] Sending message to chat {} failed! Server answer: {}',
+                              chat_id, answer)
+        return 'failed'
+
+    def send_messages(self, chat_ids: list[int], message: str, parse_mode: str = 'markdown') -> dict[int, str]:
+        """
+        Параллельная отправка сообщения нескольким получателям
+        :param chat_ids: id целевых чатов
+        :param message: Текст сообщения
+        :param parse_mode: Режим форматирования текста (markdown / html)
+        :return: Результат отправки для каждого чата (sent / blocked / failed)
+        """
+
+        def send(chat_id: int) -> str:
+            try:
+                return self.send_message(chat_id, message, parse_mode)
+            except (ConnectionError, exceptions.WrongServerAnswerError) as e:
+                logger.Logger().debug('[telegram helpers::send messages] Sending message to chat {} failed! Exception '
+                                      'text: {!r}', chat_id, e)
+                return 'failed'
+
+        chat_ids = list(dict.fromkeys(chat_ids))
+        if len(chat_ids) < 2:
+            return {chat_id: send(chat_id) for chat_id in chat_ids}
+        with self._lock:
+            if self._executor is None:
+                self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=self._workers,
+                                                                       thread_name_prefix='telegram-sender')
+            executor = self._executor
+        return dict(zip(chat_ids, executor.map(send, chat_ids)))
+
+
+_clients: dict[str, TelegramClient] = dict()
+_clients_lock = threading.Lock()
+
+
+def client(token: str) -> TelegramClient:
+    """
+    Клиент Bot API для токена бота (один на токен, при смене токена прежний клиент удаляется из кэша и закрывается
+    в фоне через CLOSE_GRACE_PERIOD секунд, чтобы не прерывать запросы, уже выполняющиеся через него)
+    :param token: Токен телеграм бота
+    """
+    with _clients_lock:
+        current = _clients.get(token)
+        if current is None:
+            previous = list(_clients.values())
+            _clients.clear()
+            current = _clients[token] = TelegramClient(token)
+        else:
+            previous = list()
+    for stale in previous:
+        timer = threading.Timer(CLOSE_GRACE_PERIOD, stale.close)
+        timer.daemon = True
+        timer.start()
+    return current
+
+
 def send_message(token: str, chat_id: int, message: str, parse_mode: str = 'markdown') -> bool:
     """
     Отправка сообщения телеграм ботом
@@ -40,20 +188,26 @@ def send_message(token: str, chat_id: int, message: str, parse_mode: str = 'mark
         return False
     if parse_mode.lower() not in ('markdown', 'html'):
         parse_mode = 'markdown'
-    url = f'https://api.telegram.org/bot{token}/sendMessage'
-    data = \
-        {
-            'chat_id': chat_id,
-            'text': message,
-            'parse_mode': parse_mode
-        }
-    try:
-        r = requests.post(url=url, data=data).json()
-    except requests.exceptions.ConnectionError:
-        raise ConnectionError
-    except json.decoder.JSONDecodeError:
-        raise exceptions.WrongServerAnswerError
-    return r.get('ok', False)
+    return client(token).send_message(chat_id, message, parse_mode) == 'sent'
+
+
+def send_messages(token: str, chat_ids: list[int], message: str, parse_mode: str = 'markdown') -> dict[int, str]:
+    """
+    Отправка сообщения телеграм ботом нескольким получателям (параллельно)
+    :param token: Токен телеграм бота
+    :param chat_ids: id целевых чатов
+    :param message: Текст сообщения
+    :param parse_mode: Режим форматирования текста (markdown / html)
+    :return: Результат отправки для каждого чата (sent / blocked / failed)
+    """
+    if parse_mode.lower() not in ('markdown', 'html'):
+        parse_mode = 'markdown'
+    results = {chat_id: 'failed' for chat_id in chat_ids if not isinstance(chat_id, int) or chat_id < 1}
+    if not isinstance(token, str) or token == '' or not isinstance(message, str) or message == '':
+        return {chat_id: 'failed' for chat_id in chat_ids}
+    results.update(client(token).send_messages([chat_id for chat_id in chat_ids if chat_id not in results], message,
+                                               parse_mode))
+    return results
 
 
 def check_token(token: str) -> bool:
@@ -70,12 +224,7 @@ def check_token(token: str) -> bool:
         return False
     if not re.search(r'^[0-9]{8,10}:[a-zA-Z0-9_-]{35}$', token):
         return False
-    try:
-        return requests.get(f'https://api.telegram.org/bot{token}/getMe').json().get('ok', False)
-    except requests.exceptions.ConnectionError:
-        raise ConnectionError
-    except json.decoder.JSONDecodeError:
-        raise exceptions.WrongServerAnswerError
+    return client(token).check_token()
 
 
 def get_user_id_by_message(token: str, message: str) -> int | None:
@@ -100,31 +249,38 @@ def get_user_id_by_message(token: str, message: str) -> int | None:
         logger.Logger().error('[telegram helpers::get id by message] Wrong telegram server answer for check token!')
         return None
     url = f'https://api.telegram.org/bot{token}/getUpdates'
-    while True:
-        try:
-            data = requests.get(url).json()
-        except requests.exceptions.ConnectionError:
-            logger.Logger().error('[telegram::get id by message] Connection to telegram server for get updates failed!')
-            time.sleep(1)
-            continue
-        except json.decoder.JSONDecodeError:
-            raise exceptions.WrongServerAnswerError
-        for update in data.get('result', list()):
-            text = update.get('message', dict()).get('text', '')
-            update_id = int(update.get('update_id', -1))
-            user_id = int(update.get('message', dict()).get('from', dict()).get('id', 0))
+    offset = None
+    with requests.Session() as session:
+        while True:
+            # Сервер отвечает, как только появляются новые обновления (или через POLL_TIMEOUT секунд). Параметр offset
+            # подтверждает получение всех обновлений предыдущего ответа
             try:
-                requests.post(url, data={'offset': update_id + 1})
-            except requests.exceptions.ConnectionError:
-                logger.Logger().error(f'[telegram::get id by message] Connection to telegram server for set update '
-                                      f'({update_id}) status failed!')
+                data = session.get(url, params={'offset': offset, 'timeout': POLL_TIMEOUT},
+                                   timeout=POLL_TIMEOUT + REQUEST_TIMEOUT_MARGIN).json()
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                logger.Logger().error('[telegram::get id by message] Connection to telegram server for get updates '
+                                      'failed!')
                 time.sleep(1)
                 continue
             except json.decoder.JSONDecodeError:
-                logger.Logger().error(f'[telegram::get id by message] Wrong server answer for set update ({user_id}) '
-                                      f'status')
+                raise exceptions.WrongServerAnswerError
+            if not data.get('ok', False):
+                logger.Logger().error(f'[telegram::get id by message] Getting updates failed! Server answer: {data}')
                 time.sleep(1)
                 continue
-            if message.lower() == text.lower():
+            for update in data.get('result', list()):
+                update_id = int(update.get('update_id', -1))
+                offset = update_id + 1
+                text = update.get('message', dict()).get('text', '')
+                if message.lower() != text.lower():
+                    continue
+                user_id = int(update.get('message', dict()).get('from', dict()).get('id', 0))
+                # Подтверждение обновлений до найденного сообщения включительно (без ожидания новых обновлений),
+                # чтобы запущенный после настройки бот не получил его повторно
+                try:
+                    session.get(url, params={'offset': offset, 'timeout': 0, 'limit': 1},
+                                timeout=REQUEST_TIMEOUT_MARGIN)
+                except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                    logger.Logger().warning(f'[telegram::get id by message] Connection to telegram server for set '
+                                            f'update ({update_id}) status failed!')
                 return user_id
-        time.sleep(1)
@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+
+
+"""
+Приоритетные очереди (полосы) обработки сообщений.
+
+Поток получения обновлений telebot'а используется только для разбора сообщения и выбора обработчика, после чего
+обработчик ставится в очередь полосы, соответствующей его приоритету. У каждой полосы свой набор потоков, поэтому
+срочные команды (например открытие шлагбаума) не ждут окончания выполнения медленных (получение ссылок на видео,
+справка и т.п.).
+
+Приоритет обработчика задается в настройках (bot -> handler_priorities), количество потоков каждой полосы - в
+настройках bot -> lane_workers. Сообщения, пролежавшие в очереди telegram дольше bot -> pending_max_age секунд (например
+пока бот был выключен), отбрасываются.
+"""
+
+
+import concurrent.futures
+import threading
+import enum
+import time
+from typing import Callable
+
+
+import settings
+import metrics
+import logger
+
+
+class Priority(enum.Enum):
+    HIGH = 'high'
+    NORMAL = 'normal'
+    LOW = 'low'
+
+
+DEFAULT_PRIORITIES: dict[str, Priority] = {
+    'open_gate': Priority.HIGH,
+    'sms': Priority.HIGH,
+    'activate_invite': Priority.NORMAL,
+    'login': Priority.NORMAL,
+    'invite': Priority.NORMAL,
+    'block': Priority.NORMAL,
+    'cancel': Priority.NORMAL,
+    'broadcast': Priority.LOW,
+    'start_and_help': Priority.LOW,
+    'video': Priority.LOW,
+    'list': Priority.LOW,
+    'history': Priority.LOW
+}
+
+DEFAULT_WORKERS: dict[Priority, int] = {
+    Priority.HIGH: 2,
+    Priority.NORMAL: 1,
+    Priority.LOW: 1
+}
+
+# Максимальная длина текста сообщения пользователя в записях лога
+LOG_TEXT_MAX_LENGTH: int = 100
+
+
+def _log_text(message) -> str:
+    """
+    Описание текста сообщения для записи лога (длинный текст обрезается)
+    """
+    text = getattr(message, 'text', None)
+    if text is None:
+        return 'without text'
+    if len(text) > LOG_TEXT_MAX_LENGTH:
+        text = text[:LOG_TEXT_MAX_LENGTH] + '...'
+    return f'"{text}"'
+
+
+class Lanes:
+    def __init__(self, workers: dict[str, int] | None = None):
+        """
+        :param workers: Количество потоков для каждой полосы (ключ - значение приоритета: high/normal/low)
+        """
+        if not isinstance(workers, dict):
+            workers = dict()
+        self._executors: dict[Priority, concurrent.futures.ThreadPoolExecutor] = dict()
+        for priority in Priority:
+            count = workers.get(priority.value, DEFAULT_WORKERS[priority])
+            if not isinstance(count, int) or count < 1:
+                count = DEFAULT_WORKERS[priority]
+            self._executors[priority] = concurrent.futures.ThreadPoolExecutor(
+                max_workers=count, thread_name_prefix=f'lane-{priority.value}')
+        self._in_flight = 0
+        self._lane_in_flight: dict[Priority, int] = {priority: 0 for priority in Priority}
+        self._in_flight_condition = threading.Condition()
+
+    @property
+    def in_flight(self) -> int:
+        """
+        Количество задач в очередях и в процессе выполнения
+        """
+        return self._in_flight
+
+    def lanes_in_flight(self) -> dict[str, int]:
+        """
+        :return: Количество задач в очереди и в процессе выполнения для каждой полосы
+        """
+        return {priority.value: count for priority, count in self._lane_in_flight.items()}
+
+    @staticmethod
+    def priority(handler_name: str) -> Priority:
+        """
+        Получение приоритета обработчика
+        :param handler_name: Имя обработчика
+        :return: Приоритет из настроек, либо приоритет по умолчанию
+        """
+        config = settings.Settings()
+        if config.data is not None:
+            value = config.data.bot.handler_priorities.get(handler_name)
+            if value is not None:
+                try:
+                    return Priority(value)
+                except ValueError:
+                    pass
+        return DEFAULT_PRIORITIES.get(handler_name, Priority.NORMAL)
+
+    def submit(self, priority: Priority, func: Callable, *args, **kwargs) -> concurrent.futures.Future:
+        """
+        Постановка задачи в очередь полосы
+        :param priority: Приоритет (полоса) задачи
+        :param func: Выполняемая функция
+        """
+
+        def task():
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                logger.Logger().error(f'[Telegram lanes] Task on {priority.value} priority lane failed! Exception '
+                                      f'text: {e}')
+            finally:
+                metrics.Metrics().handler_latency(priority.value, time.monotonic() - queued)
+                done()
+
+        def done():
+            with self._in_flight_condition:
+                self._in_flight -= 1
+                self._lane_in_flight[priority] -= 1
+                self._in_flight_condition.notify_all()
+
+        queued = time.monotonic()
+        with self._in_flight_condition:
+            self._in_flight += 1
+            self._lane_in_flight[priority] += 1
+        try:
+            return self._executors[priority].submit(task)
+        except RuntimeError:
+            done()
+            raise
+
+    def lane(self, handler_name: str):
+        """
+        Декоратор, переносящий выполнение обработчика в полосу с его приоритетом. Для использования необходимо
+        применить данный декоратор ПОСЛЕ декоратора проверки прав пользователя
+        :param handler_name: Имя обработчика (ключ в настройках приоритетов)
+        """
+
+        def decorator(func):
+
+            def updated_function(message, *args, **kwargs):
+                config = settings.Settings()
+                # У нажатий кнопок (CallbackQuery) нет времени отправки, они обрабатываются всегда
+                date = getattr(message, 'date', None)
+                if config.data is not None and config.data.bot.pending_max_age > 0 and date is not None and \
+                   time.time() - date > config.data.bot.pending_max_age:
+                    logger.Logger().warning(lambda: f'[Telegram lanes] Message {_log_text(message)} by user with id '
+                                                    f'{message.from_user.id} dropped: it is older than '
+                                                    f'{config.data.bot.pending_max_age} seconds',
+                                            limit_key='lanes_dropped')
+                    return None
+                self.submit(self.priority(handler_name), func, message, *args, **kwargs)
+
+            return updated_function
+
+        return decorator
+
+    def drain(self, timeout: float) -> bool:
+        """
+        Ожидание выполнения всех поставленных в очереди задач
+        :param timeout: Максимальное время ожидания (в секундах)
+        :return: True - все задачи выполнены, False - истекло время ожидания
+        """
+        with self._in_flight_condition:
+            return self._in_flight_condition.wait_for(lambda: self._in_flight == 0, timeout=timeout)
+
+    def shutdown(self, wait: bool = True) -> None:
+        for executor in self._executors.values():
+            executor.shutdown(wait=wait)
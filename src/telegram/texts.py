@@ -6,7 +6,12 @@ CONFIGURATION_NOT_LOADED = 'Упс. . . Не удалось загрузить 
                            'администратору бота.'
 HELP_PREFIX = 'Привет 👋! Данный бот предназначен для управления шлагбаумами.'
 HELP_PHONE_OWNER = '\n\nКоманда для повторной авторизации в приложении "ПривратникЪ":\n/login\n\nКоманда для генерации'\
-                   ' команды (кода) приглашения нового пользователя:\n/invite'
+                   ' команд (кодов) приглашения новых пользователей (количество кодов, срок действия в часах и '\
+                   'количество активаций каждого кода необязательны):\n/invite количество часы активации\n\nКоманда '\
+                   'для рассылки сообщения всем пользователям:\n/broadcast текст сообщения\n\nКоманды для '\
+                   'просмотра списков пользователей и действующих команд приглашения:\n/users\n/invites\n\nКоманды '\
+                   'для просмотра последних открытий шлагбаумов (всех, пользователем с id XXX, шлагбаума №N):\n'\
+                   '/history\n/history_user_XXX\n/history_gate_N'
 HELP_GATES_LIST_PREFIX = '\n\nКоманды для открытия шлагбаумов:\n'
 HELP_GATE_LIST_ITEM = '/open_{number} - открыть "{gate_name}"\n'
 HELP_WRONG_SERVER_ANSWER = '❌ Неверный ответ сервера приложения "ПривратникЪ"! Попробуй выполнить команду позже или ' \
@@ -52,11 +57,20 @@ API_KEY_CONNECTION_ERROR = '❌ Ошибка подключения к серв
                            'доступа к приложению!'
 API_KEY_WRONG_SERVER_ANSWER = '❌ Неверный ответ сервера приложения "ПривратникЪ" при получении (обновлении) доступа ' \
                               'к приложению!'
-INVITE_CODES_LIST_LEN_MAX = '❌ Достигнуто максимальное количество пригласительных кодов (50)! Дождись пока часть ' \
+INVITE_CODES_LIST_LEN_MAX = '❌ Достигнуто максимальное количество пригласительных кодов ({max})! Дождись пока часть ' \
                             'кодов будут активированы либо обратись к администратору бота для очистки списка кодов.'
 INVITE_CODE_GEN = '🔗 Команда приглашения нового пользователя:\n\n/invite_{code}\n\nДля получения доступа к ' \
                   'функционалу бота, новый пользователь должен прислать данную команду или переслать это сообщение.\n' \
                   'Будьте внимательны: код команды приглашения чувствителен к регистру!'
+INVITE_WRONG_ARGUMENTS = '❌ Неверные параметры команды! Пример команды:\n/invite 10 48 2\n- 10 команд приглашения, ' \
+                         'действующих 48 часов, каждую из которых можно использовать 2 раза'
+INVITE_CODES_GEN = '🔗 Команды приглашения новых пользователей ({count} шт.{limits}):\n\n{codes}\n\nДля получения ' \
+                   'доступа к функционалу бота, новый пользователь должен прислать одну из команд. Аннулировать ' \
+                   'команду можно командой /cancel_XXXXX, где XXXXX - код команды.'
+INVITE_CODES_GEN_FILE = '🔗 Команды приглашения новых пользователей ({count} шт.{limits}) в файле. Для получения ' \
+                        'доступа к функционалу бота, новый пользователь должен прислать одну из команд.'
+INVITE_CODES_TTL = ', срок действия {hours} ч.'
+INVITE_CODES_USES = ', активаций каждой команды: {uses}'
 INVITE_CODE_NOT_SAVED_CONF = '❌ Ошибка обновления информации об авторизованных пользователях! Обратись к ' \
                              'администратору бота.'
 INVITE_CODE_GEN_NOT_SAVED_CONF = '❌ Ошибка обновления информации о пригласительном коде! Обратись к администратору ' \
@@ -78,3 +92,31 @@ CANCEL_INVITE_NOT_EXIST = '❌ Команда /invite_{code} не существ
 CANCEL_INVITE_DONE = '✅ Команда /invite_{code} аннулирована'
 CANCEL_INVITE_NOT_SAVED_CONF = '❌ Не удалось удалить команду /invite_{code} из реестра. Попробуйте удалить команду ' \
                                 'позже или удалите команду из файла конфигурации вручную'
+USERS_LIST_EMPTY = '🤷‍♂️ Список пользователей пуст'
+USERS_LIST_PAGE = '👥 Пользователи {first}-{last} из {total}:\n\n{items}'
+USERS_LIST_ITEM = '{number}. {username}id {user_id}{added}\nзаблокировать: /block_{user_id}\n'
+USERS_LIST_ADDED = ', добавлен {date}'
+INVITES_LIST_EMPTY = '🤷‍♂️ Нет действующих команд приглашения'
+INVITES_LIST_PAGE = '🔗 Команды приглашения {first}-{last} из {total}:\n\n{items}'
+INVITES_LIST_ITEM = '{number}. /invite_{code} (осталось активаций: {uses_left}{expires})\nаннулировать: ' \
+                    '/cancel_{code}\n'
+INVITES_LIST_EXPIRES = ', действует до {date}'
+LIST_PREVIOUS_PAGE = '◀️ Назад'
+HISTORY_NOT_AVAILABLE = '❌ Не удалось прочитать журнал открытия шлагбаумов! Подробности в логе бота.'
+HISTORY_EMPTY = '🤷‍♂️ Событий открытия шлагбаумов не найдено'
+HISTORY_TITLE = 'Последние открытия шлагбаумов'
+HISTORY_USER_TITLE = 'Последние открытия шлагбаумов пользователем с id {user_id}'
+HISTORY_GATE_TITLE = 'Последние открытия шлагбаума №{gate}'
+HISTORY_PAGE = '📜 {title} ({count}):\n\n{items}'
+HISTORY_ITEM = '{date} {outcome} №{gate}, /history_user_{user_id} ({latency} мс)\n'
+HISTORY_OPENED = '✅'
+HISTORY_FAILED = '❌ ({reason})'
+LIST_NEXT_PAGE = 'Вперед ▶️'
+BROADCAST_EMPTY_TEXT = '❌ Не указан текст рассылки! Пример команды:\n/broadcast Шлагбаум №1 не работает'
+BROADCAST_ALREADY_RUNNING = '❌ Предыдущая рассылка ещё не завершена! Попробуй позже.'
+BROADCAST_NO_RECIPIENTS = '🤷‍♂️ Некому отправлять рассылку: список пользователей пуст'
+BROADCAST_STARTED = '📣 Рассылка запущена. Получателей: {total}'
+BROADCAST_PROGRESS = '📣 Рассылка: обработано {done} из {total} (доставлено: {sent}, ошибок: {failed}, заблокировали ' \
+                     'бота: {blocked})'
+BROADCAST_FINISHED = '✅ Рассылка завершена. Доставлено: {sent} из {total}, ошибок: {failed}, заблокировали ' \
+                     'бота (удалены из списка пользователей): {blocked}'
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+
+
+"""
+Проверка журнала открытия шлагбаумов (audit.AuditLog): выборка последних событий по пользователю, шлагбауму и времени,
+использование индексов.
+Запуск: python -m pytest tests (или python -m unittest discover tests)
+"""
+
+
+import tempfile
+import unittest
+import sys
+import os
+
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+
+import audit
+
+
+class AuditLogTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.audit_log = audit.AuditLog(os.path.join(self.directory.name, 'gatekeeper.audit'))
+        for i in range(10):
+            self.assertTrue(self.audit_log.record(user_id=100 + i % 2, gate=1 + i % 3, outcome=0 if i % 4 else 1,
+                                                  latency=0.25, timestamp=1000 + i))
+
+    def tearDown(self):
+        self.audit_log.close()
+        self.directory.cleanup()
+
+    def test_query(self):
+        events = self.audit_log.query(limit=3)
+        self.assertEqual([event.time for event in events], [1009, 1008, 1007])
+        self.assertEqual(events[0], audit.Event(time=1009, user_id=101, gate=1, outcome=0, latency=250))
+        self.assertEqual(len(self.audit_log.query(limit=100)), 10)
+
+    def test_filters(self):
+        self.assertEqual([event.time for event in self.audit_log.query(user_id=100)], [1008, 1006, 1004, 1002, 1000])
+        self.assertEqual([event.time for event in self.audit_log.query(gate=2)], [1007, 1004, 1001])
+        self.assertEqual([event.time for event in self.audit_log.query(user_id=101, gate=2)], [1007, 1001])
+        self.assertEqual([event.time for event in self.audit_log.query(since=1007)], [1009, 1008, 1007])
+        self.assertEqual(self.audit_log.query(user_id=999), list())
+
+    def test_same_time_order(self):
+        self.audit_log.record(user_id=200, gate=1, outcome=0, latency=0, timestamp=2000)
+        self.audit_log.record(user_id=201, gate=1, outcome=0, latency=0, timestamp=2000)
+        # События с одинаковым временем упорядочены по порядку добавления
+        self.assertEqual([event.user_id for event in self.audit_log.query(limit=2)], [201, 200])
+
+    def test_indexes(self):
+        for statement, parameters in (('user_id = ?', (100,)), ('gate = ?', (1,))):
+            with self.audit_log._lock:
+                plan = self.audit_log._connect().execute(
+                    f'EXPLAIN QUERY PLAN SELECT time FROM events WHERE {statement} ORDER BY time DESC LIMIT 20',
+                    parameters).fetchall()
+            self.assertTrue(any('USING INDEX' in row[-1] or 'USING COVERING INDEX' in row[-1] for row in plan))
+
+    def test_persistence(self):
+        self.audit_log.close()
+        reopened = audit.AuditLog(self.audit_log.path)
+        self.assertEqual(len(reopened.query(limit=100)), 10)
+        reopened.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
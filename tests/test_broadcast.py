@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+
+
+"""
+Проверка рассылки (telegram.broadcast.Broadcaster): продолжение прерванной рассылки из журнала, удаление
+заблокировавших бота пользователей, общее для всех потоков ожидание при превышении ограничения скорости telegram.
+Запуск: python -m pytest tests (или python -m unittest discover tests)
+"""
+
+
+import tempfile
+import threading
+import unittest
+import base64
+import json
+import time
+import sys
+import os
+
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+
+import telebot
+
+
+import telegram.broadcast
+import settings
+
+
+BOT_TOKEN = '123456789:' + 'A' * 35
+
+
+def api_error(error_code: int, retry_after: float | None = None) -> telebot.apihelper.ApiTelegramException:
+    result_json = {'ok': False, 'error_code': error_code, 'description': 'test error'}
+    if retry_after is not None:
+        result_json['parameters'] = {'retry_after': retry_after}
+    return telebot.apihelper.ApiTelegramException('sendMessage', None, result_json)
+
+
+class FakeBot:
+    def __init__(self, errors: dict | None = None, on_send=None):
+        """
+        :param errors: Ошибки отправки (id чата -> список исключений для очередных попыток)
+        :param on_send: (необязательно) Функция, вызываемая перед каждой отправкой
+        """
+        self.errors = errors if errors is not None else dict()
+        self.on_send = on_send
+        self.sent: list[tuple[int, str, float]] = list()
+        self.lock = threading.Lock()
+
+    def send_message(self, chat_id: int, text: str):
+        if self.on_send is not None:
+            self.on_send(chat_id)
+        with self.lock:
+            errors = self.errors.get(chat_id)
+            if errors:
+                raise errors.pop(0)
+            self.sent.append((chat_id, text, time.monotonic()))
+
+
+class BroadcastTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.journal_path = os.path.join(self.directory.name, 'gatekeeper.broadcast')
+        config_path = os.path.join(self.directory.name, 'gatekeeper.conf')
+        with open(config_path, 'w') as f:
+            json.dump({'gatekeeper': {'phone': 79000000000, 'key': ''},
+                       'telegram': {'bot_token': base64.b64encode(BOT_TOKEN.encode()).decode(), 'phone_owner': 1,
+                                    'access_list': [2, 3, 4, 5], 'invite_codes': list()}}, f)
+        # Settings - одиночка: для каждой проверки создается новый объект (нужен для удаления заблокировавших бота)
+        settings.Settings._Settings__instance = None
+        self.config = settings.Settings(config_path)
+        self.assertTrue(self.config.load())
+
+    def tearDown(self):
+        self.config._storage.close()
+        self.directory.cleanup()
+
+    def wait(self, broadcaster: telegram.broadcast.Broadcaster) -> None:
+        deadline = time.monotonic() + 10
+        while broadcaster.running and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertFalse(broadcaster.running)
+
+    def test_broadcast(self):
+        bot = FakeBot({4: [api_error(403)], 5: [api_error(400)]})
+        reports = list()
+        broadcaster = telegram.broadcast.Broadcaster(bot, self.journal_path, workers=2, rate=1000)
+        self.assertTrue(broadcaster.start('text', [2, 3, 4, 5, 3], reports.append))
+        self.wait(broadcaster)
+        self.assertEqual(sorted(chat_id for chat_id, _, _ in bot.sent), [2, 3])
+        self.assertEqual(reports[-1], telegram.broadcast.Progress(total=4, sent=2, failed=1, blocked=1, finished=True))
+        self.assertFalse(os.path.exists(self.journal_path))
+        self.assertTrue(self.config.flush(5))
+        self.assertEqual(sorted(self.config.data.telegram.access_list), [2, 3, 5])
+
+    def test_resume(self):
+        self.assertFalse(telegram.broadcast.Broadcaster(FakeBot(), self.journal_path).resume())
+        with open(self.journal_path, 'w') as f:
+            json.dump({'text': 'text', 'pending': [4, 5], 'total': 4, 'sent': 1, 'failed': 0, 'blocked': [3]}, f)
+        bot = FakeBot()
+        reports = list()
+        broadcaster = telegram.broadcast.Broadcaster(bot, self.journal_path, workers=2, rate=1000)
+        self.assertTrue(broadcaster.resume(reports.append))
+        self.wait(broadcaster)
+        # Отправляются только не обработанные до остановки получатели, учет продолжается с сохраненных значений
+        self.assertEqual(sorted(chat_id for chat_id, _, _ in bot.sent), [4, 5])
+        self.assertEqual(reports[-1], telegram.broadcast.Progress(total=4, sent=3, failed=0, blocked=1, finished=True))
+        self.assertFalse(os.path.exists(self.journal_path))
+        self.assertTrue(self.config.flush(5))
+        self.assertEqual(sorted(self.config.data.telegram.access_list), [2, 4, 5])
+
+    def test_stop_and_resume(self):
+        chat_ids = list(range(10, 30))
+        broadcaster: telegram.broadcast.Broadcaster | None = None
+
+        def stop_after_first(chat_id: int) -> None:
+            # Остановка без ожидания: поток отправки не может ждать завершения рассылки
+            if len(first.sent) == 2:
+                broadcaster.stop(0)
+
+        first = FakeBot(on_send=stop_after_first)
+        broadcaster = telegram.broadcast.Broadcaster(first, self.journal_path, workers=1, rate=1000)
+        self.assertTrue(broadcaster.start('text', chat_ids))
+        self.wait(broadcaster)
+        with open(self.journal_path, 'r') as f:
+            journal = json.load(f)
+        sent_first = {chat_id for chat_id, _, _ in first.sent}
+        self.assertLess(len(sent_first), len(chat_ids))
+        self.assertEqual(set(journal['pending']), set(chat_ids) - sent_first)
+        self.assertEqual(journal['sent'], len(sent_first))
+        # Продолжение рассылки новым объектом (например, после перезапуска бота)
+        second = FakeBot()
+        broadcaster = telegram.broadcast.Broadcaster(second, self.journal_path, workers=2, rate=1000)
+        self.assertTrue(broadcaster.resume())
+        self.wait(broadcaster)
+        sent_second = [chat_id for chat_id, _, _ in second.sent]
+        self.assertEqual(sorted(sent_first.union(sent_second)), chat_ids)
+        self.assertEqual(len(sent_first) + len(sent_second), len(chat_ids))
+        self.assertFalse(os.path.exists(self.journal_path))
+
+    def test_retry_after(self):
+        bot = FakeBot({2: [api_error(429, retry_after=0.5)]})
+        broadcaster = telegram.broadcast.Broadcaster(bot, self.journal_path, workers=4, rate=1000)
+        started = time.monotonic()
+        self.assertTrue(broadcaster.start('text', [2, 3, 4, 5]))
+        self.wait(broadcaster)
+        self.assertEqual(sorted(chat_id for chat_id, _, _ in bot.sent), [2, 3, 4, 5])
+        # Повторная отправка выполняется после паузы
+        self.assertGreaterEqual(max(sent_at for _, _, sent_at in bot.sent) - started, 0.5)
+
+    def test_rate_limiter_pause(self):
+        limiter = telegram.broadcast.RateLimiter(1000)
+        limiter.pause(0.3)
+        started = time.monotonic()
+        threads = [threading.Thread(target=limiter.acquire) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # Пауза действует на все потоки, ожидающие разрешения
+        self.assertGreaterEqual(time.monotonic() - started, 0.29)
+
+
+if __name__ == '__main__':
+    unittest.main()
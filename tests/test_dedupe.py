@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+
+
+"""
+Проверка объединения повторяющихся запросов внутри процесса (telegram.dedupe.Deduplicator): окно повторного
+использования результата, неудачные результаты и ошибки.
+Запуск: python -m pytest tests (или python -m unittest discover tests)
+"""
+
+
+import concurrent.futures
+import threading
+import unittest
+import time
+import sys
+import os
+
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+
+import telegram.dedupe
+
+
+class DeduplicatorTest(unittest.TestCase):
+    def setUp(self):
+        self.deduplicator = telegram.dedupe.Deduplicator()
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def func(self, result='opened', delay: float = 0):
+
+        def request():
+            with self.lock:
+                self.calls += 1
+            time.sleep(delay)
+            return result
+
+        return request
+
+    def test_concurrent(self):
+        with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(lambda _: self.deduplicator.run(1, 5, self.func(delay=0.2)), range(4)))
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(sorted(results), [('opened', False)] + [('opened', True)] * 3)
+
+    def test_window(self):
+        self.assertEqual(self.deduplicator.run(1, 0.2, self.func()), ('opened', False))
+        self.assertEqual(self.deduplicator.run(1, 0.2, self.func()), ('opened', True))
+        # Другой ключ не объединяется
+        self.assertEqual(self.deduplicator.run(2, 0.2, self.func()), ('opened', False))
+        time.sleep(0.25)
+        self.assertEqual(self.deduplicator.run(1, 0.2, self.func()), ('opened', False))
+        self.assertEqual(self.calls, 3)
+
+    def test_disabled(self):
+        for _ in range(3):
+            self.assertEqual(self.deduplicator.run(1, 0, self.func()), ('opened', False))
+        self.assertEqual(self.calls, 3)
+
+    def test_not_reusable(self):
+        # Неудачный результат не используется повторно после завершения запроса
+        for _ in range(2):
+            self.assertEqual(self.deduplicator.run(1, 5, self.func('failed'), lambda result: result == 'opened'),
+                             ('failed', False))
+        self.assertEqual(self.calls, 2)
+
+    def test_error(self):
+        started = threading.Event()
+
+        def fail():
+            started.set()
+            time.sleep(0.2)
+            raise ConnectionError('test error')
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+            first = executor.submit(self.deduplicator.run, 1, 5, fail)
+            self.assertTrue(started.wait(5))
+            # Присоединенный запрос получает ошибку выполняемого запроса
+            with self.assertRaises(ConnectionError):
+                self.deduplicator.run(1, 5, self.func())
+            with self.assertRaises(ConnectionError):
+                first.result(5)
+        self.assertEqual(self.deduplicator.run(1, 5, self.func()), ('opened', False))
+        self.assertEqual(self.calls, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+
+
+"""
+Проверка вспомогательных методов telegram бота (telegram.helpers): получение id пользователя по сообщению (long polling
+с подтверждением обновлений), клиент Bot API (кэширование по токену, отправка нескольким получателям). Запросы к серверу
+telegram подменяются.
+Запуск: python -m pytest tests (или python -m unittest discover tests)
+"""
+
+
+import unittest.mock
+import threading
+import unittest
+import time
+import sys
+import os
+
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+
+import telegram.helpers
+
+
+def update(update_id: int, text: str, user_id: int = 2) -> dict:
+    return {'update_id': update_id, 'message': {'message_id': update_id, 'text': text, 'from': {'id': user_id}}}
+
+
+class FakeResponse:
+    def __init__(self, data: dict):
+        self.data = data
+
+    def json(self) -> dict:
+        return self.data
+
+
+class GetUserIdTest(unittest.TestCase):
+    def poll(self, answers: list[dict], message: str = 'Secret') -> tuple[int | None, list[dict]]:
+        """
+        Получение id пользователя с подмененными ответами сервера
+        :return: Результат и параметры запросов к серверу
+        """
+        requests_params = list()
+
+        def get(session, url, params=None, timeout=None):
+            requests_params.append(dict(params))
+            return FakeResponse(answers.pop(0) if len(answers) > 0 else {'ok': True, 'result': list()})
+
+        with unittest.mock.patch.object(telegram.helpers, 'check_token', return_value=True), \
+                unittest.mock.patch.object(telegram.helpers.requests.Session, 'get', get), \
+                unittest.mock.patch.object(telegram.helpers.time, 'sleep'):
+            return telegram.helpers.get_user_id_by_message('token', message), requests_params
+
+    def test_offset(self):
+        user_id, params = self.poll([{'ok': True, 'result': [update(10, 'hello'), update(11, 'other')]},
+                                     {'ok': False, 'error_code': 502},
+                                     {'ok': True, 'result': [update(12, 'secret', user_id=42), update(13, 'next')]}])
+        self.assertEqual(user_id, 42)
+        # Каждый ответ подтверждает все обновления предыдущего ответа, найденное сообщение подтверждается без ожидания
+        self.assertEqual([(p['offset'], p['timeout']) for p in params],
+                         [(None, telegram.helpers.POLL_TIMEOUT), (12, telegram.helpers.POLL_TIMEOUT),
+                          (12, telegram.helpers.POLL_TIMEOUT), (13, 0)])
+        self.assertEqual(params[-1]['limit'], 1)
+
+    def test_wrong_arguments(self):
+        self.assertIsNone(telegram.helpers.get_user_id_by_message('token', None))
+        with unittest.mock.patch.object(telegram.helpers, 'check_token', return_value=False):
+            self.assertIsNone(telegram.helpers.get_user_id_by_message('token', 'Secret'))
+
+
+class ClientTest(unittest.TestCase):
+    def tearDown(self):
+        with telegram.helpers._clients_lock:
+            clients = list(telegram.helpers._clients.values())
+            telegram.helpers._clients.clear()
+        for client in clients:
+            client.close()
+
+    def test_cache(self):
+        first = telegram.helpers.client('first')
+        self.assertIs(telegram.helpers.client('first'), first)
+        closed = threading.Event()
+        with unittest.mock.patch.object(telegram.helpers, 'CLOSE_GRACE_PERIOD', 0.2), \
+                unittest.mock.patch.object(first, 'close', closed.set):
+            second = telegram.helpers.client('second')
+            self.assertIsNot(second, first)
+            # Прежний клиент закрывается не сразу: начатые через него запросы успевают завершиться
+            self.assertFalse(closed.is_set())
+            self.assertTrue(closed.wait(5))
+        self.assertIs(telegram.helpers.client('second'), second)
+
+    def test_send_message(self):
+        client = telegram.helpers.TelegramClient('token')
+        answers = {2: [{'ok': True}],
+                   3: [{'ok': False, 'error_code': 429, 'parameters': {'retry_after': 0.1}}, {'ok': True}],
+                   4: [{'ok': False, 'error_code': 403}],
+                   5: [{'ok': False, 'error_code': 400}]}
+        lock = threading.Lock()
+
+        def call(method: str, data: dict | None = None) -> dict:
+            self.assertEqual(method, 'sendMessage')
+            with lock:
+                return answers[data['chat_id']].pop(0)
+
+        with unittest.mock.patch.object(client, 'call', call):
+            started = time.monotonic()
+            self.assertEqual(client.send_message(3, 'text'), 'sent')
+            self.assertGreaterEqual(time.monotonic() - started, 0.1)
+            answers[3] = [{'ok': True}]
+            self.assertEqual(client.send_messages([2, 3, 4, 5, 2], 'text'),
+                             {2: 'sent', 3: 'sent', 4: 'blocked', 5: 'failed'})
+        client.close()
+
+    def test_send_messages_arguments(self):
+        self.assertEqual(telegram.helpers.send_messages('', [2, 3], 'text'), {2: 'failed', 3: 'failed'})
+        self.assertFalse(telegram.helpers.send_message('token', 0, 'text'))
+        self.assertFalse(telegram.helpers.send_message('token', 2, ''))
+
+
+if __name__ == '__main__':
+    unittest.main()
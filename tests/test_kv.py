@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+
+
+"""
+Проверка хранилища настроек (storage.KVStorage), общего состояния (state.KVState) и объединения запросов между
+экземплярами бота (telegram.dedupe.Deduplicator) на локальном сервере ключ-значение (kv.KVServer).
+Запуск: python -m pytest tests (или python -m unittest discover tests)
+"""
+
+
+import concurrent.futures
+import threading
+import unittest
+import time
+import sys
+import os
+
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+
+import telegram.dedupe
+import storage
+import state
+import kv
+
+
+TOKEN = 'test-secret'
+
+
+def document(access_list: list[int]) -> dict:
+    return {
+        'gatekeeper': {'phone': 79000000000, 'key': ''},
+        'telegram': {'bot_token': '', 'phone_owner': 1, 'access_list': access_list,
+                     'users': {str(user_id): {'username': f'user{user_id}'} for user_id in access_list},
+                     'invite_codes': ['code'], 'invites': {'code': {'created_by': 1}}},
+        'bot': {'write_delay': 0}
+    }
+
+
+class KVTestCase(unittest.TestCase):
+    server: kv.KVServer
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = kv.KVServer('127.0.0.1', 0, token=TOKEN)
+        cls.server.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def url(self, namespace: str) -> str:
+        host, port = self.server.address
+        return f'kv://{TOKEN}@{host}:{port}/{namespace}'
+
+
+class KVStorageTest(KVTestCase):
+    def test_write_read(self):
+        settings_storage = storage.KVStorage(self.url('write_read'))
+        self.assertFalse(settings_storage.exists())
+        settings_storage.write(document([1, 2]))
+        self.assertTrue(settings_storage.exists())
+        result = settings_storage.read()
+        self.assertEqual(sorted(result['telegram']['access_list']), [1, 2])
+        self.assertEqual(result['telegram']['users']['2'], {'username': 'user2'})
+        self.assertEqual(result['telegram']['invite_codes'], ['code'])
+        self.assertEqual(result['gatekeeper']['phone'], 79000000000)
+        # Полная перезапись удаляет прежние значения
+        settings_storage.write(document([3]))
+        self.assertEqual(settings_storage.read()['telegram']['access_list'], [3])
+
+    def test_apply(self):
+        settings_storage = storage.KVStorage(self.url('apply'))
+        settings_storage.write(document([1]))
+        settings_storage.apply([storage.Change('add_user', {'user_id': 5, 'username': None, 'invited_by': 1,
+                                                            'invite_code': 'code', 'added': 100}),
+                                storage.Change('remove_user', 1),
+                                storage.Change('remove_invite', 'code'),
+                                storage.Change('add_invite', {'code': 'new', 'created_by': 5, 'created': 200}),
+                                storage.Change('set', ('gatekeeper', 'key', 'a2V5'))], lambda: dict())
+        result = settings_storage.read()
+        self.assertEqual(result['telegram']['access_list'], [5])
+        self.assertEqual(result['telegram']['users']['5'], {'invited_by': 1, 'invite_code': 'code', 'added': 100})
+        self.assertEqual(result['telegram']['invite_codes'], ['new'])
+        self.assertEqual(result['gatekeeper']['key'], 'a2V5')
+
+    def test_changed(self):
+        first = storage.KVStorage(self.url('changed'))
+        second = storage.KVStorage(self.url('changed'))
+        other = storage.KVStorage(self.url('changed_other'))
+        first.write(document([1]))
+        second.read()
+        other.write(document([1]))
+        # Собственные изменения и изменения другого пространства имен не считаются внешними
+        first.apply([storage.Change('remove_user', 1)], lambda: dict())
+        other.apply([storage.Change('remove_user', 1)], lambda: dict())
+        self.assertFalse(first.changed())
+        self.assertTrue(second.changed())
+        second.read()
+        self.assertFalse(second.changed())
+
+    def test_unauthorized(self):
+        host, port = self.server.address
+        for url in (f'kv://{host}:{port}/unauthorized', f'kv://wrong@{host}:{port}/unauthorized'):
+            with self.assertRaises(ConnectionError):
+                storage.KVStorage(url).read()
+
+
+class KVStateTest(KVTestCase):
+    def test_get_set(self):
+        shared_state = state.KVState(self.url('state'))
+        self.assertTrue(shared_state.shared)
+        self.assertIsNone(shared_state.get('missing'))
+        shared_state.set('key', {'value': 1}, 60)
+        self.assertEqual(shared_state.get('key'), {'value': 1})
+        shared_state.delete('key')
+        self.assertIsNone(shared_state.get('key'))
+
+    def test_claim(self):
+        first = state.KVState(self.url('claim'))
+        second = state.KVState(self.url('claim'))
+        self.assertEqual(first.claim('lock', 'first', 60), (True, 'first'))
+        self.assertEqual(second.claim('lock', 'second', 60), (False, 'first'))
+        first.delete('lock')
+        self.assertEqual(second.claim('lock', 'second', 60), (True, 'second'))
+
+    def test_ttl(self):
+        shared_state = state.KVState(self.url('ttl'))
+        shared_state.set('key', 'value', 0.2)
+        self.assertEqual(shared_state.claim('lock', 'first', 0.2), (True, 'first'))
+        self.assertEqual(shared_state.get('key'), 'value')
+        time.sleep(0.3)
+        self.assertIsNone(shared_state.get('key'))
+        self.assertEqual(shared_state.claim('lock', 'second', 60), (True, 'second'))
+
+
+class DeduplicatorTest(KVTestCase):
+    def test_shared_run(self):
+        calls = list()
+        lock = threading.Lock()
+
+        def func() -> int:
+            with lock:
+                calls.append(time.monotonic())
+            time.sleep(0.3)
+            return 42
+
+        instances = [telegram.dedupe.Deduplicator(state.KVState(self.url('dedupe')), name='gate', timeout=5)
+                     for _ in range(2)]
+        with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+            results = list(executor.map(lambda instance: instance.run(1, 5, func), instances))
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(results), [(42, False), (42, True)])
+
+
+class SharedStateTest(unittest.TestCase):
+    def test_abstract(self):
+        with self.assertRaises(TypeError):
+            state.SharedState()
+
+
+if __name__ == '__main__':
+    unittest.main()
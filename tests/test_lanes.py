@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+
+
+"""
+Проверка приоритетных очередей обработки сообщений (telegram.lanes.Lanes): независимость полос, ожидание выполнения
+задач, приоритеты обработчиков, отбрасывание устаревших сообщений.
+Запуск: python -m pytest tests (или python -m unittest discover tests)
+"""
+
+
+import tempfile
+import threading
+import unittest
+import base64
+import types
+import json
+import time
+import sys
+import os
+
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+
+import telegram.lanes
+import settings
+
+
+BOT_TOKEN = '123456789:' + 'A' * 35
+
+
+class LanesTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.lanes = telegram.lanes.Lanes({'high': 1, 'normal': 1, 'low': 1})
+        self.config: settings.Settings | None = None
+
+    def tearDown(self):
+        self.lanes.shutdown(wait=True)
+        if self.config is not None:
+            self.config._storage.close()
+        self.directory.cleanup()
+
+    def open_settings(self, bot: dict) -> settings.Settings:
+        """
+        Загрузка настроек с указанным разделом bot (Settings - одиночка, для каждой проверки создается новый объект)
+        """
+        path = os.path.join(self.directory.name, 'gatekeeper.conf')
+        with open(path, 'w') as f:
+            json.dump({'gatekeeper': {'phone': 79000000000, 'key': ''},
+                       'telegram': {'bot_token': base64.b64encode(BOT_TOKEN.encode()).decode(), 'phone_owner': 1,
+                                    'access_list': list(), 'invite_codes': list()},
+                       'bot': bot}, f)
+        settings.Settings._Settings__instance = None
+        self.config = settings.Settings(path)
+        self.assertTrue(self.config.load())
+        return self.config
+
+
+class LanesTest(LanesTestCase):
+    def test_lanes_isolated(self):
+        release = threading.Event()
+        done = threading.Event()
+        self.lanes.submit(telegram.lanes.Priority.LOW, release.wait, 5)
+        self.lanes.submit(telegram.lanes.Priority.LOW, lambda: None)
+        # Задача полосы с высоким приоритетом не ждет занятую полосу с низким приоритетом
+        self.lanes.submit(telegram.lanes.Priority.HIGH, done.set)
+        self.assertTrue(done.wait(5))
+        self.assertEqual(self.lanes.lanes_in_flight()['low'], 2)
+        self.assertFalse(self.lanes.drain(0.1))
+        release.set()
+        self.assertTrue(self.lanes.drain(5))
+        self.assertEqual(self.lanes.in_flight, 0)
+        self.assertEqual(self.lanes.lanes_in_flight(), {'high': 0, 'normal': 0, 'low': 0})
+
+    def test_failed_task(self):
+
+        def fail():
+            raise ValueError('test error')
+
+        future = self.lanes.submit(telegram.lanes.Priority.NORMAL, fail)
+        self.assertIsNone(future.result(5))
+        self.assertTrue(self.lanes.drain(5))
+        self.assertEqual(self.lanes.in_flight, 0)
+
+    def test_submit_after_shutdown(self):
+        self.lanes.shutdown(wait=True)
+        with self.assertRaises(RuntimeError):
+            self.lanes.submit(telegram.lanes.Priority.HIGH, lambda: None)
+        self.assertEqual(self.lanes.in_flight, 0)
+
+
+class PriorityTest(LanesTestCase):
+    def test_priorities(self):
+        self.open_settings({'handler_priorities': {'video': 'high', 'open_gate': 'wrong'}})
+        self.assertEqual(telegram.lanes.Lanes.priority('video'), telegram.lanes.Priority.HIGH)
+        # Неверное значение в настройках и обработчики без настроек - приоритет по умолчанию
+        self.assertEqual(telegram.lanes.Lanes.priority('open_gate'), telegram.lanes.Priority.HIGH)
+        self.assertEqual(telegram.lanes.Lanes.priority('broadcast'), telegram.lanes.Priority.LOW)
+        self.assertEqual(telegram.lanes.Lanes.priority('unknown'), telegram.lanes.Priority.NORMAL)
+
+
+class StaleMessageTest(LanesTestCase):
+    @staticmethod
+    def message(age: float, text: str | None = '/open_1'):
+        return types.SimpleNamespace(date=int(time.time() - age), text=text,
+                                     from_user=types.SimpleNamespace(id=2, username=None))
+
+    def test_drop_stale(self):
+        self.open_settings({'pending_max_age': 60})
+        handled = list()
+
+        @self.lanes.lane('open_gate')
+        def handler(message):
+            handled.append(message.text)
+
+        handler(self.message(0, '/open_1'))
+        handler(self.message(120, '/open_2'))
+        handler(self.message(120, None))
+        handler(self.message(120, 'x' * 1000))
+        # У нажатий кнопок нет времени отправки: они обрабатываются всегда
+        handler(types.SimpleNamespace(text='/open_3', from_user=types.SimpleNamespace(id=2)))
+        self.assertTrue(self.lanes.drain(5))
+        self.assertEqual(sorted(handled), ['/open_1', '/open_3'])
+
+    def test_drop_disabled(self):
+        self.open_settings({'pending_max_age': 0})
+        handled = list()
+
+        @self.lanes.lane('video')
+        def handler(message):
+            handled.append(message.text)
+
+        handler(self.message(3600))
+        self.assertTrue(self.lanes.drain(5))
+        self.assertEqual(handled, ['/open_1'])
+
+    def test_log_text(self):
+        self.assertEqual(telegram.lanes._log_text(self.message(0, 'text')), '"text"')
+        self.assertEqual(telegram.lanes._log_text(self.message(0, None)), 'without text')
+        self.assertEqual(telegram.lanes._log_text(self.message(0, 'x' * 1000)),
+                         '"' + 'x' * telegram.lanes.LOG_TEXT_MAX_LENGTH + '..."')
+
+
+if __name__ == '__main__':
+    unittest.main()
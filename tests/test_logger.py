@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+
+
+"""
+Проверка логгера (logger.Logger): отложенное формирование текста записей, ограничение частоты записей с выборкой и
+подсчетом подавленных записей, ротация файла лога по размеру со сжатием сегментов.
+Запуск: python -m pytest tests (или python -m unittest discover tests)
+"""
+
+
+import tempfile
+import unittest
+import gzip
+import time
+import sys
+import os
+
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+
+import logger
+
+
+class LoggerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'gatekeeper.log')
+        # Logger - одиночка: для каждой проверки создается новый объект, прежний восстанавливается после проверки
+        self.previous = logger.Logger._Logger__instance
+        logger.Logger._Logger__instance = None
+        self.logger = logger.Logger(logger.LogLevel.INFO, False, True, self.path)
+
+    def tearDown(self):
+        self.logger.close()
+        logger.Logger._Logger__instance = self.previous
+        self.directory.cleanup()
+
+    def lines(self) -> list[str]:
+        self.assertTrue(self.logger.flush(5))
+        with open(self.path, 'r', encoding='utf-8') as f:
+            return [line.split(' :: ', 2)[2] for line in f.read().splitlines() if line != '']
+
+
+class FormattingTest(LoggerTestCase):
+    def test_template(self):
+        self.assertTrue(self.logger.info('[Test] Gate {} opened by {user}', 1, user='@user'))
+        self.assertTrue(self.logger.info('[Test] Text without {braces}'))
+        self.assertEqual(self.lines(), ['[Test] Gate 1 opened by @user', '[Test] Text without {braces}'])
+
+    def test_lazy(self):
+        calls = list()
+
+        def text() -> str:
+            calls.append(1)
+            return '[Test] Lazy text'
+
+        # Текст записи ниже текущего уровня логирования не формируется
+        self.assertFalse(self.logger.debug(text))
+        self.assertFalse(self.logger.debug('[Test] {}', ValueError))
+        self.assertEqual(calls, list())
+        self.assertTrue(self.logger.info(text))
+        self.assertEqual(calls, [1])
+        self.assertFalse(self.logger.is_enabled(logger.LogLevel.DEBUG))
+        self.assertTrue(self.logger.is_enabled(logger.LogLevel.ERROR))
+        self.assertEqual(self.lines(), ['[Test] Lazy text'])
+
+    def test_formatting_failure(self):
+        self.assertTrue(self.logger.error('[Test] {missing}', 1))
+        self.assertFalse(self.logger.error(lambda: ''))
+        lines = self.lines()
+        self.assertEqual(len(lines), 1)
+        self.assertIn('log record formatting failed', lines[0])
+
+
+class RateLimitTest(LoggerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.logger.rate_limit = 10
+        self.logger.rate_burst = 2
+        self.logger.sample_rate = 0
+
+    def test_suppression_count(self):
+        results = [self.logger.warning('[Test] Record {}', i, limit_key='test') for i in range(5)]
+        self.assertEqual(results, [True, True, False, False, False])
+        # Другие ключи и записи без ключа не ограничиваются
+        self.assertTrue(self.logger.warning('[Test] Other key', limit_key='other'))
+        self.assertTrue(self.logger.warning('[Test] Without key'))
+        time.sleep(0.15)
+        self.assertTrue(self.logger.warning('[Test] Record {}', 5, limit_key='test'))
+        self.assertEqual(self.lines(), ['[Test] Record 0', '[Test] Record 1', '[Test] Other key', '[Test] Without key',
+                                        '[Test] Record 5 (suppressed 3 similar records)'])
+
+    def test_lazy_text_not_formatted(self):
+        calls = list()
+
+        def text() -> str:
+            calls.append(1)
+            return '[Test] Lazy record'
+
+        for _ in range(4):
+            self.logger.warning(text, limit_key='lazy')
+        # Ограничение проверяется до формирования текста записи
+        self.assertEqual(len(calls), 2)
+
+    def test_sampling(self):
+        self.logger.rate_limit = 0.001
+        self.logger.rate_burst = 1
+        self.logger.sample_rate = 3
+        results = [self.logger.warning('[Test] Record {}', i, limit_key='sample') for i in range(7)]
+        self.assertEqual(results, [True, False, False, True, False, False, True])
+        self.assertEqual(self.lines(), ['[Test] Record 0', '[Test] Record 3 (suppressed 2 similar records)',
+                                        '[Test] Record 6 (suppressed 2 similar records)'])
+
+    def test_report_on_close(self):
+        for i in range(4):
+            self.logger.error('[Test] Record {}', i, limit_key='closing')
+        self.assertTrue(self.logger.close(5))
+        with open(self.path, 'r', encoding='utf-8') as f:
+            text = f.read()
+        self.assertIn('[Logger] Suppressed 2 similar records (limit key: closing)', text)
+        self.assertIn(':: ERROR :: [Logger] Suppressed', text)
+
+    def test_disabled(self):
+        self.logger.rate_limit = 0
+        self.assertTrue(all(self.logger.warning('[Test] Record', limit_key='disabled') for _ in range(10)))
+        self.assertEqual(len(self.lines()), 10)
+
+
+class RotationTest(LoggerTestCase):
+    def wait_compression(self) -> list[tuple[str, bool]]:
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            segments = logger.Logger._segments(self.path)
+            if self.logger._compressor is None and all(compressed for _, compressed in segments):
+                return segments
+            time.sleep(0.05)
+        self.fail('Log segments are not compressed')
+
+    def test_rotate_by_size(self):
+        self.logger.rotate_size = 250
+        self.logger.rotate_keep = 2
+        for batch in range(5):
+            for i in range(5):
+                self.logger.info('[Test] Batch {} record {}', batch, i)
+            self.assertTrue(self.logger.flush(5))
+        # Текущий файл содержит только записи после последней ротации
+        with open(self.path, 'r', encoding='utf-8') as f:
+            self.assertEqual([line.split(' :: ', 2)[2] for line in f.read().splitlines()],
+                             [f'[Test] Batch 4 record {i}' for i in range(5)])
+        segments = self.wait_compression()
+        # Хранятся только последние rotate_keep сегментов, все сегменты сжаты
+        self.assertEqual(len(segments), 2)
+        text = ''
+        for segment, _ in segments:
+            with gzip.open(segment, 'rt', encoding='utf-8') as f:
+                text += f.read()
+        self.assertIn('[Test] Batch 2 record 0', text)
+        self.assertIn('[Test] Batch 3 record 4', text)
+        self.assertNotIn('[Test] Batch 1 ', text)
+
+    def test_no_rotation(self):
+        for i in range(20):
+            self.logger.info('[Test] Record {}', i)
+        self.assertTrue(self.logger.flush(5))
+        self.assertEqual(logger.Logger._segments(self.path), list())
+        self.assertEqual(len(self.lines()), 20)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+
+
+"""
+Проверка планировщика периодических задач (scheduler.Scheduler): запуск по интервалу, отключение задачи, пропуск
+запуска выполняющейся задачи, внеочередной запуск, остановка с ожиданием задач.
+Запуск: python -m pytest tests (или python -m unittest discover tests)
+"""
+
+
+import threading
+import unittest
+import time
+import sys
+import os
+
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+
+import scheduler
+
+
+class SchedulerTest(unittest.TestCase):
+    def setUp(self):
+        self.scheduler: scheduler.Scheduler | None = None
+
+    def tearDown(self):
+        if self.scheduler is not None:
+            self.scheduler.stop(5)
+
+    def start(self, jobs: list[scheduler.Job]) -> scheduler.Scheduler:
+        self.scheduler = scheduler.Scheduler(jobs)
+        self.scheduler.start()
+        return self.scheduler
+
+    def test_interval(self):
+        runs = list()
+        self.start([scheduler.Job('job', lambda: runs.append(time.monotonic()), 0.1, jitter=0, delay=0)])
+        time.sleep(0.55)
+        self.assertTrue(self.scheduler.stop(5))
+        self.assertGreaterEqual(len(runs), 3)
+        self.assertLessEqual(len(runs), 7)
+
+    def test_disabled(self):
+        runs = list()
+        interval = [0]
+        self.start([scheduler.Job('job', lambda: runs.append(1), lambda: interval[0], delay=0),
+                    scheduler.Job('failed', lambda: runs.append(2), lambda: 1 / 0, delay=0)])
+        time.sleep(0.2)
+        # Задача с нулевым интервалом и задача с ошибкой получения интервала не запускаются
+        self.assertEqual(runs, list())
+        # Внеочередной запуск отключенной задачи выполняется
+        self.assertTrue(self.scheduler.run_now('job'))
+        self.assertTrue(self.scheduler.stop(5))
+        self.assertEqual(runs, [1])
+
+    def test_skip_running(self):
+        release = threading.Event()
+        runs = list()
+
+        def job():
+            runs.append(1)
+            release.wait(5)
+
+        self.start([scheduler.Job('job', job, 0.05, jitter=0, delay=0)])
+        time.sleep(0.3)
+        # Пока задача выполняется, новые запуски пропускаются
+        self.assertEqual(len(runs), 1)
+        release.set()
+        self.assertTrue(self.scheduler.stop(5))
+
+    def test_run_now(self):
+        done = threading.Event()
+        self.start([scheduler.Job('job', done.set, 3600)])
+        self.assertFalse(self.scheduler.run_now('unknown'))
+        self.assertTrue(self.scheduler.run_now('job'))
+        self.assertTrue(done.wait(5))
+
+    def test_failed_job(self):
+        runs = list()
+
+        def fail():
+            runs.append(1)
+            raise ValueError('test error')
+
+        self.start([scheduler.Job('job', fail, 0.1, jitter=0, delay=0)])
+        time.sleep(0.35)
+        # Ошибка задачи не останавливает планировщик
+        self.assertGreaterEqual(len(runs), 2)
+
+    def test_stop_timeout(self):
+        release = threading.Event()
+        self.start([scheduler.Job('job', lambda: release.wait(5), 3600)])
+        self.scheduler.run_now('job')
+        self.assertFalse(self.scheduler.stop(0.1))
+        release.set()
+        self.assertTrue(self.scheduler.stop(5))
+
+
+if __name__ == '__main__':
+    unittest.main()
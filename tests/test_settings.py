@@ -0,0 +1,287 @@
+# -*- coding: utf-8 -*-
+
+
+"""
+Проверка настроек (settings.Settings): списки пользователей и кодов приглашения, неизменяемые снимки настроек, отказ
+от не сохраненных изменений при ошибке отложенной записи, коды приглашения с ограниченным сроком действия и количеством
+активаций, постраничный просмотр списков пользователей и кодов приглашения.
+Запуск: python -m pytest tests (или python -m unittest discover tests)
+"""
+
+
+import tempfile
+import unittest
+import base64
+import json
+import time
+import sys
+import os
+
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+
+import settings
+
+
+BOT_TOKEN = '123456789:' + 'A' * 35
+
+
+def document(access_list: list[int], write_delay: float = 0, invite_codes_max: int = 1000) -> dict:
+    return {
+        'gatekeeper': {'phone': 79000000000, 'key': ''},
+        'telegram': {'bot_token': base64.b64encode(BOT_TOKEN.encode()).decode(), 'phone_owner': 1,
+                     'access_list': access_list, 'users': dict(), 'invite_codes': list(), 'invites': dict()},
+        'bot': {'write_delay': write_delay, 'invite_codes_max': invite_codes_max}
+    }
+
+
+class SettingsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'gatekeeper.conf')
+        self.config: settings.Settings | None = None
+
+    def tearDown(self):
+        if self.config is not None:
+            self.config._storage.close()
+        self.directory.cleanup()
+
+    def open(self, data: dict) -> settings.Settings:
+        """
+        Загрузка настроек из нового файла (Settings - одиночка, поэтому для каждой проверки создается новый объект)
+        """
+        with open(self.path, 'w') as f:
+            json.dump(data, f)
+        if self.config is not None:
+            self.config._storage.close()
+        settings.Settings._Settings__instance = None
+        self.config = settings.Settings(self.path)
+        self.assertTrue(self.config.load())
+        return self.config
+
+    def read(self) -> dict:
+        with open(self.path, 'r') as f:
+            return json.load(f)
+
+
+class ListsTest(unittest.TestCase):
+    def test_access_list(self):
+        access_list = settings.AccessList([1, settings.UserInfo(user_id=2, username='user')])
+        self.assertIn(1, access_list)
+        self.assertNotIn(3, access_list)
+        self.assertTrue(access_list.add(3))
+        self.assertFalse(access_list.add(3))
+        self.assertEqual(access_list.get(2).username, 'user')
+        self.assertEqual(access_list.remove(1), settings.UserInfo(user_id=1))
+        self.assertIsNone(access_list.remove(1))
+        self.assertEqual(access_list.to_list(), [2, 3])
+        self.assertEqual(len(access_list), 2)
+        for user_id in ('1', True, None):
+            with self.assertRaises(TypeError):
+                access_list.add(user_id)
+
+    def test_invite_codes(self):
+        invite_codes = settings.InviteCodes(['AAA', settings.InviteInfo(code='BBB', max_uses=3, used=1)])
+        self.assertIn('AAA', invite_codes)
+        self.assertFalse(invite_codes.add('AAA'))
+        self.assertFalse(invite_codes.add(''))
+        self.assertEqual(invite_codes.get('BBB').uses_left, 2)
+        self.assertEqual(invite_codes.get('AAA').uses_left, 1)
+        self.assertEqual(invite_codes.remove('AAA').code, 'AAA')
+        self.assertIsNone(invite_codes.remove('AAA'))
+        with self.assertRaises(TypeError):
+            invite_codes.add(1)
+
+    def test_json(self):
+        access_list = settings.AccessList.from_json([1, 2], {'1': {'username': 'user', 'added': 'wrong'}})
+        # Значения неверного типа в дополнительной информации пропускаются
+        self.assertEqual(access_list.get(1), settings.UserInfo(user_id=1, username='user'))
+        self.assertEqual(access_list.metadata(), {'1': {'username': 'user'}})
+        invite_codes = settings.InviteCodes.from_json(['AAA'], {'AAA': {'expires': 100, 'used': 0}})
+        self.assertEqual(invite_codes.metadata(), {'AAA': {'expires': 100, 'used': 0}})
+        self.assertEqual(invite_codes.next_expiry, 100)
+        with self.assertRaises(TypeError):
+            settings.AccessList.from_json(['1'])
+
+    def test_frozen(self):
+        access_list = settings.AccessList([1])
+        invite_codes = settings.InviteCodes(['AAA'])
+        access_list.freeze()
+        invite_codes.freeze()
+        for change in (lambda: access_list.add(2), lambda: access_list.remove(1), lambda: invite_codes.add('BBB'),
+                       lambda: invite_codes.remove('AAA'), lambda: invite_codes.remove_expired(0)):
+            with self.assertRaises(TypeError):
+                change()
+        # Копия опубликованного списка изменяема
+        copy = access_list.copy()
+        self.assertTrue(copy.add(2))
+        self.assertEqual(access_list.to_list(), [1])
+
+
+class SnapshotTest(SettingsTestCase):
+    def test_immutable_snapshot(self):
+        config = self.open(document([2]))
+        snapshot = config.data
+        self.assertTrue(config.add_user(3))
+        self.assertFalse(config.add_user(3))
+        # Ранее полученный снимок не изменяется, новый снимок опубликован после сохранения
+        self.assertEqual(sorted(snapshot.telegram.access_list), [2])
+        self.assertEqual(sorted(config.data.telegram.access_list), [2, 3])
+        self.assertEqual(sorted(self.read()['telegram']['access_list']), [2, 3])
+        with self.assertRaises(TypeError):
+            config.data.telegram.access_list.add(4)
+        with self.assertRaises(TypeError):
+            config.data.telegram.invite_codes.remove('code')
+
+    def test_roles(self):
+        config = self.open(document([2]))
+        self.assertEqual(config.role(1), settings.Role.OWNER)
+        self.assertEqual(config.role(2), settings.Role.USER)
+        self.assertEqual(config.role(3), settings.Role.GUEST)
+        config.remove_user(2)
+        self.assertEqual(config.role(2), settings.Role.GUEST)
+
+    def test_deferred_publish(self):
+        config = self.open(document([2, 3, 4], write_delay=0.2))
+        self.assertEqual(len(config.remove_users([2], wait=False)), 1)
+        # Изменение, ожидающее отложенной записи, не опубликовано, но учитывается следующими изменениями
+        self.assertIn(2, config.data.telegram.access_list)
+        self.assertEqual(len(config.remove_users([2, 3], wait=False)), 1)
+        self.assertTrue(config.flush(5))
+        self.assertEqual(sorted(config.data.telegram.access_list), [4])
+        self.assertEqual(self.read()['telegram']['access_list'], [4])
+
+    def test_deferred_rollback(self):
+        config = self.open(document([2, 3], write_delay=0.2))
+        # Временный файл записи не может быть создан: отложенная запись завершится ошибкой
+        os.mkdir(self.path + '.tmp')
+        config.remove_users([2], wait=False)
+        config.remove_users([3], wait=False)
+        self.assertFalse(config.flush(5))
+        # Не сохраненные изменения отброшены, опубликованным остался последний сохраненный снимок
+        self.assertEqual(sorted(config.data.telegram.access_list), [2, 3])
+        self.assertEqual(sorted(self.read()['telegram']['access_list']), [2, 3])
+        with self.assertRaises(IOError):
+            config.remove_user(2)
+        os.rmdir(self.path + '.tmp')
+        # Следующие изменения основаны на сохраненном снимке
+        self.assertIsNotNone(config.remove_user(2))
+        self.assertEqual(sorted(config.data.telegram.access_list), [3])
+        self.assertEqual(self.read()['telegram']['access_list'], [3])
+
+
+class InviteTest(SettingsTestCase):
+    def test_use_limit(self):
+        config = self.open(document([]))
+        invites = config.generate_invites(2, created_by=1, max_uses=2)
+        self.assertEqual(len(invites), 2)
+        code = invites[0].code
+        self.assertEqual(config.data.telegram.invite_codes.get(code).uses_left, 2)
+        self.assertEqual(config.activate_invite(code, 10).code, code)
+        self.assertEqual(config.data.telegram.invite_codes.get(code).uses_left, 1)
+        self.assertEqual(self.read()['telegram']['invites'][code]['used'], 1)
+        # Последняя активация удаляет код
+        self.assertIsNotNone(config.activate_invite(code, 11, username='user'))
+        self.assertNotIn(code, config.data.telegram.invite_codes)
+        self.assertIsNone(config.activate_invite(code, 12))
+        self.assertEqual(sorted(config.data.telegram.access_list), [10, 11])
+        self.assertEqual(config.data.telegram.access_list.get(11).invited_by, 1)
+        self.assertEqual(config.data.telegram.access_list.get(11).invite_code, code)
+        result = self.read()
+        self.assertEqual(sorted(result['telegram']['access_list']), [10, 11])
+        self.assertEqual(result['telegram']['invite_codes'], [invites[1].code])
+
+    def test_single_use_by_default(self):
+        config = self.open(document([]))
+        code = config.generate_invites(1)[0].code
+        self.assertIsNotNone(config.activate_invite(code, 10))
+        self.assertIsNone(config.activate_invite(code, 11))
+        self.assertEqual(sorted(config.data.telegram.access_list), [10])
+
+    def test_expiry(self):
+        config = self.open(document([]))
+        now = int(time.time())
+        self.assertTrue(config.add_invite(settings.InviteInfo(code='OLD', created=now - 100, expires=now - 1)))
+        self.assertTrue(config.add_invite(settings.InviteInfo(code='NEW', created=now, expires=now + 3600)))
+        self.assertTrue(config.add_invite(settings.InviteInfo(code='ANY', created=now)))
+        self.assertIsNone(config.activate_invite('OLD', 10))
+        self.assertNotIn(10, config.data.telegram.access_list)
+        removed = config.remove_expired_invites()
+        self.assertEqual([invite.code for invite in removed], ['OLD'])
+        self.assertEqual(config.remove_expired_invites(), list())
+        self.assertEqual(sorted(config.data.telegram.invite_codes), ['ANY', 'NEW'])
+        self.assertEqual(sorted(self.read()['telegram']['invite_codes']), ['ANY', 'NEW'])
+        self.assertIsNotNone(config.activate_invite('NEW', 10))
+
+    def test_generated_expiry(self):
+        config = self.open(document([]))
+        invite = config.generate_invites(1, ttl=60)[0]
+        self.assertEqual(invite.expires, invite.created + 60)
+        self.assertFalse(invite.expired())
+        self.assertTrue(invite.expired(invite.expires))
+        # Срок действия сохраняется в файле настроек и загружается заново
+        config = self.open(self.read())
+        self.assertEqual(config.data.telegram.invite_codes.get(invite.code).expires, invite.expires)
+        self.assertEqual(config.data.telegram.invite_codes.next_expiry, invite.expires)
+
+    def test_max_count(self):
+        config = self.open(document([], invite_codes_max=3))
+        self.assertEqual(config.generate_invites(4), list())
+        self.assertEqual(config.generate_invites(0), list())
+        self.assertEqual(len(config.generate_invites(3)), 3)
+        self.assertEqual(config.generate_invites(1), list())
+        self.assertEqual(len(set(config.data.telegram.invite_codes)), 3)
+
+
+class PageTest(unittest.TestCase):
+    @staticmethod
+    def ids(page: tuple[int, list]) -> tuple[int, list[int]]:
+        return page[0], [user.user_id for user in page[1]]
+
+    def test_pages(self):
+        access_list = settings.AccessList([9, 3, 7, 1, 5])
+        self.assertEqual(self.ids(access_list.page(limit=2)), (0, [1, 3]))
+        self.assertEqual(self.ids(access_list.page(after=3, limit=2)), (2, [5, 7]))
+        self.assertEqual(self.ids(access_list.page(after=7, limit=2)), (4, [9]))
+        self.assertEqual(self.ids(access_list.page(before=7, limit=2)), (1, [3, 5]))
+        self.assertEqual(self.ids(access_list.page(before=3, limit=2)), (0, [1]))
+
+    def test_edges(self):
+        self.assertEqual(settings.AccessList().page(), (0, list()))
+        access_list = settings.AccessList([1, 3, 5])
+        self.assertEqual(self.ids(access_list.page(limit=10)), (0, [1, 3, 5]))
+        self.assertEqual(self.ids(access_list.page(after=5)), (3, list()))
+        self.assertEqual(self.ids(access_list.page(before=1)), (0, list()))
+        # Курсор - удаленный или несуществующий пользователь
+        self.assertEqual(self.ids(access_list.page(after=2, limit=1)), (1, [3]))
+        self.assertEqual(self.ids(access_list.page(after=100)), (3, list()))
+        self.assertEqual(self.ids(access_list.page(before=4, limit=1)), (1, [3]))
+
+    def test_index_maintenance(self):
+        access_list = settings.AccessList([5, 3, 9])
+        self.assertEqual(self.ids(access_list.page()), (0, [3, 5, 9]))
+        access_list.add(4)
+        access_list.remove(3)
+        self.assertEqual(self.ids(access_list.page()), (0, [4, 5, 9]))
+        # Индекс копии не связан с индексом исходного списка
+        copy = access_list.copy()
+        copy.add(1)
+        copy.remove(9)
+        self.assertEqual(self.ids(copy.page()), (0, [1, 4, 5]))
+        self.assertEqual(self.ids(access_list.page()), (0, [4, 5, 9]))
+
+    def test_invite_pages(self):
+        invite_codes = settings.InviteCodes(['CCC', 'AAA', 'BBB', 'DDD'])
+        start, page = invite_codes.page(after='AAA', limit=2)
+        self.assertEqual((start, [invite.code for invite in page]), (1, ['BBB', 'CCC']))
+        invite_codes.remove('BBB')
+        invite_codes.add(settings.InviteInfo(code='ABC', expires=1))
+        start, page = invite_codes.page(before='DDD', limit=2)
+        self.assertEqual((start, [invite.code for invite in page]), (1, ['ABC', 'CCC']))
+        self.assertEqual([invite.code for invite in invite_codes.remove_expired(2)], ['ABC'])
+        self.assertEqual([invite.code for invite in invite_codes.page()[1]], ['AAA', 'CCC', 'DDD'])
+
+
+if __name__ == '__main__':
+    unittest.main()
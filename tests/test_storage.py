@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+
+
+"""
+Проверка файлового хранилища настроек (storage.JSONStorage): сохранение изменений с проверкой состояния файла
+(compare-and-swap) при изменении файла другим процессом или вручную, отложенная запись. Хранилище SQLite
+(storage.SQLiteStorage): чтение и запись документа, применение изменений, перенос настроек между хранилищами.
+Запуск: python -m pytest tests (или python -m unittest discover tests)
+"""
+
+
+import tempfile
+import unittest
+import json
+import sys
+import os
+
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+
+import storage
+
+
+def document(access_list: list[int]) -> dict:
+    return {
+        'gatekeeper': {'phone': 79000000000, 'key': ''},
+        'telegram': {'bot_token': '', 'phone_owner': 1, 'access_list': access_list, 'users': dict(),
+                     'invite_codes': list(), 'invites': dict()},
+        'bot': {'write_delay': 0}
+    }
+
+
+def add_user(user_id: int) -> storage.Change:
+    return storage.Change('add_user', {'user_id': user_id, 'username': None, 'invited_by': None,
+                                       'invite_code': None, 'added': None})
+
+
+class JSONStorageTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'gatekeeper.conf')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def read(self) -> dict:
+        with open(self.path, 'r') as f:
+            return json.load(f)
+
+    def test_versions(self):
+        settings_storage = storage.JSONStorage(self.path)
+        self.assertFalse(settings_storage.exists())
+        settings_storage.write(document([1]))
+        self.assertEqual(self.read()['version'], 1)
+        settings_storage.apply([add_user(2)], lambda: document([1, 2]))
+        self.assertEqual(self.read()['version'], 2)
+        self.assertEqual(self.read()['telegram']['access_list'], [1, 2])
+        self.assertFalse(settings_storage.changed())
+
+    def test_merge_with_other_process(self):
+        first = storage.JSONStorage(self.path)
+        first.write(document([1]))
+        second = storage.JSONStorage(self.path)
+        second.read()
+        second.apply([add_user(2)], lambda: document([1, 2]))
+        # Данные первого хранилища устарели: изменения применяются к данным из файла, а не к документу в памяти
+        first.apply([add_user(3)], lambda: document([1, 3]))
+        result = self.read()
+        self.assertEqual(sorted(result['telegram']['access_list']), [1, 2, 3])
+        self.assertEqual(result['version'], 3)
+        self.assertTrue(first.changed())
+        first.read()
+        self.assertFalse(first.changed())
+
+    def test_merge_with_manual_edit(self):
+        settings_storage = storage.JSONStorage(self.path)
+        settings_storage.write(document([1]))
+        settings_storage.read()
+        # Ручное изменение файла без изменения версии данных
+        edited = self.read()
+        edited['telegram']['access_list'].append(5)
+        with open(self.path, 'w') as f:
+            json.dump(edited, f)
+        self.assertTrue(settings_storage.changed())
+        settings_storage.apply([add_user(6), storage.Change('remove_user', 1)], lambda: document([6]))
+        result = self.read()
+        self.assertEqual(sorted(result['telegram']['access_list']), [5, 6])
+        self.assertEqual(result['version'], 2)
+
+    def test_deferred(self):
+        settings_storage = storage.JSONStorage(self.path, write_delay=0.1)
+        settings_storage.write(document([1]))
+        saved = list()
+        for user_id in (2, 3):
+            settings_storage.enqueue([add_user(user_id)], lambda: document([1, 2, 3]), saved.append)
+        self.assertTrue(settings_storage.pending)
+        self.assertEqual(self.read()['telegram']['access_list'], [1])
+        self.assertTrue(settings_storage.flush(5))
+        self.assertFalse(settings_storage.pending)
+        # Изменения объединены в одну перезапись файла
+        self.assertEqual(self.read()['version'], 2)
+        self.assertEqual(self.read()['telegram']['access_list'], [1, 2, 3])
+        self.assertEqual(saved, [None])
+        settings_storage.close()
+
+    def test_deferred_failure(self):
+        settings_storage = storage.JSONStorage(self.path, write_delay=0.1)
+        settings_storage.write(document([1]))
+        saved = list()
+
+        def failed() -> dict:
+            raise ValueError('broken document')
+
+        generation = settings_storage.enqueue([add_user(2)], failed, saved.append)
+        with self.assertRaises(IOError):
+            settings_storage.wait(generation)
+        self.assertFalse(settings_storage.pending)
+        self.assertEqual(len(saved), 1)
+        self.assertIsInstance(saved[0], ValueError)
+        self.assertEqual(self.read()['telegram']['access_list'], [1])
+        settings_storage.close()
+
+
+class SQLiteStorageTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'gatekeeper.db')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_open_storage(self):
+        self.assertIsInstance(storage.open_storage(self.path), storage.SQLiteStorage)
+        self.assertIsInstance(storage.open_storage(os.path.join(self.directory.name, 'gatekeeper.SQLite')),
+                              storage.SQLiteStorage)
+        self.assertIsInstance(storage.open_storage(os.path.join(self.directory.name, 'gatekeeper.conf')),
+                              storage.JSONStorage)
+
+    def test_write_and_apply(self):
+        settings_storage = storage.SQLiteStorage(self.path)
+        initial = document([1, 3])
+        initial['telegram']['users'] = {'3': {'username': 'user'}}
+        initial['telegram']['invite_codes'] = ['code']
+        initial['telegram']['invites'] = {'code': {'created_by': 3, 'max_uses': 2, 'used': 0}}
+        settings_storage.write(initial)
+        self.assertEqual(settings_storage.read(), initial)
+        settings_storage.apply([add_user(2), storage.Change('remove_user', 3), storage.Change('remove_invite', 'code'),
+                                storage.Change('set', ('bot', 'write_delay', 5))], lambda: dict())
+        read = settings_storage.read()
+        self.assertEqual(read['telegram']['access_list'], [1, 2])
+        self.assertEqual(read['telegram']['users'], dict())
+        self.assertEqual(read['telegram']['invite_codes'], list())
+        self.assertEqual(read['bot']['write_delay'], 5)
+        with self.assertRaises(ValueError):
+            settings_storage.apply([storage.Change('unknown', None)], lambda: dict())
+        settings_storage.close()
+
+    def test_changed(self):
+        settings_storage = storage.SQLiteStorage(self.path)
+        settings_storage.write(document([1]))
+        settings_storage.read()
+        self.assertFalse(settings_storage.changed())
+        # Изменение, внесенное другим подключением (например, другим процессом)
+        other = storage.SQLiteStorage(self.path)
+        other.apply([add_user(2)], lambda: dict())
+        other.close()
+        self.assertTrue(settings_storage.changed())
+        self.assertEqual(settings_storage.read()['telegram']['access_list'], [1, 2])
+        self.assertFalse(settings_storage.changed())
+        settings_storage.close()
+
+    def test_migrate(self):
+        json_path = os.path.join(self.directory.name, 'gatekeeper.conf')
+        storage.JSONStorage(json_path).write(document([1, 2]))
+        storage.migrate(json_path, self.path)
+        settings_storage = storage.SQLiteStorage(self.path)
+        self.assertEqual(settings_storage.read()['telegram']['access_list'], [1, 2])
+        settings_storage.close()
+        with self.assertRaises(IOError):
+            storage.migrate(os.path.join(self.directory.name, 'missing.conf'), self.path)
+
+
+if __name__ == '__main__':
+    unittest.main()